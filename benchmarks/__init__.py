@@ -0,0 +1,5 @@
+"""
+Benchmarks of the data, training-input and inference hot paths
+
+Run with 'python main.py benchmark'; see benchmarks/run.py.
+"""
\ No newline at end of file
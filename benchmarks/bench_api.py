@@ -0,0 +1,65 @@
+"""
+API round trips through an in-process ASGI client
+
+Requests go through the full FastAPI stack (middleware, validation, the
+endpoint and response serialization) without a socket, so the numbers
+exclude network and server process overhead.
+"""
+
+import asyncio
+from typing import Dict, Any
+
+from .harness import benchmark
+
+_session: Dict[str, Any] = {}
+
+
+def _client(ctx):
+    """AsyncClient bound to the API app with the benchmark model loaded, and its event loop"""
+    if not _session:
+        import httpx
+        from src.api import app as api
+        
+        # The lifespan (startup model load) is not run by ASGITransport
+        api.predictor = api.load_predictor(ctx.model_path)
+        _session['loop'] = asyncio.new_event_loop()
+        _session['client'] = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://benchmark")
+    return _session['client'], _session['loop']
+
+
+def close():
+    """Close the client and its loop (called once all benchmarks have run)"""
+    if _session:
+        loop = _session['loop']
+        loop.run_until_complete(_session['client'].aclose())
+        loop.close()
+        _session.clear()
+
+
+def _request(ctx, method: str, url: str, **kwargs):
+    client, loop = _client(ctx)
+    
+    def run():
+        return loop.run_until_complete(client.request(method, url, **kwargs))
+    
+    # Fail here rather than time error responses
+    response = run()
+    response.raise_for_status()
+    return run
+
+
+@benchmark('api.health', threshold=0.3)
+def health(ctx):
+    return _request(ctx, 'GET', '/health')
+
+
+@benchmark('api.predict', words=[16, 128], threshold=0.3)
+def predict(ctx, words):
+    text = ctx.texts(1, words)[0]
+    return _request(ctx, 'POST', '/predict', json={'text': text, 'return_probabilities': True})
+
+
+@benchmark('api.predict_batch', batch_size=[8, 64], threshold=0.3, quick={'batch_size': [8]})
+def predict_batch(ctx, batch_size):
+    texts = ctx.texts(batch_size, 32)
+    return _request(ctx, 'POST', '/predict/batch', json={'texts': texts, 'batch_size': batch_size}), batch_size
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Data loading, cleaning, dataset item and collation benchmarks
+"""
+
+from src.data.dataset import TextClassificationDataset, DataCollator
+from src.data.loader import DataLoader
+
+from .harness import benchmark
+
+SIZES = [1_000, 10_000, 100_000]
+QUICK_SIZES = [1_000, 10_000]
+
+
+@benchmark('data.load_data', rows=SIZES, format=['csv', 'json'], quick={'rows': QUICK_SIZES, 'format': ['csv']})
+def load_data(ctx, rows, format):
+    path = ctx.dataset_path(rows, format)
+    loader = DataLoader()
+    return (lambda: loader.load_data(path)), rows
+
+
+@benchmark('data.clean_data', rows=SIZES, quick={'rows': QUICK_SIZES})
+def clean_data(ctx, rows):
+    df = ctx.raw_frame(rows)
+    loader = DataLoader()
+    return (lambda: loader._clean_data(df)), rows
+
+
+@benchmark('data.getitem', max_length=[128, 512])
+def dataset_getitem(ctx, max_length):
+    texts = ctx.texts(256, 40)
+    dataset = TextClassificationDataset(texts, [0] * len(texts), ctx.tokenizer, max_length=max_length)
+    
+    def run():
+        for i in range(len(dataset)):
+            dataset[i]
+    return run, len(dataset)
+
+
+@benchmark('data.collate', batch_size=[16, 64], max_length=[128, 512], quick={'batch_size': [16], 'max_length': [128, 512]})
+def collate(ctx, batch_size, max_length):
+    texts = ctx.texts(batch_size, 40)
+    dataset = TextClassificationDataset(texts, [0] * len(texts), ctx.tokenizer, max_length=max_length)
+    features = [dataset[i] for i in range(len(dataset))]
+    collator = DataCollator(ctx.tokenizer)
+    return (lambda: collator(features)), batch_size
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+predict_single and predict_batch benchmarks over sequence length and batch size
+"""
+
+from .harness import benchmark
+
+# Words per text; the benchmark tokenizer maps each word to one token, plus [CLS] and [SEP]
+SEQUENCE_WORDS = [16, 128, 510]
+
+
+@benchmark('inference.predict_single', words=SEQUENCE_WORDS, probabilities=[False, True],
+           quick={'words': [16, 128], 'probabilities': [False]})
+def predict_single(ctx, words, probabilities):
+    predictor = ctx.predictor
+    text = ctx.texts(1, words)[0]
+    return lambda: predictor.predict_single(text, return_probabilities=probabilities)
+
+
+@benchmark('inference.predict_batch', batch_size=[1, 8, 32], words=SEQUENCE_WORDS,
+           quick={'batch_size': [8, 32], 'words': [16, 128]})
+def predict_batch(ctx, batch_size, words):
+    predictor = ctx.predictor
+    texts = ctx.texts(batch_size, words)
+    return (lambda: predictor.predict_batch(texts, batch_size=batch_size)), batch_size
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Synthetic datasets and a small random-weight model for the benchmarks
+
+Everything is generated from a fixed seed and cached under
+<cache_dir>/benchmarks, so runs are reproducible, need no network and
+repeated runs skip the generation.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
+import logging
+
+from src.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+LABELS = ['positive', 'negative', 'neutral']
+
+# Small vocabulary shared by the texts and the benchmark tokenizer
+WORDS = (
+    "the a this that it is was very really not quite product service movie quality price delivery "
+    "great good excellent amazing fantastic wonderful perfect love recommended outstanding "
+    "bad terrible awful poor worst hate broke disappointed useless overpriced horrible "
+    "okay average fine decent standard fair acceptable expected nothing special basic "
+    "and but or with for of to in on after before one day year time customer experience value"
+).split()
+
+
+class BenchmarkContext:
+    """
+    Lazily built inputs shared by all benchmarks of a run
+    
+    Args:
+        work_dir: Where generated datasets and the model are cached
+        model_path: Benchmark this saved model instead of the generated one
+        seed: Seed of all generated data
+    """
+    
+    def __init__(self, work_dir: Optional[str] = None, model_path: Optional[str] = None, seed: int = 0):
+        self.work_dir = work_dir or os.path.join(config.data.cache_dir, "benchmarks")
+        self.seed = seed
+        self._model_path = model_path
+        self._predictor = None
+        self._tokenizer = None
+        self._frames: Dict[int, pd.DataFrame] = {}
+        os.makedirs(self.work_dir, exist_ok=True)
+    
+    def texts(self, count: int, num_words: int, seed: int = 0) -> List[str]:
+        """count texts of exactly num_words words"""
+        rng = np.random.default_rng((self.seed, seed, num_words))
+        words = np.array(WORDS)
+        return [" ".join(row) for row in words[rng.integers(0, len(WORDS), size=(count, num_words))]]
+    
+    def raw_frame(self, num_rows: int) -> pd.DataFrame:
+        """
+        Uncleaned dataset of num_rows rows, shaped like real uploads
+        
+        Text lengths vary from 3 to 60 words; about 5% of rows repeat an
+        earlier row, 1% have blank text and 1% a missing label.
+        """
+        if num_rows not in self._frames:
+            rng = np.random.default_rng((self.seed, num_rows))
+            lengths = rng.integers(3, 61, size=num_rows)
+            words = np.array(WORDS)
+            texts = [" ".join(words[rng.integers(0, len(WORDS), size=length)]) for length in lengths]
+            labels = np.array(LABELS, dtype=object)[rng.integers(0, len(LABELS), size=num_rows)]
+            df = pd.DataFrame({'text': texts, 'label': labels})
+            
+            repeated = rng.random(num_rows) < 0.05
+            df.loc[repeated, :] = df.iloc[rng.integers(0, num_rows, size=int(repeated.sum()))].to_numpy()
+            df.loc[rng.random(num_rows) < 0.01, 'text'] = "   "
+            df.loc[rng.random(num_rows) < 0.01, 'label'] = None
+            self._frames[num_rows] = df
+        return self._frames[num_rows]
+    
+    def dataset_path(self, num_rows: int, format: str = 'csv') -> str:
+        """raw_frame(num_rows) written as a csv or json file"""
+        path = os.path.join(self.work_dir, f"data-{self.seed}-{num_rows}.{format}")
+        if not os.path.exists(path):
+            df = self.raw_frame(num_rows)
+            if format == 'csv':
+                df.to_csv(path, index=False)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(df.to_dict(orient='records'), f)
+        return path
+    
+    @property
+    def model_path(self) -> str:
+        if self._model_path is None:
+            self._model_path = os.path.join(self.work_dir, "tiny-model")
+            if not os.path.exists(os.path.join(self._model_path, "label_mappings.json")):
+                create_tiny_model(self._model_path, seed=self.seed)
+        return self._model_path
+    
+    @property
+    def predictor(self):
+        """ModelPredictor of model_path, loaded once per run"""
+        if self._predictor is None:
+            from src.models.predictor import ModelPredictor
+            
+            self._predictor = ModelPredictor(self.model_path)
+        return self._predictor
+    
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        return self._tokenizer
+
+
+def create_tiny_model(output_dir: str, num_layers: int = 2, hidden_size: int = 128,
+                      max_length: int = 512, seed: int = 0) -> str:
+    """
+    Save a random-weight BERT classifier with a word-level vocabulary
+    
+    The model is small enough to keep the benchmarks quick on a CPU but goes
+    through the same tokenizer, model and post-processing code as a finetuned
+    checkpoint, with the files ModelPredictor expects (label mappings and
+    training_info.json with max_length).
+    
+    Returns:
+        output_dir
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+    
+    os.makedirs(output_dir, exist_ok=True)
+    vocab_path = os.path.join(output_dir, "vocab.txt")
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(WORDS))))
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True)
+    
+    torch.manual_seed(seed)
+    model_config = BertConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=max(1, hidden_size // 64),
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=max_length,
+        num_labels=len(LABELS)
+    )
+    model = BertForSequenceClassification(model_config)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    
+    mappings: Dict[str, Any] = {
+        'label_to_id': {label: i for i, label in enumerate(LABELS)},
+        'id_to_label': {str(i): label for i, label in enumerate(LABELS)}
+    }
+    with open(os.path.join(output_dir, "label_mappings.json"), 'w') as f:
+        json.dump(mappings, f, indent=2)
+    with open(os.path.join(output_dir, "training_info.json"), 'w') as f:
+        json.dump({'model_name': 'benchmark-tiny-bert', 'max_length': max_length}, f, indent=2)
+    
+    logger.info(f"Created benchmark model in {output_dir}")
+    return output_dir
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Timing harness, benchmark registry and baseline comparison
+"""
+
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import product
+from typing import Dict, Any, Callable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Benchmark:
+    """A registered benchmark and the parameter grid it runs over"""
+    name: str
+    setup: Callable[..., Any]
+    params: Dict[str, List[Any]] = field(default_factory=dict)
+    quick_params: Optional[Dict[str, List[Any]]] = None
+    threshold: Optional[float] = None  # Overrides the suite-wide regression threshold
+    
+    def cases(self, quick: bool = False) -> List[Dict[str, Any]]:
+        """One parameter dict per point of the grid (the smaller grid in quick mode)"""
+        params = self.quick_params if quick and self.quick_params is not None else self.params
+        keys = list(params)
+        return [dict(zip(keys, values)) for values in product(*(params[key] for key in keys))]
+    
+    def case_name(self, case: Dict[str, Any]) -> str:
+        if not case:
+            return self.name
+        return f"{self.name}[{','.join(f'{key}={value}' for key, value in case.items())}]"
+
+
+REGISTRY: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, quick: Optional[Dict[str, List[Any]]] = None,
+              threshold: Optional[float] = None, **params: List[Any]):
+    """
+    Register a benchmark
+    
+    The decorated function receives the BenchmarkContext and one value per
+    parameter, does any untimed setup and returns the callable to time, or a
+    (callable, items) tuple to also report items per second.
+    
+    Args:
+        name: Dotted benchmark name (e.g. 'data.load_data')
+        quick: Smaller parameter grid used with --quick
+        threshold: Regression threshold for this benchmark (e.g. looser for
+            noisy end-to-end paths)
+        **params: Parameter name -> values to run
+    """
+    def register(setup: Callable[..., Any]) -> Callable[..., Any]:
+        REGISTRY[name] = Benchmark(name, setup, params, quick, threshold)
+        return setup
+    return register
+
+
+def measure(fn: Callable[[], Any], min_time: float = 1.0, min_runs: int = 5,
+            max_runs: int = 10000, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time repeated calls of fn
+    
+    Calls are timed one by one until both min_runs and min_time are reached.
+    The garbage collector is paused while timing, as in timeit, so collections
+    triggered by earlier code do not land in a random call.
+    
+    Returns:
+        Median, mean, standard deviation, min, max and 95th percentile in
+        seconds, and the number of timed runs
+    """
+    for _ in range(warmup):
+        fn()
+    
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        times = []
+        deadline = time.perf_counter() + min_time
+        while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() < deadline):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    
+    times.sort()
+    return {
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'min': times[0],
+        'max': times[-1],
+        'p95': times[min(len(times) - 1, int(0.95 * len(times)))],
+        'runs': len(times)
+    }
+
+
+def run_suite(context: Any, names: Optional[List[str]] = None, quick: bool = False,
+              min_time: float = 1.0) -> Dict[str, Dict[str, Any]]:
+    """
+    Run registered benchmarks
+    
+    Args:
+        context: BenchmarkContext passed to every setup function
+        names: Substrings selecting benchmarks by case name (all if None)
+        quick: Use the smaller parameter grids
+        min_time: Minimum timed seconds per case
+    
+    Returns:
+        Timing statistics per case name
+    """
+    results = {}
+    for bench in REGISTRY.values():
+        for case in bench.cases(quick):
+            case_name = bench.case_name(case)
+            if names and not any(name in case_name for name in names):
+                continue
+            
+            target = bench.setup(context, **case)
+            fn, items = target if isinstance(target, tuple) else (target, None)
+            stats = measure(fn, min_time=min_time)
+            if items:
+                stats['items'] = items
+                stats['items_per_second'] = items / stats['median']
+            if bench.threshold is not None:
+                stats['threshold'] = bench.threshold
+            results[case_name] = stats
+            logger.info(f"{case_name}: {stats['median'] * 1000:.3f} ms median over {stats['runs']} runs")
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """Versions and machine details stored next to the results, to tell whether two runs are comparable"""
+    import numpy
+    import pandas
+    import torch
+    import transformers
+    
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'torch': torch.__version__,
+        'transformers': transformers.__version__,
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float = 0.15) -> List[Dict[str, Any]]:
+    """
+    Compare median times with a baseline run
+    
+    Args:
+        results: Timing statistics per case from run_suite
+        baseline: The same from a stored run
+        threshold: Allowed relative slowdown (0.15 = 15%) for cases that do
+            not set their own
+    
+    Returns:
+        One row per case present in both runs, with the relative change and
+        whether it is a regression or an improvement
+    """
+    rows = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        limit = stats.get('threshold', threshold)
+        change = stats['median'] / baseline[name]['median'] - 1
+        rows.append({
+            'name': name,
+            'baseline': baseline[name]['median'],
+            'current': stats['median'],
+            'change': change,
+            'threshold': limit,
+            'regression': change > limit,
+            'improvement': change < -limit
+        })
+    return rows
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Run the benchmark suite, write JSON results and check them against a baseline
+
+Results are written as {'environment': ..., 'results': {case: stats}}; a
+baseline is a results file from an earlier run on the same machine (see
+--save-baseline). Timings from different machines, thread counts or library
+versions are not comparable, which is why the environment is stored next to
+them.
+"""
+
+import json
+import os
+from typing import Dict, Any, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def run_benchmarks(names: Optional[List[str]] = None, quick: bool = False, min_time: float = 1.0,
+                   threads: Optional[int] = None, model_path: Optional[str] = None,
+                   output_path: Optional[str] = None, baseline_path: Optional[str] = DEFAULT_BASELINE,
+                   threshold: float = 0.15, save_baseline: bool = False) -> Dict[str, Any]:
+    """
+    Run the benchmarks on the CPU
+    
+    Args:
+        names: Substrings selecting benchmark cases (all if None)
+        quick: Smaller parameter grids (e.g. for CI)
+        min_time: Minimum timed seconds per case
+        threads: torch intra-op threads (pinned so runs are comparable)
+        model_path: Benchmark inference with this model instead of the generated tiny one
+        output_path: Write the results JSON here
+        baseline_path: Compare with this results file if it exists
+        threshold: Allowed relative slowdown of the median before a case counts as a regression
+        save_baseline: Store this run as the baseline instead of comparing
+    
+    Returns:
+        The results document, with a 'comparison' list when a baseline was used
+    """
+    # CPU only, whatever the machine has; must happen before CUDA is initialised
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    import torch
+    
+    if threads:
+        torch.set_num_threads(threads)
+    
+    from . import bench_data, bench_inference, bench_api  # noqa: F401 (registers the benchmarks)
+    from .fixtures import BenchmarkContext
+    from .harness import run_suite, environment, compare
+    
+    context = BenchmarkContext(model_path=model_path)
+    try:
+        results = run_suite(context, names=names, quick=quick, min_time=min_time)
+    finally:
+        bench_api.close()
+    
+    document: Dict[str, Any] = {
+        'environment': {**environment(), 'quick': quick, 'model_path': model_path},
+        'results': results
+    }
+    
+    if save_baseline:
+        _write(document, baseline_path)
+        logger.info(f"Saved baseline to {baseline_path}")
+    elif baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        document['baseline'] = {'path': baseline_path, 'environment': baseline.get('environment')}
+        document['comparison'] = compare(results, baseline['results'], threshold)
+    
+    if output_path:
+        _write(document, output_path)
+    return document
+
+
+def _write(document: Dict[str, Any], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
\ No newline at end of file
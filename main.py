@@ -3,17 +3,18 @@ Main entry point for the AI Model Finetuning Application
 """
 
 import argparse
+import json
 import logging
 import sys
 import os
+from contextlib import nullcontext
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.models.trainer import ModelTrainer
-from src.models.predictor import ModelPredictor
-from src.api.app import run_api
-from src.data.loader import create_sample_dataset
+# Commands import the heavy modules (torch, transformers) they need themselves, so a
+# prediction served by the inference daemon does not pay for loading them
+from src.api.daemon import DaemonClient, load_predictor, run_daemon
 from src.utils.config import config
 
 # Configure logging
@@ -26,40 +27,156 @@ logger = logging.getLogger(__name__)
 
 def train_model(args):
     """Train a model with the given arguments"""
+    from src.models.trainer import ModelTrainer
+    from src.models.distributed import launch_distributed, benchmark_scaling
+    
     logger.info("Starting model training...")
     
-    # Create trainer
-    trainer = ModelTrainer(
+    if args.dedup_threshold is not None:
+        config.data.near_duplicate_threshold = args.dedup_threshold
+    if args.split_method:
+        config.training.split_method = args.split_method
+    
+    trainer_kwargs = dict(
         model_name=args.model_name,
         num_labels=args.num_labels,
         output_dir=args.output_dir
     )
-    
-    # Train model
-    result = trainer.train(
+    train_kwargs = dict(
         train_file=args.train_file,
         val_file=args.val_file,
         test_file=args.test_file,
         num_epochs=args.epochs,
         batch_size=args.batch_size,
         learning_rate=args.learning_rate,
-        max_length=args.max_length
+        max_length=args.max_length,
+        auto_max_length=args.auto_max_length,
+        max_length_percentile=args.max_length_percentile,
+        micro_batch_size=args.micro_batch_size,
+        bf16=args.bf16,
+        gradient_checkpointing=args.gradient_checkpointing,
+        auto_batch_size=args.auto_batch_size,
+        memory_limit_mb=args.memory_limit_mb,
+        init_from=args.init_from,
+        resume_from_checkpoint=args.resume,
+        since_watermark=args.since_watermark,
+        replay_fraction=args.replay_fraction,
+        lora_rank=args.lora_rank,
+        async_checkpointing=args.async_checkpointing or None,
+        weights_only_checkpoints=args.weights_only_checkpoints or None,
+        async_evaluation=args.async_evaluation or None,
+        time_budget=args.time_budget * 60 if args.time_budget else None,
+        sample_budget=args.sample_budget,
+        profile_steps=tuple(args.profile_steps) if args.profile_steps else None
     )
     
+    if args.head_only:
+        trainer = ModelTrainer(**trainer_kwargs)
+        if args.init_from:
+            trainer.load_previous_model(args.init_from)
+        result = trainer.train_head(
+            train_file=args.train_file,
+            val_file=args.val_file,
+            test_file=args.test_file,
+            max_length=args.max_length,
+            auto_max_length=args.auto_max_length,
+            max_length_percentile=args.max_length_percentile,
+            head_type=args.head_type,
+            hidden_dim=args.head_hidden_dim,
+            pooling=args.pooling,
+            num_epochs=args.head_epochs
+        )
+        logger.info(f"Head saved to: {result['model_path']}")
+        return
+    
+    if args.benchmark_scaling:
+        report = benchmark_scaling(trainer_kwargs, train_kwargs, args.nproc, cores_per_proc=args.cores_per_proc)
+        for run in report['runs']:
+            print(f"{run['nproc']:>3} processes: {run['train_samples_per_second']:.1f} samples/s, "
+                  f"speedup {run['speedup']:.2f}x, efficiency {run['efficiency']:.0%}")
+        return
+    
+    if args.nproc > 1 or args.nnodes > 1:
+        result = launch_distributed(
+            trainer_kwargs, train_kwargs, args.nproc,
+            nnodes=args.nnodes,
+            node_rank=args.node_rank,
+            rendezvous=args.rendezvous,
+            cores_per_proc=args.cores_per_proc
+        )
+        if result is None:
+            logger.info("Worker node finished")
+            return
+    else:
+        trainer = ModelTrainer(**trainer_kwargs)
+        result = trainer.train(**train_kwargs)
+    
     logger.info("Training completed successfully!")
     logger.info(f"Model saved to: {result['model_path']}")
 
 
+def tune_model(args):
+    """Run a hyperparameter search with the given arguments"""
+    from src.models.tuning import HyperparameterTuner
+    
+    logger.info("Starting hyperparameter search...")
+    
+    if args.dedup_threshold is not None:
+        config.data.near_duplicate_threshold = args.dedup_threshold
+    if args.split_method:
+        config.training.split_method = args.split_method
+    
+    tuner = HyperparameterTuner(
+        model_name=args.model_name,
+        num_labels=args.num_labels,
+        output_dir=args.output_dir,
+        search_space={
+            'learning_rate': (args.min_learning_rate, args.max_learning_rate, 'log'),
+            'warmup_ratio': (0.0, args.max_warmup_ratio, 'uniform')
+        },
+        num_trials=args.num_trials,
+        min_epochs=args.min_epochs,
+        max_epochs=args.max_epochs,
+        reduction_factor=args.reduction_factor,
+        max_workers=args.max_workers,
+        cores_per_trial=args.cores_per_trial,
+        metric=args.metric
+    )
+    
+    summary = tuner.run(
+        train_file=args.train_file,
+        val_file=args.val_file,
+        test_file=args.test_file,
+        batch_size=args.batch_size,
+        max_length=args.max_length,
+        max_length_percentile=args.max_length_percentile if args.auto_max_length else None,
+        eval_steps=args.eval_steps
+    )
+    
+    for row in summary['leaderboard'][:10]:
+        print(f"#{row['rank']} trial {row['trial_id']} [{row['status']}] "
+              f"{args.metric}={row[args.metric]} epochs={row['epochs']} "
+              f"lr={row['learning_rate']:.2e} warmup={row['warmup_ratio']:.3f} "
+              f"weight_decay={row['weight_decay']:.3f}")
+    logger.info(f"Best model saved to: {summary['best_model_path']}")
+
+
 def predict_text(args):
     """Make predictions with a trained model"""
     logger.info("Loading model for prediction...")
     
-    # Load predictor
-    predictor = ModelPredictor(args.model_path)
+    # Load predictor (served by the inference daemon when it is running; profiling needs it in-process)
+    predictor = load_predictor(args.model_path, use_daemon=not (args.no_daemon or args.profile))
+    
+    profiling = nullcontext()
+    if args.profile:
+        from src.utils.profiler import RequestProfiler
+        profiling = RequestProfiler().maybe_capture('predict', forced=True)
     
     if args.text:
         # Single prediction
-        result = predictor.predict_single(args.text, return_probabilities=args.probabilities)
+        with profiling:
+            result = predictor.predict_single(args.text, return_probabilities=args.probabilities)
         print(f"Text: {result['text']}")
         print(f"Predicted Label: {result['predicted_label']}")
         print(f"Confidence: {result['confidence']:.4f}")
@@ -74,7 +191,8 @@ def predict_text(args):
         with open(args.input_file, 'r') as f:
             texts = [line.strip() for line in f if line.strip()]
         
-        results = predictor.predict_batch(texts, return_probabilities=args.probabilities)
+        with profiling:
+            results = predictor.predict_batch(texts, return_probabilities=args.probabilities)
         
         # Save results
         output_file = args.output_file or "predictions.txt"
@@ -85,8 +203,139 @@ def predict_text(args):
         print(f"Predictions saved to: {output_file}")
 
 
+def evaluate_model(args):
+    """Evaluate a trained model on a labelled data file"""
+    from src.models.evaluation import evaluate_file, compare_models, save_results
+    
+    # Adapter directories are loaded onto an in-process predictor; the daemon client cannot load adapters
+    adapter_dir = args.compare_adapter if args.compare_adapter and os.path.isdir(args.compare_adapter) else None
+    use_daemon = not args.no_daemon and adapter_dir is None
+    
+    predictor = load_predictor(args.model_path, use_daemon=use_daemon)
+    if args.compare_model_path or args.compare_adapter:
+        # Without --compare-model-path, compare two adapters on the --model-path base
+        other = load_predictor(args.compare_model_path, use_daemon=use_daemon) if args.compare_model_path else predictor
+        compare_adapter = args.compare_adapter
+        if adapter_dir:
+            # Two runs often share a directory name (e.g. final); don't replace the adapter under evaluation
+            name = os.path.basename(os.path.normpath(adapter_dir))
+            compare_adapter = other.load_adapter(adapter_dir, name=f"{name}-compare" if name in other.adapters else name)
+        results = compare_models(
+            predictor, other, args.data_file,
+            batch_size=args.batch_size,
+            chunk_size=args.chunk_size,
+            max_samples=args.max_samples,
+            num_resamples=args.bootstrap or 1000,
+            confidence=args.confidence,
+            adapter_a=args.adapter,
+            adapter_b=compare_adapter
+        )
+    else:
+        results = evaluate_file(
+            predictor, args.data_file,
+            batch_size=args.batch_size,
+            chunk_size=args.chunk_size,
+            num_bins=args.num_bins,
+            max_samples=args.max_samples,
+            adapter=args.adapter,
+            bootstrap=args.bootstrap,
+            confidence=args.confidence
+        )
+    
+    if args.output_file:
+        save_results(results, args.output_file)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+def benchmark_memory(args):
+    """Report artifact size and serving memory for a set of models"""
+    from src.models.predictor import benchmark_serving_memory
+    
+    for row in benchmark_serving_memory(args.model_paths):
+        kind = "adapter" if row['adapter'] else "head" if row['head'] else "full"
+        print(f"{row['model_path']} [{kind}]: artifact {row['artifact_size_mb']:.1f} MB, "
+              f"+{row['rss_increase_mb']:.1f} MB resident (total {row['rss_mb']:.1f} MB)")
+
+
+def run_benchmarks(args):
+    """Time the data, dataset and inference hot paths and check them against a baseline"""
+    from benchmarks.run import run_benchmarks as run_suite
+    
+    document = run_suite(names=args.filter, quick=args.quick, min_time=args.min_time, threads=args.threads,
+                         model_path=args.model_path, output_path=args.output_file,
+                         baseline_path=args.baseline, threshold=args.threshold,
+                         save_baseline=args.save_baseline)
+    
+    for name, stats in document['results'].items():
+        throughput = f" ({stats['items_per_second']:,.0f} items/s)" if 'items_per_second' in stats else ""
+        print(f"{name:<60} {stats['median'] * 1000:>10.3f} ms{throughput}")
+    
+    if args.save_baseline:
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    if 'comparison' not in document:
+        print(f"\nNo baseline at {args.baseline} (create one with --save-baseline)")
+        return
+    
+    regressions = [row for row in document['comparison'] if row['regression']]
+    print(f"\nCompared with {args.baseline}:")
+    for row in document['comparison']:
+        flag = "REGRESSION" if row['regression'] else "improved" if row['improvement'] else ""
+        print(f"{row['name']:<60} {row['change']:>+8.1%} {flag}")
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than their threshold")
+        sys.exit(1)
+
+
+def show_catalog(args):
+    """List datasets with their precomputed statistics, or show one dataset's statistics/preview"""
+    from src.data.catalog import DatasetCatalog
+    
+    catalog = DatasetCatalog(data_dir=args.data_dir, tokenizer_name=args.tokenizer)
+    
+    if args.preview:
+        page = catalog.preview(args.preview, page=args.page, page_size=args.page_size)
+        print(f"{args.preview}: page {args.page + 1}/{catalog.num_pages(args.preview, args.page_size)}")
+        print(page.to_string())
+        return
+    if args.stats:
+        print(json.dumps(catalog.stats(args.stats, refresh=args.refresh), indent=2))
+        return
+    
+    if args.refresh:
+        for name in catalog.dataset_names():
+            catalog.stats(name, refresh=True)
+    rows = catalog.list_datasets(compute_missing=args.compute)
+    for row in rows:
+        if row['profiled']:
+            print(f"{row['name']:<40} {row['size_bytes'] / (1024 * 1024):>9.1f} MB {row['num_rows']:>10} rows "
+                  f"{row['num_labels']:>4} labels {row['duplicate_rate']:>7.1%} dup {row['mean_tokens']:>7.1f} tokens")
+        else:
+            print(f"{row['name']:<40} {row['size_bytes'] / (1024 * 1024):>9.1f} MB (not profiled; use --compute)")
+
+
+def manage_daemon(args):
+    """Run the local inference daemon, or query/stop a running one"""
+    if args.status or args.stop:
+        client = DaemonClient.connect(args.socket)
+        if client is None:
+            print(f"No inference daemon is running on {args.socket or config.api.daemon_socket}")
+            return
+        if args.stop:
+            client.shutdown()
+            print("Inference daemon stopped")
+        else:
+            print(json.dumps(client.stats(), indent=2))
+        return
+    
+    run_daemon(args.socket, preload=args.preload, max_memory_mb=args.max_memory_mb)
+
+
 def start_api(args):
     """Start the API server"""
+    from src.api.app import run_api
+    
     logger.info("Starting API server...")
     
     # Update config if provided
@@ -96,12 +345,18 @@ def start_api(args):
         config.api.host = args.host
     if args.port:
         config.api.port = args.port
+    if args.allow_profiling:
+        config.api.allow_profiling = True
+    if args.sample_hz is not None:
+        config.api.stack_sampling_hz = args.sample_hz
     
     run_api(args.host, args.port, args.debug)
 
 
 def create_sample_data(args):
     """Create sample dataset"""
+    from src.data.loader import create_sample_dataset
+    
     logger.info("Creating sample dataset...")
     
     create_sample_dataset(
@@ -142,8 +397,65 @@ def main():
     train_parser.add_argument('--output-dir', default='./models/finetuned_model', help='Output directory')
     train_parser.add_argument('--epochs', type=int, default=3, help='Number of epochs')
     train_parser.add_argument('--batch-size', type=int, default=16, help='Batch size')
+    train_parser.add_argument('--micro-batch-size', type=int, default=config.training.micro_batch_size, help='Per-step batch size; gradients are accumulated to reach --batch-size')
+    train_parser.add_argument('--auto-batch-size', action='store_true', default=config.training.auto_batch_size, help='Probe the largest micro-batch that fits in memory')
+    train_parser.add_argument('--memory-limit-mb', type=float, default=config.training.memory_limit_mb, help='Memory ceiling for --auto-batch-size')
+    train_parser.add_argument('--bf16', action='store_true', default=config.training.bf16, help='Use bf16 mixed precision (CPUs with AVX512-BF16/AMX)')
+    train_parser.add_argument('--gradient-checkpointing', action='store_true', default=config.training.gradient_checkpointing, help='Trade compute for activation memory')
     train_parser.add_argument('--learning-rate', type=float, default=2e-5, help='Learning rate')
     train_parser.add_argument('--max-length', type=int, default=512, help='Max sequence length')
+    train_parser.add_argument('--auto-max-length', action='store_true', help='Pick max length from token-length histogram (--max-length is the cap)')
+    train_parser.add_argument('--max-length-percentile', type=float, default=99.0, help='Percentile of texts the auto max length must cover')
+    train_parser.add_argument('--dedup-threshold', type=float, help='Remove near-duplicates above this similarity (e.g. 0.8)')
+    train_parser.add_argument('--split-method', choices=['random', 'hash'], help='How to split data when no val/test files are given')
+    train_parser.add_argument('--init-from', help='Continue from a previously fine-tuned model directory')
+    train_parser.add_argument('--resume', nargs='?', const=True, default=None, help='Resume from a checkpoint (default: latest in --output-dir)')
+    train_parser.add_argument('--since-watermark', action='store_true', help='Only train on rows appended since the --init-from model was trained')
+    train_parser.add_argument('--replay-fraction', type=float, default=config.training.replay_fraction, help='Old rows replayed per new row with --since-watermark')
+    train_parser.add_argument('--lora-rank', type=int, default=config.training.lora_rank, help='Train only rank-r LoRA adapters and the classifier head')
+    train_parser.add_argument('--async-checkpointing', action='store_true', help='Write checkpoints on a background thread')
+    train_parser.add_argument('--weights-only-checkpoints', action='store_true', help='Save only model weights in checkpoints (no exact resume)')
+    train_parser.add_argument('--async-evaluation', action='store_true', help='Evaluate each checkpoint in a separate process while training continues')
+    train_parser.add_argument('--time-budget', type=float, help='Wall-clock budget in minutes; fits steps, LR schedule and evaluations to it instead of --epochs')
+    train_parser.add_argument('--sample-budget', type=int, help='Number of training samples to process instead of --epochs')
+    train_parser.add_argument('--profile-steps', type=int, nargs=2, metavar=('START', 'COUNT'), help='Profile COUNT training steps from step START with torch.profiler (trace in <logs_dir>/profiles)')
+    train_parser.add_argument('--head-only', action='store_true', help='Train only a classification head on cached frozen-encoder embeddings')
+    train_parser.add_argument('--head-type', choices=['linear', 'mlp'], default='linear', help='Head architecture for --head-only')
+    train_parser.add_argument('--head-hidden-dim', type=int, default=256, help='Hidden size of the MLP head')
+    train_parser.add_argument('--head-epochs', type=int, default=100, help='Maximum head training epochs (early stopping on validation loss)')
+    train_parser.add_argument('--pooling', choices=['mean', 'cls', 'pooler'], default='mean', help='Embedding pooling for --head-only')
+    train_parser.add_argument('--nproc', type=int, default=1, help='Data-parallel worker processes on this node (gloo)')
+    train_parser.add_argument('--nnodes', type=int, default=1, help='Number of nodes taking part in data-parallel training')
+    train_parser.add_argument('--node-rank', type=int, default=0, help='Rank of this node')
+    train_parser.add_argument('--rendezvous', help='Rendezvous file on a shared filesystem or tcp://host:port of node 0')
+    train_parser.add_argument('--cores-per-proc', type=int, help='Cores pinned to each worker process')
+    train_parser.add_argument('--benchmark-scaling', action='store_true', help='Measure scaling efficiency from 1 to --nproc processes')
+    
+    # Tune command
+    tune_parser = subparsers.add_parser('tune', help='Search hyperparameters with successive halving')
+    tune_parser.add_argument('--model-name', default='bert-base-uncased', help='Pre-trained model name')
+    tune_parser.add_argument('--train-file', required=True, help='Training data file')
+    tune_parser.add_argument('--val-file', help='Validation data file')
+    tune_parser.add_argument('--test-file', help='Test data file')
+    tune_parser.add_argument('--num-labels', type=int, default=2, help='Number of labels')
+    tune_parser.add_argument('--output-dir', default='./models/tuning', help='Output directory for trials, leaderboard and best model')
+    tune_parser.add_argument('--num-trials', type=int, default=9, help='Number of sampled configurations')
+    tune_parser.add_argument('--min-epochs', type=int, default=1, help='Epochs every trial trains before the first pruning')
+    tune_parser.add_argument('--max-epochs', type=int, default=3, help='Epochs the surviving trials reach')
+    tune_parser.add_argument('--reduction-factor', type=int, default=3, help='Keep the top 1/N of trials at each rung')
+    tune_parser.add_argument('--max-workers', type=int, help='Maximum concurrent trials (default: one per core)')
+    tune_parser.add_argument('--cores-per-trial', type=int, help='Cores pinned to each trial')
+    tune_parser.add_argument('--metric', default='f1', choices=['f1', 'accuracy', 'precision', 'recall'], help='Validation metric to maximize')
+    tune_parser.add_argument('--min-learning-rate', type=float, default=1e-5, help='Lower bound of the learning rate range')
+    tune_parser.add_argument('--max-learning-rate', type=float, default=1e-4, help='Upper bound of the learning rate range')
+    tune_parser.add_argument('--max-warmup-ratio', type=float, default=0.2, help='Upper bound of the warmup ratio range')
+    tune_parser.add_argument('--batch-size', type=int, default=16, help='Batch size')
+    tune_parser.add_argument('--max-length', type=int, default=512, help='Max sequence length')
+    tune_parser.add_argument('--auto-max-length', action='store_true', help='Pick max length from token-length histogram (--max-length is the cap)')
+    tune_parser.add_argument('--max-length-percentile', type=float, default=99.0, help='Percentile of texts the auto max length must cover')
+    tune_parser.add_argument('--eval-steps', type=int, help='Steps between evaluations within a trial')
+    tune_parser.add_argument('--dedup-threshold', type=float, help='Remove near-duplicates above this similarity (e.g. 0.8)')
+    tune_parser.add_argument('--split-method', choices=['random', 'hash'], help='How to split data when no val/test files are given')
     
     # Predict command
     predict_parser = subparsers.add_parser('predict', help='Make predictions')
@@ -152,6 +464,59 @@ def main():
     predict_parser.add_argument('--input-file', help='File with texts to classify')
     predict_parser.add_argument('--output-file', help='Output file for predictions')
     predict_parser.add_argument('--probabilities', action='store_true', help='Return probabilities')
+    predict_parser.add_argument('--no-daemon', action='store_true', help='Load the model in-process even if the inference daemon is running')
+    predict_parser.add_argument('--profile', action='store_true', help='Profile the prediction with torch.profiler (trace in <logs_dir>/profiles)')
+    
+    # Evaluate command
+    evaluate_parser = subparsers.add_parser('evaluate', help='Evaluate a model on a labelled data file (JSON output)')
+    evaluate_parser.add_argument('--model-path', required=True, help='Path to trained model')
+    evaluate_parser.add_argument('--data-file', required=True, help='CSV, JSON or JSON Lines file with text and label columns')
+    evaluate_parser.add_argument('--batch-size', type=int, default=64, help='Texts per forward pass')
+    evaluate_parser.add_argument('--chunk-size', type=int, default=10000, help='Rows read from the file at a time')
+    evaluate_parser.add_argument('--num-bins', type=int, default=15, help='Confidence bins for calibration metrics')
+    evaluate_parser.add_argument('--max-samples', type=int, help='Evaluate at most this many samples')
+    evaluate_parser.add_argument('--adapter', help='Adapter to evaluate (adapter models only)')
+    evaluate_parser.add_argument('--bootstrap', type=int, default=0, help='Bootstrap resamples for confidence intervals (e.g. 1000)')
+    evaluate_parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the bootstrap intervals')
+    evaluate_parser.add_argument('--compare-model-path', help='Second model to compare against --model-path with a paired bootstrap')
+    evaluate_parser.add_argument('--compare-adapter', help='Adapter (name or directory) of the second model; without --compare-model-path it is loaded on the --model-path base')
+    evaluate_parser.add_argument('--output-file', help='Write the JSON results here instead of stdout')
+    evaluate_parser.add_argument('--no-daemon', action='store_true', help='Load the model in-process even if the inference daemon is running')
+    
+    # Memory benchmark command
+    memory_parser = subparsers.add_parser('benchmark-memory', help='Compare artifact size and serving memory of models/adapters')
+    memory_parser.add_argument('--model-paths', nargs='+', required=True, help='Model or adapter directories to load together')
+    
+    # Performance benchmark command
+    bench_parser = subparsers.add_parser('benchmark', help='Run the CPU performance benchmarks and compare with a baseline')
+    bench_parser.add_argument('--filter', nargs='+', help='Only run cases whose name contains one of these strings')
+    bench_parser.add_argument('--quick', action='store_true', help='Smaller data sizes and parameter grids')
+    bench_parser.add_argument('--min-time', type=float, default=1.0, help='Minimum timed seconds per case')
+    bench_parser.add_argument('--threads', type=int, default=1, help='torch threads (0 = torch default)')
+    bench_parser.add_argument('--model-path', help='Benchmark inference with this model instead of a generated tiny BERT')
+    bench_parser.add_argument('--output-file', help='Write the JSON results here')
+    bench_parser.add_argument('--baseline', default='benchmarks/baseline.json', help='Baseline results file')
+    bench_parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline instead of comparing')
+    bench_parser.add_argument('--threshold', type=float, default=0.15, help='Allowed relative slowdown before a case counts as a regression')
+    
+    # Dataset catalog command
+    catalog_parser = subparsers.add_parser('catalog', help='List datasets with precomputed statistics and preview them')
+    catalog_parser.add_argument('--data-dir', default=config.data.data_dir, help='Dataset directory')
+    catalog_parser.add_argument('--tokenizer', help='Tokenizer for token-length statistics (default: configured model)')
+    catalog_parser.add_argument('--compute', action='store_true', help='Profile datasets without current statistics')
+    catalog_parser.add_argument('--refresh', action='store_true', help='Recompute statistics even if current')
+    catalog_parser.add_argument('--stats', metavar='NAME', help='Print the statistics of one dataset (JSON)')
+    catalog_parser.add_argument('--preview', metavar='NAME', help='Print one page of a dataset')
+    catalog_parser.add_argument('--page', type=int, default=0, help='Zero-based preview page')
+    catalog_parser.add_argument('--page-size', type=int, default=20, help='Records per preview page')
+    
+    # Inference daemon command
+    daemon_parser = subparsers.add_parser('daemon', help='Run a local inference daemon shared by the CLI and UI')
+    daemon_parser.add_argument('--socket', help='Unix socket path (default: config api.daemon_socket)')
+    daemon_parser.add_argument('--preload', nargs='+', help='Model paths to load at startup')
+    daemon_parser.add_argument('--max-memory-mb', type=float, help='Memory bound of the loaded models')
+    daemon_parser.add_argument('--status', action='store_true', help='Print statistics of the running daemon')
+    daemon_parser.add_argument('--stop', action='store_true', help='Stop the running daemon')
     
     # API command
     api_parser = subparsers.add_parser('api', help='Start API server')
@@ -159,6 +524,8 @@ def main():
     api_parser.add_argument('--host', default='0.0.0.0', help='Host to bind to')
     api_parser.add_argument('--port', type=int, default=8000, help='Port to bind to')
     api_parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    api_parser.add_argument('--allow-profiling', action='store_true', help='Allow torch.profiler captures via /debug/profile and the X-Profile header')
+    api_parser.add_argument('--sample-hz', type=float, help='Run the stack sampler at this rate from startup (read it from /debug/stacks with --allow-profiling)')
     
     # Sample data command
     sample_parser = subparsers.add_parser('sample', help='Create sample dataset')
@@ -174,8 +541,20 @@ def main():
     
     if args.command == 'train':
         train_model(args)
+    elif args.command == 'tune':
+        tune_model(args)
     elif args.command == 'predict':
         predict_text(args)
+    elif args.command == 'evaluate':
+        evaluate_model(args)
+    elif args.command == 'benchmark-memory':
+        benchmark_memory(args)
+    elif args.command == 'benchmark':
+        run_benchmarks(args)
+    elif args.command == 'catalog':
+        show_catalog(args)
+    elif args.command == 'daemon':
+        manage_daemon(args)
     elif args.command == 'api':
         start_api(args)
     elif args.command == 'sample':
@@ -3,16 +3,24 @@ FastAPI application for serving the finetuned model
 """
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
+import asyncio
 import logging
 import os
+import time
 import uvicorn
 from contextlib import asynccontextmanager
 
 from ..models.predictor import ModelPredictor
+from ..utils.cache import get_resource_cache
 from ..utils.config import config
+from ..utils.profiler import RequestProfiler, ProfilingMiddleware
+from ..utils.sampler import StackSampler
+from .telemetry import InferenceTelemetry, TelemetryMiddleware, CONTENT_TYPE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +29,22 @@ logger = logging.getLogger(__name__)
 # Global predictor instance
 predictor: Optional[ModelPredictor] = None
 
+# Request, inference-stage and runtime metrics served at /metrics
+telemetry = InferenceTelemetry(cache_stats=lambda: get_resource_cache().stats())
+
+# torch.profiler captures of selected requests (only when config.api.allow_profiling)
+request_profiler = RequestProfiler()
+
+# Statistical sampler of all thread stacks (started with config.api.stack_sampling_hz or /debug/stacks)
+stack_sampler = StackSampler()
+
+
+def load_predictor(model_path: str) -> ModelPredictor:
+    """Load a model through the shared cache (switching back to a recent model is free) and attach telemetry"""
+    loaded = get_resource_cache().get_or_load('predictor', model_path, ModelPredictor)
+    loaded.telemetry = telemetry
+    return loaded
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -31,7 +55,7 @@ async def lifespan(app: FastAPI):
     try:
         model_path = config.api.model_path
         if os.path.exists(model_path):
-            predictor = ModelPredictor(model_path)
+            predictor = load_predictor(model_path)
             logger.info(f"Model loaded successfully from {model_path}")
         else:
             logger.warning(f"Model path {model_path} does not exist. API will start without a model.")
@@ -39,9 +63,15 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to load model: {e}")
         predictor = None
     
+    loop_monitor = asyncio.create_task(telemetry.monitor_event_loop())
+    if config.api.stack_sampling_hz > 0:
+        stack_sampler.start(config.api.stack_sampling_hz)
+    
     yield
     
     # Shutdown
+    loop_monitor.cancel()
+    stack_sampler.stop()
     logger.info("Shutting down API")
 
 
@@ -61,18 +91,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler, enabled=lambda: config.api.allow_profiling)
+app.add_middleware(TelemetryMiddleware, telemetry=telemetry)
 
 
 # Pydantic models for request/response
 class PredictionRequest(BaseModel):
     text: str = Field(..., description="Text to classify", min_length=1, max_length=10000)
     return_probabilities: bool = Field(False, description="Whether to return class probabilities")
+    adapter: Optional[str] = Field(None, description="Adapter to use (adapter models only)")
 
 
 class BatchPredictionRequest(BaseModel):
     texts: List[str] = Field(..., description="List of texts to classify", min_items=1, max_items=100)
     return_probabilities: bool = Field(False, description="Whether to return class probabilities")
     batch_size: int = Field(32, description="Batch size for processing", ge=1, le=100)
+    adapter: Optional[str] = Field(None, description="Adapter to use (adapter models only)")
 
 
 class PredictionResponse(BaseModel):
@@ -94,6 +128,7 @@ class ModelInfoResponse(BaseModel):
     num_labels: int
     labels: List[str]
     device: str
+    adapters: Optional[Dict[str, Any]] = None
     training_info: Optional[Dict[str, Any]] = None
 
 
@@ -137,13 +172,20 @@ async def predict(request: PredictionRequest):
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
+        telemetry.observe_queue_wait()
         result = predictor.predict_single(
             request.text, 
-            return_probabilities=request.return_probabilities
+            return_probabilities=request.return_probabilities,
+            adapter=request.adapter
         )
         
-        return PredictionResponse(**result)
+        start = time.perf_counter()
+        response = JSONResponse(jsonable_encoder(PredictionResponse(**result)))
+        telemetry.observe_stage('serialization', time.perf_counter() - start)
+        return response
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
@@ -158,24 +200,98 @@ async def predict_batch(request: BatchPredictionRequest):
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
+        telemetry.observe_queue_wait()
         results = predictor.predict_batch(
             request.texts,
             batch_size=request.batch_size,
-            return_probabilities=request.return_probabilities
+            return_probabilities=request.return_probabilities,
+            adapter=request.adapter
         )
         
+        start = time.perf_counter()
         predictions = [PredictionResponse(**result) for result in results]
-        
-        return BatchPredictionResponse(
+        response = JSONResponse(jsonable_encoder(BatchPredictionResponse(
             predictions=predictions,
             total_processed=len(predictions)
-        )
+        )))
+        telemetry.observe_stage('serialization', time.perf_counter() - start)
+        return response
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Batch prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
 
 
+@app.get("/metrics", response_class=Response)
+async def metrics():
+    """
+    Prometheus metrics: per-route request counts and latency, per-stage
+    inference latency, batch sizes, sequence lengths, model cache hits and
+    event loop lag
+    """
+    return Response(telemetry.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/debug/profile")
+async def arm_profiler(num_requests: int = 1):
+    """
+    Profile the next requests with torch.profiler; traces and operator
+    summaries are written to <logs_dir>/profiles
+    """
+    if not config.api.allow_profiling:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (start the API with --allow-profiling)")
+    if num_requests < 1:
+        raise HTTPException(status_code=400, detail="num_requests must be positive")
+    
+    request_profiler.arm(num_requests)
+    return {"message": f"Profiling the next {num_requests} requests", **request_profiler.status()}
+
+
+@app.get("/debug/profile")
+async def profiler_status():
+    """Armed request count and recent captures"""
+    if not config.api.allow_profiling:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (start the API with --allow-profiling)")
+    return request_profiler.status()
+
+
+@app.get("/debug/stacks")
+async def sampled_stacks(view: str = "folded", include_idle: bool = False, limit: int = 30):
+    """
+    Stack samples collected so far: view=folded returns folded stacks for
+    flamegraph.pl or speedscope, view=top the hottest functions, view=stats
+    the sampler state and its measured overhead
+    """
+    if not config.api.allow_profiling:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (start the API with --allow-profiling)")
+    if view == "folded":
+        return PlainTextResponse(stack_sampler.folded(include_idle=include_idle))
+    if view == "top":
+        return {"functions": stack_sampler.top(limit, include_idle=include_idle), **stack_sampler.stats()}
+    if view == "stats":
+        return stack_sampler.stats()
+    raise HTTPException(status_code=400, detail="view must be one of folded, top, stats")
+
+
+@app.post("/debug/stacks")
+async def configure_sampler(rate_hz: float = 100.0, reset: bool = False):
+    """Start the stack sampler or change its rate (rate_hz=0 stops it); reset drops collected samples"""
+    if not config.api.allow_profiling:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (start the API with --allow-profiling)")
+    if rate_hz < 0:
+        raise HTTPException(status_code=400, detail="rate_hz must not be negative")
+    
+    if reset:
+        stack_sampler.reset()
+    if rate_hz == 0:
+        stack_sampler.stop()
+    else:
+        stack_sampler.start(rate_hz)
+    return stack_sampler.stats()
+
+
 @app.get("/model/info", response_model=ModelInfoResponse)
 async def get_model_info():
     """
@@ -201,7 +317,7 @@ async def load_model(model_path: str, background_tasks: BackgroundTasks):
     def load_model_task(path: str):
         global predictor
         try:
-            predictor = ModelPredictor(path)
+            predictor = load_predictor(path)
             logger.info(f"Model loaded successfully from {path}")
         except Exception as e:
             logger.error(f"Failed to load model from {path}: {e}")
@@ -215,6 +331,41 @@ async def load_model(model_path: str, background_tasks: BackgroundTasks):
     return {"message": f"Loading model from {model_path} in background"}
 
 
+@app.post("/model/adapters/load")
+async def load_adapter(adapter_path: str, name: Optional[str] = None):
+    """
+    Load an adapter onto the shared base model of the current adapter model
+    """
+    if predictor is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if not os.path.exists(adapter_path):
+        raise HTTPException(status_code=404, detail=f"Adapter path {adapter_path} does not exist")
+    
+    try:
+        name = predictor.load_adapter(adapter_path, name=name)
+        return {"message": f"Adapter '{name}' loaded", "adapters": list(predictor.adapters.keys())}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/model/adapters/{name}/activate")
+async def activate_adapter(name: str, merge: bool = False):
+    """
+    Make an adapter the default; with merge, fold it into a private copy of the base model
+    """
+    if predictor is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    try:
+        if merge:
+            predictor.merge_adapter(name)
+        else:
+            predictor.set_adapter(name)
+        return {"message": f"Adapter '{name}' active", "merged": predictor.merged}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/predict/explain")
 async def explain_prediction(request: PredictionRequest):
     """
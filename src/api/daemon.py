@@ -0,0 +1,429 @@
+"""
+Local inference daemon serving predictions over a Unix domain socket
+
+One long-lived process owns the loaded models (in a ResourceCache, so they
+are shared by every client and evicted by memory), and the CLI and web
+interface talk to it instead of each loading their own copy. Use
+``load_predictor`` to get a predictor that goes through the daemon when it is
+running and loads the model in-process when it is not.
+
+Frames are ``!II`` (header length, payload length) followed by a UTF-8 JSON
+header and a binary payload. Requests carry the operation and its arguments
+in the header; logits come back as a raw float32 payload whose shape is in the
+response header, so batches cost 4 bytes per label instead of JSON text.
+
+Clients only need numpy: torch, transformers and the models are imported in
+the daemon (or by the in-process fallback), so a CLI prediction served by
+the daemon starts quickly. Start it with ``python main.py daemon``.
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import threading
+import socketserver
+import numpy as np
+from typing import Dict, List, Any, Optional, Callable, Tuple
+import logging
+
+from ..utils.config import config
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct('!II')
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+PROTOCOL_VERSION = 1
+
+
+class DaemonError(RuntimeError):
+    """A request failed inside the daemon"""
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError("Connection closed mid-frame")
+        received += count
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, header: Dict[str, Any], payload: bytes = b''):
+    """Send one frame: lengths, JSON header, binary payload"""
+    header_bytes = json.dumps(header, default=str).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(header_bytes), len(payload)) + header_bytes + payload)
+
+
+def recv_frame(sock: socket.socket) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """
+    Receive one frame
+    
+    Returns:
+        Tuple of (header, payload), or None if the peer closed the connection
+    """
+    prefix = sock.recv(FRAME_HEADER.size)
+    if not prefix:
+        return None
+    if len(prefix) < FRAME_HEADER.size:
+        prefix += _recv_exactly(sock, FRAME_HEADER.size - len(prefix))
+    header_size, payload_size = FRAME_HEADER.unpack(prefix)
+    if header_size > MAX_HEADER_BYTES:
+        raise ConnectionError(f"Frame header of {header_size} bytes exceeds the limit")
+    header = json.loads(_recv_exactly(sock, header_size).decode('utf-8'))
+    payload = _recv_exactly(sock, payload_size) if payload_size else b''
+    return header, payload
+
+
+def _describe(predictor) -> Dict[str, Any]:
+    """What a client needs to mirror a predictor's label handling"""
+    return {
+        'model_path': predictor.model_path,
+        'label_mappings': predictor.label_mappings,
+        'max_length': predictor.max_length,
+        'active_adapter': predictor.active_adapter,
+        'merged': predictor.merged,
+        'adapters': {
+            name: {
+                'path': adapter['path'],
+                'max_length': adapter['max_length'],
+                'label_mappings': adapter['label_mappings']
+            }
+            for name, adapter in predictor.adapters.items()
+        }
+    }
+
+
+class InferenceDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server holding models in a shared ResourceCache"""
+    
+    daemon_threads = True
+    
+    def __init__(self, socket_path: Optional[str] = None, max_memory_mb: Optional[float] = None):
+        """
+        Args:
+            socket_path: Socket to listen on (defaults to config.api.daemon_socket)
+            max_memory_mb: Memory bound of the loaded models (defaults to the resource cache size)
+        """
+        from ..utils.cache import ResourceCache
+        
+        self.socket_path = os.path.abspath(socket_path or config.api.daemon_socket)
+        self.models = ResourceCache(max_memory_mb or config.data.resource_cache_mb)
+        self.started_at = time.time()
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if DaemonClient.connect(self.socket_path) is not None:
+                raise RuntimeError(f"An inference daemon is already listening on {self.socket_path}")
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(self.socket_path)
+        
+        super().__init__(self.socket_path, DaemonRequestHandler)
+        # Only the owning user may submit requests
+        os.chmod(self.socket_path, 0o600)
+    
+    def predictor(self, model_path: str):
+        """Loaded ModelPredictor for a model path (shared by all connections)"""
+        from ..models.predictor import ModelPredictor
+        return self.models.get_or_load('predictor', model_path, ModelPredictor)
+    
+    def handle_request_header(self, header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        """Run one operation and build the response frame"""
+        with self._requests_lock:
+            self.requests += 1
+        
+        op = header.get('op')
+        if op == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'protocol': PROTOCOL_VERSION}, b''
+        if op == 'stats':
+            return {
+                'ok': True,
+                'pid': os.getpid(),
+                'uptime_seconds': time.time() - self.started_at,
+                'requests': self.requests,
+                'cache': self.models.stats()
+            }, b''
+        if op == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}, b''
+        
+        predictor = self.predictor(header['model_path'])
+        if op == 'describe':
+            return {'ok': True, 'model': _describe(predictor)}, b''
+        if op == 'info':
+            return {'ok': True, 'info': predictor.get_model_info()}, b''
+        if op == 'explain':
+            return {'ok': True, 'explanation': predictor.explain_prediction(header['text'])}, b''
+        if op == 'logits':
+            adapter = predictor._resolve_adapter(header.get('adapter'))
+            texts = header['texts']
+            batch_size = header.get('batch_size') or len(texts) or 1
+            logits = np.concatenate([
+                predictor.predict_logits(texts[i:i + batch_size], adapter=adapter)
+                for i in range(0, len(texts), batch_size)
+            ]) if texts else np.zeros((0, 0), dtype=np.float32)
+            logits = np.ascontiguousarray(logits, dtype=np.float32)
+            return {'ok': True, 'adapter': adapter, 'shape': list(logits.shape)}, logits.tobytes()
+        
+        raise ValueError(f"Unknown operation: {op}")
+    
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class DaemonRequestHandler(socketserver.BaseRequestHandler):
+    """Serve frames on one connection until the client closes it"""
+    
+    def handle(self):
+        while True:
+            try:
+                frame = recv_frame(self.request)
+            except (ConnectionError, OSError, ValueError) as e:
+                logger.warning(f"Dropping connection: {e}")
+                return
+            if frame is None:
+                return
+            
+            header, _ = frame
+            try:
+                response, response_payload = self.server.handle_request_header(header)
+            except Exception as e:
+                logger.error(f"Request {header.get('op')} failed: {e}")
+                response, response_payload = {'ok': False, 'error': str(e), 'error_type': type(e).__name__}, b''
+            
+            try:
+                send_frame(self.request, response, response_payload)
+            except OSError:
+                return
+
+
+def run_daemon(socket_path: Optional[str] = None,
+               preload: Optional[List[str]] = None,
+               max_memory_mb: Optional[float] = None):
+    """
+    Serve inference requests until stopped
+    
+    Args:
+        socket_path: Socket to listen on (defaults to config.api.daemon_socket)
+        preload: Model paths to load before accepting requests
+        max_memory_mb: Memory bound of the loaded models
+    """
+    server = InferenceDaemon(socket_path, max_memory_mb)
+    for model_path in preload or []:
+        server.predictor(model_path)
+    
+    logger.info(f"Inference daemon listening on {server.socket_path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Inference daemon stopped")
+
+
+class DaemonClient:
+    """Connection to a running inference daemon (thread-safe; requests are serialized)"""
+    
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        self.socket_path = os.path.abspath(socket_path or config.api.daemon_socket)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def connect(cls, socket_path: Optional[str] = None, timeout: Optional[float] = None) -> Optional['DaemonClient']:
+        """
+        Connect to the daemon if one is running
+        
+        Returns:
+            Connected client, or None when no daemon answers on the socket
+        """
+        client = cls(socket_path, timeout)
+        try:
+            client.request({'op': 'ping'})
+        except (OSError, ConnectionError):
+            client.close()
+            return None
+        return client
+    
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    
+    def request(self, header: Dict[str, Any], payload: bytes = b'') -> Tuple[Dict[str, Any], bytes]:
+        """
+        Send a request and wait for its response
+        
+        A connection dropped since the last request (e.g. a restarted daemon) is
+        re-established once.
+        """
+        with self._lock:
+            while True:
+                reused = self._sock is not None
+                if not reused:
+                    self._sock = self._connect()
+                try:
+                    send_frame(self._sock, header, payload)
+                    frame = recv_frame(self._sock)
+                    if frame is None:
+                        raise ConnectionError("Daemon closed the connection")
+                    break
+                except OSError as e:
+                    self._sock.close()
+                    self._sock = None
+                    if not reused or isinstance(e, socket.timeout):
+                        raise
+        
+        response, response_payload = frame
+        if not response.get('ok'):
+            error_class = ValueError if response.get('error_type') == 'ValueError' else DaemonError
+            raise error_class(response.get('error'))
+        return response, response_payload
+    
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return self.request({'op': 'stats'})[0]
+    
+    def shutdown(self):
+        self.request({'op': 'shutdown'})
+        self.close()
+
+
+def _results_from_logits(texts: List[str],
+                         logits: np.ndarray,
+                         id_to_label: Dict[str, str],
+                         return_probabilities: bool = False) -> List[Dict[str, Any]]:
+    """Prediction dictionaries in ModelPredictor's format"""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    probabilities = np.exp(shifted)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    predicted_class_ids = probabilities.argmax(axis=1)
+    
+    results = []
+    for i, text in enumerate(texts):
+        predicted_class_id = int(predicted_class_ids[i])
+        result = {
+            'text': text,
+            'predicted_label': id_to_label[str(predicted_class_id)],
+            'predicted_class_id': predicted_class_id,
+            'confidence': float(probabilities[i, predicted_class_id])
+        }
+        if return_probabilities:
+            result['probabilities'] = {
+                label_name: float(probabilities[i, int(label_id)]) for label_id, label_name in id_to_label.items()
+            }
+        results.append(result)
+    return results
+
+
+class RemotePredictor:
+    """
+    ModelPredictor stand-in that runs inference in the daemon
+    
+    Only logits cross the socket; labels and probabilities are derived here
+    the way ModelPredictor derives them.
+    """
+    
+    def __init__(self, client: DaemonClient, model_path: str):
+        self.client = client
+        # The daemon resolves paths against its own working directory, not the client's
+        self.model_path = os.path.abspath(model_path)
+        description = client.request({'op': 'describe', 'model_path': self.model_path})[0]['model']
+        self.label_mappings = description['label_mappings']
+        self.max_length = description['max_length']
+        self.active_adapter = description['active_adapter']
+        self.merged = description['merged']
+        self.adapters = description['adapters']
+    
+    def _resolve_adapter(self, adapter: Optional[str]) -> Optional[str]:
+        if adapter is None:
+            return self.active_adapter
+        if adapter not in self.adapters:
+            raise ValueError(f"Unknown adapter: {adapter}")
+        if self.merged and adapter != self.active_adapter:
+            raise ValueError(f"Adapter {self.active_adapter} is merged; other adapters are unavailable")
+        return adapter
+    
+    def predict_logits(self, texts: List[str], adapter: Optional[str] = None, batch_size: Optional[int] = None) -> np.ndarray:
+        """Raw model outputs of shape (len(texts), num_labels)"""
+        response, payload = self.client.request({
+            'op': 'logits',
+            'model_path': self.model_path,
+            'texts': list(texts),
+            'adapter': adapter,
+            'batch_size': batch_size
+        })
+        return np.frombuffer(payload, dtype=np.float32).reshape(response['shape'])
+    
+    def predict_single(self, text: str, return_probabilities: bool = False,
+                       adapter: Optional[str] = None) -> Dict[str, Any]:
+        if not text or not text.strip():
+            raise ValueError("Input text cannot be empty")
+        return self.predict_batch([text], return_probabilities=return_probabilities, adapter=adapter)[0]
+    
+    def predict_batch(self, texts: List[str],
+                      batch_size: int = 32,
+                      return_probabilities: bool = False,
+                      adapter: Optional[str] = None) -> List[Dict[str, Any]]:
+        if not texts:
+            return []
+        adapter = self._resolve_adapter(adapter)
+        label_mappings = self.adapters[adapter]['label_mappings'] if adapter else self.label_mappings
+        logits = self.predict_logits(texts, adapter=adapter, batch_size=batch_size)
+        return _results_from_logits(texts, logits, label_mappings['id_to_label'], return_probabilities)
+    
+    def explain_prediction(self, text: str) -> Dict[str, Any]:
+        return self.client.request({'op': 'explain', 'model_path': self.model_path, 'text': text})[0]['explanation']
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        info = self.client.request({'op': 'info', 'model_path': self.model_path})[0]['info']
+        info['served_by'] = self.client.socket_path
+        return info
+
+
+def load_predictor(model_path: str,
+                   socket_path: Optional[str] = None,
+                   fallback: Optional[Callable[[str], Any]] = None,
+                   use_daemon: bool = True):
+    """
+    Predictor backed by the daemon when it is running, else loaded in-process
+    
+    Args:
+        model_path: Path to the saved model
+        socket_path: Daemon socket (defaults to config.api.daemon_socket)
+        fallback: Loads the model in-process when no daemon is running
+            (defaults to ModelPredictor)
+        use_daemon: Set False to always load in-process
+    
+    Returns:
+        RemotePredictor or the fallback's predictor
+    """
+    client = DaemonClient.connect(socket_path) if use_daemon else None
+    if client is not None:
+        logger.info(f"Using inference daemon at {client.socket_path} for {model_path}")
+        return RemotePredictor(client, model_path)
+    
+    if fallback is None:
+        from ..models.predictor import ModelPredictor
+        fallback = ModelPredictor
+    return fallback(model_path)
\ No newline at end of file
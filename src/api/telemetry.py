@@ -0,0 +1,402 @@
+"""
+In-process metrics for the API, exposed in the Prometheus text format
+
+Counters, gauges and histograms are kept in plain Python objects and rendered
+on demand by ``MetricsRegistry.render()``, so the API needs no metrics
+library and everything can be inspected (``snapshot()``) without a
+Prometheus server. Recording an observation is a bisect plus a few integer
+updates under a per-series lock that is almost never contended, roughly a
+microsecond, which is far below the cost of a forward pass.
+"""
+
+import math
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Callable, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; fine enough to tell tokenization (sub-millisecond) from a forward pass
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+SEQUENCE_LENGTH_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024)
+
+INFERENCE_STAGES = ('queue_wait', 'tokenization', 'forward', 'postprocess', 'serialization')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    """Base of a named metric family with a fixed set of label names"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+    
+    def _new_series(self):
+        raise NotImplementedError
+    
+    def _get(self, labelvalues: Tuple[str, ...]):
+        # Fast path: dict lookups are atomic, so existing series need no lock
+        series = self._series.get(labelvalues)
+        if series is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+            with self._lock:
+                series = self._series.setdefault(labelvalues, self._new_series())
+        return series
+    
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Optional[Tuple[str, str]], float]]:
+        raise NotImplementedError
+    
+    def _collect(self, function: Callable[[], Dict[Tuple[str, ...], float]]) -> List[Tuple[Tuple[str, ...], float]]:
+        """(label values, value) pairs from a collection-time function; a failing function yields none"""
+        try:
+            values = function()
+        except Exception as e:
+            logger.warning(f"Could not collect {self.name}: {e}")
+            values = {}
+        return sorted(values.items())
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labelvalues, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labelvalues, extra)} {_format_value(value)}")
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', 'lock')
+    
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, incremented here or read from a function at collection time"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        """
+        Args:
+            function: Called at collection to produce {label values: total}
+                (replaces inc for totals kept elsewhere, such as cache hits)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+    
+    def _new_series(self):
+        return _Value()
+    
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        series = self._get(labelvalues)
+        with series.lock:
+            series.value += amount
+    
+    def value(self, *labelvalues: str) -> float:
+        return self._get(labelvalues).value
+    
+    def samples(self):
+        if self.function is not None:
+            return [("_total", labels, None, value) for labels, value in self._collect(self.function)]
+        return [("_total", labels, None, series.value) for labels, series in sorted(self._series.items())]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a function at collection time"""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        """
+        Args:
+            function: Called at collection to produce {label values: value}
+                (replaces set/inc for derived values such as cache statistics)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+    
+    def _new_series(self):
+        return _Value()
+    
+    def set(self, value: float, *labelvalues: str):
+        self._get(labelvalues).value = value
+    
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        series = self._get(labelvalues)
+        with series.lock:
+            series.value += amount
+    
+    def dec(self, *labelvalues: str, amount: float = 1.0):
+        self.inc(*labelvalues, amount=-amount)
+    
+    def samples(self):
+        if self.function is not None:
+            return [("", labels, None, value) for labels, value in self._collect(self.function)]
+        return [("", labels, None, series.value) for labels, series in sorted(self._series.items())]
+
+
+class _HistogramSeries:
+    __slots__ = ('counts', 'sum', 'lock')
+    
+    def __init__(self, num_buckets: int):
+        self.counts = [0] * (num_buckets + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed cumulative buckets"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_series(self):
+        return _HistogramSeries(len(self.buckets))
+    
+    def observe(self, value: float, *labelvalues: str):
+        series = self._get(labelvalues)
+        # Buckets are upper bounds (le), so a value equal to a bound belongs to it
+        index = bisect_left(self.buckets, value)
+        with series.lock:
+            series.counts[index] += 1
+            series.sum += value
+    
+    def summary(self, *labelvalues: str) -> Dict[str, Any]:
+        """Count, sum, mean and approximate quantiles (bucket upper bounds) of one series"""
+        series = self._get(labelvalues)
+        with series.lock:
+            counts, total = list(series.counts), series.sum
+        count = sum(counts)
+        
+        def quantile(q: float) -> Optional[float]:
+            if not count:
+                return None
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                if cumulative >= q * count:
+                    return bound
+            return math.inf
+        
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else None,
+            'p50': quantile(0.5),
+            'p90': quantile(0.9),
+            'p99': quantile(0.99)
+        }
+    
+    def samples(self):
+        samples = []
+        for labels, series in sorted(self._series.items()):
+            with series.lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", labels, ("le", _format_value(bound)), cumulative))
+            samples.append(("_sum", labels, None, total))
+            samples.append(("_count", labels, None, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+    
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Current samples as plain data, e.g. for tests or the UI"""
+        return {
+            name: [
+                {'suffix': suffix, 'labels': dict(zip(metric.labelnames, labels), **dict([extra] if extra else [])),
+                 'value': value}
+                for suffix, labels, extra, value in metric.samples()
+            ]
+            for name, metric in self.metrics.items()
+        }
+
+
+# Monotonic start time of the HTTP request being handled (set by the API middleware)
+request_started_at: ContextVar[Optional[float]] = ContextVar('request_started_at', default=None)
+
+
+class InferenceTelemetry:
+    """
+    Request, inference-stage and runtime metrics of the API
+    
+    ModelPredictor reports tokenization, forward and post-processing times and
+    batch shapes through observe_stage()/observe_batch() when its telemetry
+    attribute is set; the API records queue wait, serialization and per-route
+    request latency.
+    """
+    
+    def __init__(self, cache_stats: Optional[Callable[[], Dict[str, Any]]] = None):
+        """
+        Args:
+            cache_stats: Returns ResourceCache.stats() of the model cache, read at collection
+        """
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            "http_requests", "HTTP requests by route, method and status", ("route", "method", "status"))
+        self.request_seconds = self.registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", ("route", "method"))
+        self.in_progress = self.registry.gauge(
+            "http_requests_in_progress", "HTTP requests being handled")
+        self.stage_seconds = self.registry.histogram(
+            "inference_stage_duration_seconds", "Time spent in each inference stage per request or batch", ("stage",))
+        self.batch_size = self.registry.histogram(
+            "inference_batch_size", "Texts per forward pass", buckets=BATCH_SIZE_BUCKETS)
+        self.sequence_length = self.registry.histogram(
+            "inference_sequence_length", "Padded token length per forward pass", buckets=SEQUENCE_LENGTH_BUCKETS)
+        self.texts = self.registry.counter(
+            "inference_texts", "Texts run through the model")
+        self.loop_lag = self.registry.histogram(
+            "event_loop_lag_seconds", "Delay of event loop wake-ups beyond their scheduled time")
+        
+        self.cache_stats = cache_stats
+        if cache_stats is not None:
+            self.registry.counter("model_cache_hits", "Model cache hits",
+                                  function=lambda: {(): cache_stats()['hits']})
+            self.registry.counter("model_cache_misses", "Model cache misses (loads)",
+                                  function=lambda: {(): cache_stats()['misses']})
+            self.registry.gauge("model_cache_hit_ratio", "Fraction of model lookups served from the cache",
+                                function=self._cache_hit_ratio)
+            self.registry.gauge("model_cache_memory_mb", "Estimated memory of cached models",
+                                function=lambda: {(): cache_stats()['memory_mb']})
+    
+    def _cache_hit_ratio(self) -> Dict[Tuple[str, ...], float]:
+        stats = self.cache_stats()
+        lookups = stats['hits'] + stats['misses']
+        return {(): stats['hits'] / lookups if lookups else 0.0}
+    
+    def observe_stage(self, stage: str, seconds: float):
+        self.stage_seconds.observe(seconds, stage)
+    
+    def observe_batch(self, batch_size: int, sequence_length: int):
+        self.batch_size.observe(batch_size)
+        self.sequence_length.observe(sequence_length)
+        self.texts.inc(amount=batch_size)
+    
+    def observe_queue_wait(self):
+        """Record the time since the current request arrived (call when its inference starts)"""
+        started_at = request_started_at.get()
+        if started_at is not None:
+            self.observe_stage('queue_wait', time.perf_counter() - started_at)
+    
+    def observe_request(self, route: str, method: str, status: int, seconds: float):
+        self.requests.inc(route, method, str(status))
+        self.request_seconds.observe(seconds, route, method)
+    
+    async def monitor_event_loop(self, interval: float = 0.25):
+        """Sample event loop lag until cancelled (run as a background task)"""
+        while True:
+            scheduled = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(max(0.0, time.perf_counter() - scheduled))
+    
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, mean and approximate quantiles per inference stage"""
+        return {stage: self.stage_seconds.summary(stage) for stage in INFERENCE_STAGES}
+    
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware recording request counts, latency and in-flight requests
+    
+    A plain ASGI wrapper rather than BaseHTTPMiddleware, which would add a task
+    and response streaming per request. Latency is labelled by the matched
+    route template (e.g. /model/adapters/{name}/activate), so path parameters
+    do not create new series; unmatched paths share one label.
+    """
+    
+    def __init__(self, app, telemetry: InferenceTelemetry):
+        self.app = app
+        self.telemetry = telemetry
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        token = request_started_at.set(start)
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        self.telemetry.in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.telemetry.in_progress.dec()
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            self.telemetry.observe_request(route, scope['method'], status, time.perf_counter() - start)
+            request_started_at.reset(token)
\ No newline at end of file
@@ -0,0 +1,344 @@
+"""
+Dataset catalog with precomputed statistics and paginated previews
+"""
+
+import os
+import io
+import csv
+import json
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from .loader import DataLoader
+from .profiling import profile_token_lengths
+from ..utils.config import config
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR_NAME = ".catalog"
+CATALOG_FORMATS = ('.csv', '.jsonl', '.json')
+STATS_VERSION = 1
+
+
+class _PositionedLines:
+    """Iterate over a binary file's lines while tracking the byte position"""
+    
+    def __init__(self, f):
+        self.f = f
+        self.position = f.tell()
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.position += len(line)
+        return line.decode('utf-8')
+
+
+def _record_offsets(file_path: str, stride: int) -> Dict[str, Any]:
+    """
+    Byte offset of every stride-th record of a CSV or JSON Lines file
+    
+    CSV records are delimited with the csv module, so quoted fields spanning
+    several lines stay one record.
+    
+    Returns:
+        Dictionary with the record count, offsets and (for CSV) the column names
+    """
+    offsets, num_records, columns = [], 0, None
+    with open(file_path, 'rb') as f:
+        if file_path.lower().endswith('.csv'):
+            lines = _PositionedLines(f)
+            reader = csv.reader(lines)
+            columns = next(reader, [])
+            while True:
+                start = lines.position
+                if next(reader, None) is None:
+                    break
+                if num_records % stride == 0:
+                    offsets.append(start)
+                num_records += 1
+        else:
+            start = 0
+            for line in f:
+                if line.strip():
+                    if num_records % stride == 0:
+                        offsets.append(start)
+                    num_records += 1
+                start += len(line)
+    return {'num_records': num_records, 'offsets': offsets, 'columns': columns}
+
+
+def _load_tokenizer(name: str):
+    """Hugging Face tokenizer, or None (whitespace tokens) when it cannot be loaded"""
+    from transformers import AutoTokenizer
+    try:
+        return AutoTokenizer.from_pretrained(name)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load tokenizer {name} ({e}); counting whitespace tokens instead")
+        return None
+
+
+class _WhitespaceTokenizer:
+    """Stand-in for profile_token_lengths when no model tokenizer is available"""
+    
+    model_max_length = None
+    
+    def __call__(self, texts: List[str], **kwargs) -> Dict[str, List[List[str]]]:
+        return {'input_ids': [text.split() for text in texts]}
+
+
+class DatasetCatalog:
+    """
+    Statistics and previews for the datasets in a directory
+    
+    Statistics (row count, label distribution, token-length histogram and
+    duplicate rate) are computed in one streaming pass per file version and
+    stored in a small JSON sidecar under ``<data_dir>/.catalog``, so listing
+    reads only those; a file is re-profiled only when its size or modification
+    time changes. A second sidecar (``.index.npy``) holds the byte offset of
+    every index_stride-th record, so a preview page is read by seeking close to
+    it instead of parsing the file from the start.
+    """
+    
+    def __init__(self,
+                 data_dir: Optional[str] = None,
+                 tokenizer_name: Optional[str] = None,
+                 index_stride: int = 1000,
+                 token_sample_size: int = 10000,
+                 chunk_size: int = 50000):
+        """
+        Args:
+            data_dir: Dataset directory (defaults to config.data.data_dir)
+            tokenizer_name: Tokenizer for the token-length histogram (defaults
+                to config.training.model_name)
+            index_stride: Records between indexed byte offsets
+            token_sample_size: Texts tokenized for the histogram (uniform sample)
+            chunk_size: Rows per chunk in the statistics pass
+        """
+        self.data_dir = data_dir or config.data.data_dir
+        self.catalog_dir = os.path.join(self.data_dir, CATALOG_DIR_NAME)
+        self.tokenizer_name = tokenizer_name or config.training.model_name
+        self.index_stride = index_stride
+        self.token_sample_size = token_sample_size
+        self.chunk_size = chunk_size
+        self.data_loader = DataLoader()
+        self._tokenizer = None
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.data_dir, name)
+    
+    def _sidecar_path(self, name: str) -> str:
+        return os.path.join(self.catalog_dir, f"{name}.stats.json")
+    
+    def _index_path(self, name: str) -> str:
+        return os.path.join(self.catalog_dir, f"{name}.index.npy")
+    
+    @staticmethod
+    def _version(file_path: str) -> Dict[str, int]:
+        stat = os.stat(file_path)
+        return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    
+    def dataset_names(self) -> List[str]:
+        """Supported data files in the directory, sorted by name"""
+        if not os.path.isdir(self.data_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.data_dir)
+            if name.lower().endswith(CATALOG_FORMATS) and os.path.isfile(self._path(name))
+        )
+    
+    def cached_stats(self, name: str) -> Optional[Dict[str, Any]]:
+        """Sidecar statistics if they match the file's current version and settings"""
+        try:
+            with open(self._sidecar_path(name), 'r') as f:
+                stats = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        current = (stats.get('stats_version') == STATS_VERSION and
+                   stats.get('version') == self._version(self._path(name)) and
+                   stats.get('tokenizer') == self.tokenizer_name and
+                   stats.get('index_stride') == self.index_stride)
+        return stats if current else None
+    
+    def stats(self, name: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Statistics of a dataset, computed and stored if missing or stale
+        
+        Args:
+            name: File name within the data directory
+            refresh: Recompute even if the sidecar is current
+        
+        Returns:
+            Statistics dictionary
+        """
+        stats = None if refresh else self.cached_stats(name)
+        if stats is None:
+            stats, offsets = self._compute_stats(name)
+            os.makedirs(self.catalog_dir, exist_ok=True)
+            # The index goes first: current statistics imply a matching index
+            tmp_path = f"{self._index_path(name)}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, np.asarray(offsets, dtype=np.int64))
+            os.replace(tmp_path, self._index_path(name))
+            tmp_path = f"{self._sidecar_path(name)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp_path, self._sidecar_path(name))
+        return stats
+    
+    def _compute_stats(self, name: str) -> Tuple[Dict[str, Any], List[int]]:
+        """One streaming pass for the statistics plus one for the record offsets"""
+        file_path = self._path(name)
+        version = self._version(file_path)
+        start = time.perf_counter()
+        text_column, label_column = self.data_loader.text_column, self.data_loader.label_column
+        
+        rng = np.random.default_rng(config.training.seed)
+        label_counts = Counter()
+        pair_hashes, text_hashes = [], []
+        sample_texts, sample_keys = np.array([], dtype=object), np.array([], dtype=np.float64)
+        num_rows, total_chars = 0, 0
+        
+        for chunk in self.data_loader.iter_chunks(file_path, chunk_size=self.chunk_size):
+            texts = chunk[text_column].astype(str)
+            labels = chunk[label_column].astype(str)
+            num_rows += len(chunk)
+            total_chars += int(texts.str.len().sum())
+            label_counts.update(labels.value_counts().to_dict())
+            text_hashes.append(pd.util.hash_pandas_object(texts, index=False).to_numpy())
+            pair_hashes.append(pd.util.hash_pandas_object(pd.DataFrame({'t': texts, 'l': labels}), index=False).to_numpy())
+            
+            # Bottom-k sampling: keep the texts with the smallest random keys
+            sample_texts = np.concatenate([sample_texts, texts.to_numpy(dtype=object)])
+            sample_keys = np.concatenate([sample_keys, rng.random(len(chunk))])
+            if len(sample_keys) > self.token_sample_size:
+                keep = np.argpartition(sample_keys, self.token_sample_size)[:self.token_sample_size]
+                sample_texts, sample_keys = sample_texts[keep], sample_keys[keep]
+        
+        def duplicate_rate(hashes: List[np.ndarray]) -> float:
+            if not num_rows:
+                return 0.0
+            return 1.0 - len(np.unique(np.concatenate(hashes))) / num_rows
+        
+        if self._tokenizer is None:
+            self._tokenizer = _load_tokenizer(self.tokenizer_name) or _WhitespaceTokenizer()
+        token_lengths = profile_token_lengths(
+            list(sample_texts), self._tokenizer, sample_size=None, upper_bound=config.training.max_length
+        )
+        token_lengths['tokenizer'] = (
+            'whitespace' if isinstance(self._tokenizer, _WhitespaceTokenizer) else self.tokenizer_name
+        )
+        
+        index = (_record_offsets(file_path, self.index_stride)
+                 if not name.lower().endswith('.json') else {'num_records': None, 'offsets': [], 'columns': None})
+        
+        stats = {
+            'stats_version': STATS_VERSION,
+            'name': name,
+            'format': os.path.splitext(name)[1].lower().lstrip('.'),
+            'version': version,
+            'tokenizer': self.tokenizer_name,
+            'index_stride': self.index_stride,
+            'num_records': index['num_records'],
+            'num_rows': num_rows,
+            'num_labels': len(label_counts),
+            'label_distribution': dict(label_counts.most_common()),
+            'mean_text_chars': total_chars / num_rows if num_rows else 0.0,
+            'duplicate_rate': duplicate_rate(pair_hashes),
+            'duplicate_text_rate': duplicate_rate(text_hashes),
+            'token_lengths': token_lengths,
+            'columns': index['columns'],
+            'computed_at': time.time(),
+            'compute_seconds': time.perf_counter() - start
+        }
+        logger.info(f"Profiled {name}: {num_rows} rows, {len(label_counts)} labels "
+                    f"in {stats['compute_seconds']:.1f}s")
+        return stats, index['offsets']
+    
+    def list_datasets(self, compute_missing: bool = False) -> List[Dict[str, Any]]:
+        """
+        One summary row per dataset, from the sidecars
+        
+        Args:
+            compute_missing: Profile datasets whose statistics are missing or
+                stale (otherwise their statistics fields are None)
+        
+        Returns:
+            List of dictionaries with name, size, modification time and statistics
+        """
+        rows = []
+        for name in self.dataset_names():
+            stats = self.stats(name) if compute_missing else self.cached_stats(name)
+            stat = os.stat(self._path(name))
+            rows.append({
+                'name': name,
+                'size_bytes': stat.st_size,
+                'modified': stat.st_mtime,
+                'profiled': stats is not None,
+                'num_rows': stats['num_rows'] if stats else None,
+                'num_labels': stats['num_labels'] if stats else None,
+                'duplicate_rate': stats['duplicate_rate'] if stats else None,
+                'mean_tokens': stats['token_lengths']['mean_length'] if stats else None
+            })
+        return rows
+    
+    def preview(self, name: str, page: int = 0, page_size: int = 20) -> pd.DataFrame:
+        """
+        One page of raw records, read by seeking to the nearest indexed offset
+        
+        JSON array files have no record offsets and are parsed whole.
+        
+        Args:
+            name: File name within the data directory
+            page: Zero-based page number
+            page_size: Records per page
+        
+        Returns:
+            DataFrame of the page's records (empty past the end)
+        """
+        stats = self.stats(name)
+        file_path = self._path(name)
+        first = page * page_size
+        
+        if stats['format'] == 'json':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return pd.DataFrame(json.load(f)).iloc[first:first + page_size].reset_index(drop=True)
+        
+        offsets = np.load(self._index_path(name), mmap_mode='r')
+        anchor = first // self.index_stride
+        if anchor >= len(offsets):
+            return pd.DataFrame(columns=stats['columns'] or [])
+        skip = first - anchor * self.index_stride
+        
+        with open(file_path, 'rb') as f:
+            f.seek(int(offsets[anchor]))
+            if stats['format'] == 'csv':
+                text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+                df = pd.read_csv(text, header=None, names=stats['columns'], skiprows=skip, nrows=page_size)
+                text.detach()
+                return df
+            
+            records = []
+            for line in f:
+                if not line.strip():
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                records.append(json.loads(line))
+                if len(records) == page_size:
+                    break
+            return pd.DataFrame(records)
+    
+    def num_pages(self, name: str, page_size: int = 20) -> int:
+        """Number of preview pages of a dataset"""
+        stats = self.stats(name)
+        num_records = stats['num_records'] if stats['num_records'] is not None else stats['num_rows']
+        return max(1, -(-num_records // page_size))
\ No newline at end of file
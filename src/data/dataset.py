@@ -3,9 +3,10 @@ Custom dataset classes for PyTorch training
 """
 
 import torch
+import numpy as np
 from torch.utils.data import Dataset
 from transformers import AutoTokenizer
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 import pandas as pd
 import logging
 
@@ -16,10 +17,11 @@ class TextClassificationDataset(Dataset):
     """Custom dataset for text classification tasks"""
     
     def __init__(self, 
-                 texts: List[str], 
-                 labels: List[int], 
+                 texts: Sequence[str], 
+                 labels: Sequence[int], 
                  tokenizer: AutoTokenizer,
-                 max_length: int = 512):
+                 max_length: int = 512,
+                 indices: Optional[np.ndarray] = None):
         """
         Initialize the dataset
         
@@ -28,18 +30,23 @@ class TextClassificationDataset(Dataset):
             labels: List of corresponding labels (as integers)
             tokenizer: Hugging Face tokenizer
             max_length: Maximum sequence length
+            indices: Optional row positions selecting a split of texts/labels
+                without copying them
         """
         self.texts = texts
         self.labels = labels
         self.tokenizer = tokenizer
         self.max_length = max_length
+        self.indices = indices
         
         if len(texts) != len(labels):
             raise ValueError("Number of texts and labels must match")
         
-        logger.info(f"Created dataset with {len(self.texts)} samples")
+        logger.info(f"Created dataset with {len(self)} samples")
     
     def __len__(self) -> int:
+        if self.indices is not None:
+            return len(self.indices)
         return len(self.texts)
     
     def __getitem__(self, idx: int) -> Dict[str, torch.Tensor]:
@@ -52,8 +59,11 @@ class TextClassificationDataset(Dataset):
         Returns:
             Dictionary containing input_ids, attention_mask, and labels
         """
+        if self.indices is not None:
+            idx = int(self.indices[idx])
+        
         text = str(self.texts[idx])
-        label = self.labels[idx]
+        label = int(self.labels[idx])
         
         # Tokenize the text
         encoding = self.tokenizer(
@@ -77,7 +87,8 @@ class TextClassificationDataset(Dataset):
                       text_column: str = 'text',
                       label_column: str = 'label',
                       label_to_id: Dict[str, int] = None,
-                      max_length: int = 512):
+                      max_length: int = 512,
+                      indices: Optional[np.ndarray] = None):
         """
         Create dataset from pandas DataFrame
         
@@ -88,19 +99,133 @@ class TextClassificationDataset(Dataset):
             label_column: Name of the label column
             label_to_id: Mapping from label strings to integers
             max_length: Maximum sequence length
+            indices: Optional row positions to use from df (e.g. from
+                DataLoader.split_indices)
             
         Returns:
             TextClassificationDataset instance
         """
-        texts = df[text_column].tolist()
+        texts = df[text_column].to_numpy()
         
         if label_to_id:
-            labels = [label_to_id[label] for label in df[label_column]]
+            labels = df[label_column].map(label_to_id)
+            if labels.isna().any():
+                unknown = df.loc[labels.isna(), label_column].unique().tolist()
+                raise ValueError(f"Unknown labels: {unknown}")
+            labels = labels.to_numpy(dtype=np.int64)
         else:
             # Assume labels are already integers
-            labels = df[label_column].tolist()
+            labels = df[label_column].to_numpy()
+        
+        return cls(texts, labels, tokenizer, max_length, indices=indices)
+
+
+class TokenizedDataset(Dataset):
+    """
+    Dataset of pre-tokenized, padded tensors
+    
+    Tokenizing once and saving the tensors lets several training processes
+    share a dataset: ``load`` memory-maps the file, so the pages are shared
+    through the OS page cache instead of being copied into every process.
+    """
+    
+    def __init__(self,
+                 input_ids: torch.Tensor,
+                 attention_mask: torch.Tensor,
+                 labels: torch.Tensor,
+                 max_length: int):
+        """
+        Initialize the dataset
+        
+        Args:
+            input_ids: Token ids of shape (num_samples, max_length)
+            attention_mask: Attention mask of shape (num_samples, max_length)
+            labels: Label ids of shape (num_samples,)
+            max_length: Sequence length the texts were padded/truncated to
+        """
+        if not len(input_ids) == len(attention_mask) == len(labels):
+            raise ValueError("Number of input_ids, attention masks and labels must match")
+        
+        self.input_ids = input_ids
+        self.attention_mask = attention_mask
+        self.labels = labels
+        self.max_length = max_length
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    def __getitem__(self, idx: int) -> Dict[str, torch.Tensor]:
+        return {
+            'input_ids': self.input_ids[idx].long(),
+            'attention_mask': self.attention_mask[idx].long(),
+            'labels': self.labels[idx].long()
+        }
+    
+    @classmethod
+    def from_dataset(cls, dataset: TextClassificationDataset, batch_size: int = 1000) -> 'TokenizedDataset':
+        """
+        Tokenize every sample of a TextClassificationDataset up front
+        
+        Args:
+            dataset: Dataset to tokenize
+            batch_size: Number of texts tokenized per call
         
-        return cls(texts, labels, tokenizer, max_length)
+        Returns:
+            TokenizedDataset instance
+        """
+        positions = dataset.indices if dataset.indices is not None else np.arange(len(dataset.texts))
+        input_ids, attention_mask = [], []
+        
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start + batch_size]
+            encoding = dataset.tokenizer(
+                [str(dataset.texts[i]) for i in batch],
+                truncation=True,
+                padding='max_length',
+                max_length=dataset.max_length,
+                return_tensors='pt'
+            )
+            input_ids.append(encoding['input_ids'].to(torch.int32))
+            attention_mask.append(encoding['attention_mask'].to(torch.int8))
+        
+        if input_ids:
+            input_ids = torch.cat(input_ids)
+            attention_mask = torch.cat(attention_mask)
+        else:
+            input_ids = torch.zeros((0, dataset.max_length), dtype=torch.int32)
+            attention_mask = torch.zeros((0, dataset.max_length), dtype=torch.int8)
+        labels = torch.as_tensor(np.asarray(dataset.labels)[positions].astype(np.int64))
+        
+        return cls(input_ids, attention_mask, labels, dataset.max_length)
+    
+    def save(self, path: str):
+        """Save the tensors to a single file"""
+        torch.save({
+            'input_ids': self.input_ids,
+            'attention_mask': self.attention_mask,
+            'labels': self.labels,
+            'max_length': self.max_length
+        }, path)
+        logger.info(f"Saved {len(self)} tokenized samples to {path}")
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'TokenizedDataset':
+        """
+        Load a dataset written by save
+        
+        Args:
+            path: File written by save
+            mmap: Memory-map the tensors instead of reading them into memory
+        
+        Returns:
+            TokenizedDataset instance
+        """
+        try:
+            data = torch.load(path, mmap=mmap, weights_only=True)
+        except TypeError:
+            # torch<2.1 has no mmap/weights_only arguments
+            data = torch.load(path)
+        return cls(data['input_ids'], data['attention_mask'], data['labels'], data['max_length'])
 
 
 class DataCollator:
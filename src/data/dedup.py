@@ -0,0 +1,264 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Mask used to fold 64-bit values down to 32 bits
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def normalize_texts(texts: Union[pd.Series, List[str]]) -> pd.Series:
+    """
+    Normalize texts so that casing, punctuation and spacing do not matter
+    
+    Args:
+        texts: Input texts
+    
+    Returns:
+        Series of lowercased texts with punctuation removed and whitespace collapsed
+    """
+    texts = pd.Series(texts, dtype=object).astype(str)
+    return (
+        texts.str.lower()
+        .str.replace(r"[^\w\s]", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
+class NearDuplicateDetector:
+    """Cluster near-duplicate texts using MinHash and locality-sensitive hashing"""
+    
+    def __init__(self,
+                 threshold: float = 0.8,
+                 num_perm: int = 128,
+                 shingle_size: int = 5,
+                 seed: int = 42,
+                 chunk_shingles: int = 1_000_000):
+        """
+        Initialize the detector
+        
+        Args:
+            threshold: Estimated Jaccard similarity above which two texts are near-duplicates
+            num_perm: Number of MinHash permutations (signature length)
+            shingle_size: Length of the character shingles
+            seed: Random seed for the hash functions
+            chunk_shingles: Approximate number of shingles hashed per chunk (bounds memory)
+        """
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("Threshold must be in (0, 1]")
+        
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.chunk_shingles = chunk_shingles
+        self.num_bands, self.rows_per_band = self._choose_bands(threshold, num_perm)
+        
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd 64-bit multipliers and 64-bit offsets
+        self._perm_a = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._perm_b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._band_mult = rng.integers(0, 2**63, size=self.rows_per_band, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """Pick the band layout whose S-curve midpoint is closest to the threshold"""
+        best = None
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            midpoint = (1.0 / bands) ** (1.0 / rows)
+            score = abs(midpoint - threshold)
+            if best is None or score < best[0]:
+                best = (score, bands, rows)
+        return best[1], best[2]
+    
+    def compute_signatures(self, texts: Union[pd.Series, List[str]]) -> np.ndarray:
+        """
+        Compute MinHash signatures of character shingles
+        
+        Args:
+            texts: Input texts
+        
+        Returns:
+            Array of shape (num_texts, num_perm) with uint32 signatures
+        """
+        normalized = normalize_texts(texts)
+        k = self.shingle_size
+        # Pad short texts so every text yields at least one shingle
+        encoded = [t.ljust(k).encode('utf-8') for t in normalized]
+        
+        signatures = np.empty((len(encoded), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(encoded):
+            # Grow the chunk until it holds roughly chunk_shingles shingles
+            end, total = start, 0
+            while end < len(encoded) and (total == 0 or total < self.chunk_shingles):
+                total += len(encoded[end]) - k + 1
+                end += 1
+            signatures[start:end] = self._signature_chunk(encoded[start:end])
+            start = end
+        
+        return signatures
+    
+    def _signature_chunk(self, encoded: List[bytes]) -> np.ndarray:
+        """Compute signatures for a chunk of UTF-8 encoded texts"""
+        k = self.shingle_size
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+        
+        # Polynomial hash of every k-byte window in the concatenated buffer
+        num_windows = len(buffer) - k + 1
+        hashes = np.zeros(num_windows, dtype=np.uint64)
+        for j in range(k):
+            hashes = hashes * np.uint64(1099511628211) + buffer[j:j + num_windows]
+        hashes = (hashes ^ (hashes >> np.uint64(32))) & _MASK32
+        
+        # Keep only windows that lie entirely inside one text
+        text_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        offsets = np.arange(num_windows) - np.repeat(text_starts, lengths)[:num_windows]
+        valid = offsets <= np.repeat(lengths - k, lengths)[:num_windows]
+        hashes = hashes[valid]
+        shingle_starts = np.concatenate(([0], np.cumsum(lengths - k + 1)[:-1]))
+        
+        # Permutation-major layout keeps reduceat on contiguous memory
+        block = 16
+        signatures = np.empty((self.num_perm, len(encoded)), dtype=np.uint32)
+        permuted = np.empty((block, len(hashes)), dtype=np.uint64)
+        for p in range(0, self.num_perm, block):
+            a = self._perm_a[p:p + block, None]
+            b = self._perm_b[p:p + block, None]
+            out = permuted[:len(a)]
+            np.multiply(hashes[None, :], a, out=out)
+            out += b
+            out >>= np.uint64(32)
+            signatures[p:p + block] = np.minimum.reduceat(out, shingle_starts, axis=1)
+        
+        return signatures.T
+    
+    def find_clusters(self, texts: Union[pd.Series, List[str]]) -> np.ndarray:
+        """
+        Cluster near-duplicate texts
+        
+        Args:
+            texts: Input texts
+        
+        Returns:
+            Array mapping each text to its cluster id, which is the index of the
+            first text in that cluster
+        """
+        n = len(texts)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        signatures = self.compute_signatures(texts)
+        edges_u, edges_v = [], []
+        r = self.rows_per_band
+        
+        for band in range(self.num_bands):
+            band_sig = signatures[:, band * r:(band + 1) * r].astype(np.uint64)
+            keys = (band_sig * self._band_mult[None, :]).sum(axis=1, dtype=np.uint64)
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            
+            # Chain each bucket member to its predecessor in the bucket
+            same = sorted_keys[1:] == sorted_keys[:-1]
+            u = order[1:][same]
+            v = order[:-1][same]
+            if len(u) == 0:
+                continue
+            
+            # Verify candidates with the estimated Jaccard similarity
+            similarity = (signatures[u] == signatures[v]).mean(axis=1)
+            keep = similarity >= self.threshold
+            edges_u.append(u[keep])
+            edges_v.append(v[keep])
+        
+        labels = np.arange(n, dtype=np.int64)
+        if edges_u:
+            labels = self._connected_components(labels, np.concatenate(edges_u), np.concatenate(edges_v))
+        
+        return labels
+    
+    @staticmethod
+    def _connected_components(labels: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """Label connected components with their smallest member index"""
+        while True:
+            root_u, root_v = labels[u], labels[v]
+            smallest = np.minimum(root_u, root_v)
+            updated = labels.copy()
+            np.minimum.at(updated, root_u, smallest)
+            np.minimum.at(updated, root_v, smallest)
+            
+            # Pointer jumping until every node points at its root
+            while True:
+                jumped = updated[updated]
+                if np.array_equal(jumped, updated):
+                    break
+                updated = jumped
+            
+            if np.array_equal(updated, labels):
+                return labels
+            labels = updated
+    
+    def deduplicate(self, df: pd.DataFrame, text_column: str = 'text') -> pd.DataFrame:
+        """
+        Keep one representative (the first occurrence) per near-duplicate cluster
+        
+        Args:
+            df: Input DataFrame
+            text_column: Name of the text column
+        
+        Returns:
+            DataFrame without near-duplicates
+        """
+        clusters = self.find_clusters(df[text_column])
+        is_representative = clusters == np.arange(len(df))
+        
+        removed = len(df) - int(is_representative.sum())
+        if removed > 0:
+            logger.info(f"Removed {removed} near-duplicate samples")
+        
+        return df[is_representative]
+    
+    def drop_overlapping(self,
+                         reference_dfs: List[pd.DataFrame],
+                         df: pd.DataFrame,
+                         text_column: str = 'text') -> pd.DataFrame:
+        """
+        Drop rows whose near-duplicate cluster also contains a reference row
+        
+        Used to stop near-duplicates from leaking across separately loaded splits.
+        
+        Args:
+            reference_dfs: DataFrames that take precedence (e.g. the training set)
+            df: DataFrame to filter
+            text_column: Name of the text column
+        
+        Returns:
+            Filtered DataFrame
+        """
+        reference_dfs = [ref for ref in reference_dfs if ref is not None and len(ref)]
+        if not reference_dfs or len(df) == 0:
+            return df
+        
+        reference_texts = pd.concat([ref[text_column] for ref in reference_dfs], ignore_index=True)
+        num_reference = len(reference_texts)
+        texts = pd.concat([reference_texts, df[text_column]], ignore_index=True)
+        
+        # Cluster ids are the smallest member index, so any cluster containing a
+        # reference row has an id below num_reference
+        clusters = self.find_clusters(texts)[num_reference:]
+        leaked = clusters < num_reference
+        
+        if leaked.any():
+            logger.info(f"Removed {int(leaked.sum())} samples that near-duplicate another split")
+        
+        return df[~leaked].reset_index(drop=True)
\ No newline at end of file
@@ -3,23 +3,33 @@ Data loading and preprocessing utilities
 """
 
 import pandas as pd
+import numpy as np
 import json
 import os
-from typing import List, Dict, Tuple, Optional, Union
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional, Union, Any, Iterator
 from sklearn.model_selection import train_test_split
 import logging
 
+from .dedup import NearDuplicateDetector, normalize_texts
+
 logger = logging.getLogger(__name__)
 
 
 class DataLoader:
     """Handle loading and preprocessing of datasets"""
     
-    def __init__(self, text_column: str = "text", label_column: str = "label"):
+    def __init__(self, text_column: str = "text", label_column: str = "label",
+                 near_duplicate_threshold: Optional[float] = None):
         self.text_column = text_column
         self.label_column = label_column
         self.label_to_id = {}
         self.id_to_label = {}
+        self.near_duplicate_detector = (
+            NearDuplicateDetector(threshold=near_duplicate_threshold)
+            if near_duplicate_threshold else None
+        )
     
     def load_data(self, file_path: str) -> pd.DataFrame:
         """
@@ -62,10 +72,57 @@ class DataLoader:
         
         return df
     
+    def iter_chunks(self, file_path: str, chunk_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Read a data file in chunks without loading it whole
+        
+        CSV and JSON Lines (.jsonl) files are streamed; a .json file holds a
+        single array and is parsed at once, then yielded in chunks. Rows with
+        missing or empty text/label are dropped, but no deduplication is done
+        since it would need the whole file.
+        
+        Args:
+            file_path: Path to the data file
+            chunk_size: Number of rows per chunk
+        
+        Yields:
+            DataFrames with text and label columns
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Data file not found: {file_path}")
+        
+        file_extension = os.path.splitext(file_path)[1].lower()
+        
+        if file_extension == '.csv':
+            chunks = pd.read_csv(file_path, chunksize=chunk_size)
+        elif file_extension == '.jsonl':
+            chunks = pd.read_json(file_path, lines=True, chunksize=chunk_size)
+        elif file_extension == '.json':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                df = pd.DataFrame(json.load(f))
+            chunks = (df.iloc[i:i + chunk_size] for i in range(0, len(df), chunk_size))
+        else:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+        
+        for chunk in chunks:
+            if self.text_column not in chunk.columns:
+                raise ValueError(f"Text column '{self.text_column}' not found in data")
+            if self.label_column not in chunk.columns:
+                raise ValueError(f"Label column '{self.label_column}' not found in data")
+            
+            chunk = chunk.dropna(subset=[self.text_column, self.label_column])
+            chunk = chunk[chunk[self.text_column].astype(str).str.strip() != '']
+            chunk = chunk[chunk[self.label_column].astype(str).str.strip() != '']
+            if len(chunk):
+                yield chunk.reset_index(drop=True)
+    
     def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Clean the dataset by removing null values and duplicates
         
+        When a near-duplicate threshold is configured, only the first sample of
+        each near-duplicate cluster is kept.
+        
         Args:
             df: Input DataFrame
             
@@ -84,6 +141,10 @@ class DataLoader:
         # Remove duplicates
         df = df.drop_duplicates(subset=[self.text_column, self.label_column])
         
+        # Remove near-duplicates (punctuation, casing or small wording changes)
+        if self.near_duplicate_detector is not None:
+            df = self.near_duplicate_detector.deduplicate(df, self.text_column)
+        
         final_size = len(df)
         removed = initial_size - final_size
         
@@ -92,6 +153,30 @@ class DataLoader:
         
         return df.reset_index(drop=True)
     
+    def remove_split_leakage(self, train_df: pd.DataFrame,
+                             val_df: Optional[pd.DataFrame] = None,
+                             test_df: Optional[pd.DataFrame] = None) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """
+        Remove validation/test samples that near-duplicate an earlier split
+        
+        Args:
+            train_df: Training DataFrame
+            val_df: Validation DataFrame (optional)
+            test_df: Test DataFrame (optional)
+            
+        Returns:
+            Tuple of (val_df, test_df) without samples leaking from earlier splits
+        """
+        if self.near_duplicate_detector is None:
+            return val_df, test_df
+        
+        if val_df is not None:
+            val_df = self.near_duplicate_detector.drop_overlapping([train_df], val_df, self.text_column)
+        if test_df is not None:
+            test_df = self.near_duplicate_detector.drop_overlapping([train_df, val_df], test_df, self.text_column)
+        
+        return val_df, test_df
+    
     def _create_label_mappings(self, labels: List[str]):
         """
         Create mappings between labels and IDs
@@ -107,7 +192,8 @@ class DataLoader:
                    train_ratio: float = 0.8, 
                    val_ratio: float = 0.1, 
                    test_ratio: float = 0.1,
-                   random_state: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+                   random_state: int = 42,
+                   method: str = "random") -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         """
         Split data into train, validation, and test sets
         
@@ -117,6 +203,8 @@ class DataLoader:
             val_ratio: Ratio for validation set
             test_ratio: Ratio for test set
             random_state: Random seed for reproducibility
+            method: 'random' for a stratified shuffle split, 'hash' for a
+                deterministic split from the text hash (see split_indices)
             
         Returns:
             Tuple of (train_df, val_df, test_df)
@@ -125,6 +213,12 @@ class DataLoader:
         if abs(train_ratio + val_ratio + test_ratio - 1.0) > 1e-6:
             raise ValueError("Train, validation, and test ratios must sum to 1.0")
         
+        if method == "hash":
+            splits = self.split_indices(df, train_ratio, val_ratio, test_ratio)
+            return df.iloc[splits['train']], df.iloc[splits['val']], df.iloc[splits['test']]
+        elif method != "random":
+            raise ValueError(f"Unsupported split method: {method}")
+        
         # First split: separate test set
         train_val_df, test_df = train_test_split(
             df, 
@@ -146,6 +240,154 @@ class DataLoader:
         
         return train_df, val_df, test_df
     
+    def split_indices(self, df: pd.DataFrame,
+                      train_ratio: float = 0.8,
+                      val_ratio: float = 0.1,
+                      test_ratio: float = 0.1,
+                      stratify: bool = False,
+                      num_buckets: int = 1000) -> Dict[str, np.ndarray]:
+        """
+        Deterministically assign rows to splits from a hash of their normalized text
+        
+        Each row is hashed into one of num_buckets buckets and buckets are
+        assigned to splits at fixed cut-offs, so a row always lands in the same
+        split and appending data only places the new rows. Since hashes are
+        uniform within every label, each split follows the label distribution
+        in expectation. Runs in O(n) without copying the frame.
+        
+        stratify instead picks the cut-offs per label from that label's bucket
+        histogram, so splits match the ratios exactly even for small labels.
+        The cut-offs then depend on the data: appending rows can shift them and
+        move existing rows between splits, so only use it for data that is not
+        appended to.
+        
+        Args:
+            df: Input DataFrame
+            train_ratio: Ratio for training set
+            val_ratio: Ratio for validation set
+            test_ratio: Ratio for test set
+            stratify: Choose bucket cut-offs per label (exact proportions,
+                but not stable across appends)
+            num_buckets: Number of hash buckets
+            
+        Returns:
+            Dictionary mapping 'train', 'val' and 'test' to row-position arrays
+        """
+        if abs(train_ratio + val_ratio + test_ratio - 1.0) > 1e-6:
+            raise ValueError("Train, validation, and test ratios must sum to 1.0")
+        
+        hashes = pd.util.hash_pandas_object(
+            normalize_texts(df[self.text_column].to_numpy()), index=False
+        ).to_numpy()
+        buckets = (hashes % np.uint64(num_buckets)).astype(np.int64)
+        
+        if stratify:
+            codes, uniques = pd.factorize(df[self.label_column], sort=True)
+            histogram = np.bincount(
+                codes * num_buckets + buckets, minlength=len(uniques) * num_buckets
+            ).reshape(len(uniques), num_buckets)
+            # Fraction of each label's rows up to and including each bucket
+            cumulative = np.cumsum(histogram, axis=1) / np.maximum(histogram.sum(axis=1, keepdims=True), 1)
+            train_cut = (cumulative <= train_ratio + 1e-9).sum(axis=1)[codes]
+            val_cut = (cumulative <= train_ratio + val_ratio + 1e-9).sum(axis=1)[codes]
+        else:
+            train_cut = int(round(train_ratio * num_buckets))
+            val_cut = int(round((train_ratio + val_ratio) * num_buckets))
+        
+        splits = {
+            'train': np.flatnonzero(buckets < train_cut),
+            'val': np.flatnonzero((buckets >= train_cut) & (buckets < val_cut)),
+            'test': np.flatnonzero(buckets >= val_cut)
+        }
+        
+        logger.info(f"Hash split - Train: {len(splits['train'])}, Val: {len(splits['val'])}, Test: {len(splits['test'])}")
+        
+        return splits
+    
+    def fingerprint(self, df: pd.DataFrame, num_rows: Optional[int] = None) -> str:
+        """
+        Fingerprint the text and label columns of the first num_rows rows
+        
+        Args:
+            df: Input DataFrame
+            num_rows: Number of leading rows to fingerprint (default: all)
+        
+        Returns:
+            Hex digest identifying the rows' content and order
+        """
+        rows = df[[self.text_column, self.label_column]].iloc[:num_rows]
+        hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+        return hashlib.sha256(hashes.tobytes()).hexdigest()
+    
+    def create_watermark(self, df: pd.DataFrame, source: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Record how much of an append-only dataset has been consumed
+        
+        Args:
+            df: Cleaned DataFrame that was trained on
+            source: Path of the data file
+        
+        Returns:
+            Watermark dictionary
+        """
+        return {
+            'source': source,
+            'num_rows': len(df),
+            'fingerprint': self.fingerprint(df),
+            'created_at': str(datetime.now())
+        }
+    
+    def select_since_watermark(self, df: pd.DataFrame,
+                               watermark: Dict[str, Any],
+                               replay_fraction: float = 0.0,
+                               random_state: int = 42,
+                               split_ratios: Optional[Tuple[float, float, float]] = None) -> Dict[str, np.ndarray]:
+        """
+        Select the rows appended after a watermark, plus an optional replay sample
+        
+        The watermark only applies if the first num_rows rows are unchanged;
+        otherwise the data was edited rather than appended and all rows are
+        selected.
+        
+        With split_ratios, rows are assigned to splits by split_indices over
+        the whole frame, so an old row keeps the split it had in an earlier
+        hash-split run. Only new rows go to val and test, since the previous
+        model may have trained on any old row, and replayed rows are drawn
+        from the old train split and added to train only.
+        
+        Args:
+            df: Cleaned DataFrame
+            watermark: Watermark from create_watermark
+            replay_fraction: Number of old rows to replay, as a fraction of the new rows
+            random_state: Random seed for the replay sample
+            split_ratios: (train, val, test) ratios to split the selection;
+                None puts every selected row in train
+        
+        Returns:
+            Dictionary mapping 'train' (and 'val' and 'test' with split_ratios)
+            to row positions; in train the new rows come before the replayed rows
+        """
+        positions = np.arange(len(df))
+        splits = {'train': positions}
+        if split_ratios is not None:
+            splits = self.split_indices(df, *split_ratios)
+        
+        num_rows = int(watermark.get('num_rows', 0))
+        if num_rows > len(df) or self.fingerprint(df, num_rows) != watermark.get('fingerprint'):
+            logger.warning("Data before the watermark has changed; training on the full dataset")
+            return splits
+        
+        selected = {name: indices[indices >= num_rows] for name, indices in splits.items()}
+        old_train = splits['train'][splits['train'] < num_rows]
+        num_new = sum(len(indices) for indices in selected.values())
+        num_replay = min(int(round(replay_fraction * num_new)), len(old_train))
+        replay = np.sort(np.random.default_rng(random_state).choice(old_train, size=num_replay, replace=False))
+        selected['train'] = np.concatenate([selected['train'], replay])
+        
+        logger.info(f"Selected {num_new} new samples since the watermark and {num_replay} replay samples")
+        
+        return selected
+    
     def encode_labels(self, labels: List[str]) -> List[int]:
         """
         Convert string labels to integer IDs
@@ -0,0 +1,125 @@
+"""
+Dataset profiling utilities
+"""
+
+import numpy as np
+from transformers import AutoTokenizer
+from typing import Dict, Any, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def compute_token_lengths(texts: Sequence[str],
+                          tokenizer: AutoTokenizer,
+                          sample_size: Optional[int] = 10000,
+                          batch_size: int = 1000,
+                          seed: int = 42) -> np.ndarray:
+    """
+    Compute tokenized lengths (including special tokens) for a set of texts
+    
+    Args:
+        texts: Input texts
+        tokenizer: Hugging Face tokenizer
+        sample_size: Maximum number of texts to tokenize; larger inputs are
+            sampled uniformly at random (None tokenizes everything)
+        batch_size: Number of texts tokenized per call
+        seed: Random seed for sampling
+    
+    Returns:
+        Array of token lengths
+    """
+    if sample_size is not None and len(texts) > sample_size:
+        rng = np.random.default_rng(seed)
+        positions = np.sort(rng.choice(len(texts), size=sample_size, replace=False))
+        texts = [texts[i] for i in positions]
+    
+    lengths = []
+    for i in range(0, len(texts), batch_size):
+        batch = [str(t) for t in texts[i:i + batch_size]]
+        encoded = tokenizer(batch, truncation=False, padding=False)
+        lengths.extend(len(ids) for ids in encoded['input_ids'])
+    
+    return np.asarray(lengths, dtype=np.int64)
+
+
+def recommend_max_length(lengths: np.ndarray,
+                         percentile: float = 99.0,
+                         multiple_of: int = 8,
+                         upper_bound: int = 512) -> int:
+    """
+    Recommend the smallest max_length covering a percentile of the texts
+    
+    Args:
+        lengths: Token lengths
+        percentile: Percentage of texts that must fit without truncation
+        multiple_of: Round the result up to a multiple of this value
+        upper_bound: Largest allowed max_length (model limit)
+    
+    Returns:
+        Recommended max_length
+    """
+    if len(lengths) == 0:
+        return upper_bound
+    
+    covered = int(np.ceil(np.percentile(lengths, percentile)))
+    rounded = int(np.ceil(covered / multiple_of) * multiple_of)
+    return max(min(rounded, upper_bound), 1)
+
+
+def profile_token_lengths(texts: Sequence[str],
+                          tokenizer: AutoTokenizer,
+                          percentile: float = 99.0,
+                          sample_size: Optional[int] = 10000,
+                          upper_bound: int = 512,
+                          num_bins: int = 32) -> Dict[str, Any]:
+    """
+    Build a token-length histogram and recommend a max_length
+    
+    Args:
+        texts: Input texts
+        tokenizer: Hugging Face tokenizer
+        percentile: Percentage of texts that must fit without truncation
+        sample_size: Maximum number of texts to tokenize
+        upper_bound: Largest allowed max_length
+        num_bins: Number of histogram bins
+    
+    Returns:
+        Dictionary with sample counts, percentiles, histogram and recommended max_length
+    """
+    # Respect the tokenizer's own limit (very large values mean "unset")
+    model_max_length = getattr(tokenizer, 'model_max_length', None)
+    if model_max_length and model_max_length < 1_000_000:
+        upper_bound = min(upper_bound, model_max_length)
+    
+    lengths = compute_token_lengths(texts, tokenizer, sample_size=sample_size)
+    recommended = recommend_max_length(lengths, percentile=percentile, upper_bound=upper_bound)
+    
+    if len(lengths):
+        counts, edges = np.histogram(lengths, bins=min(num_bins, max(int(lengths.max()), 1)))
+        percentiles = {f"p{p}": float(np.percentile(lengths, p)) for p in (50, 90, 95, 99)}
+        truncated = float((lengths > recommended).mean())
+    else:
+        counts, edges, percentiles, truncated = np.array([]), np.array([]), {}, 0.0
+    
+    profile = {
+        'num_texts': len(texts),
+        'num_sampled': int(len(lengths)),
+        'mean_length': float(lengths.mean()) if len(lengths) else 0.0,
+        'max_length_observed': int(lengths.max()) if len(lengths) else 0,
+        'percentiles': percentiles,
+        'histogram': {
+            'counts': counts.astype(int).tolist(),
+            'bin_edges': edges.tolist()
+        },
+        'coverage_percentile': percentile,
+        'recommended_max_length': recommended,
+        'truncated_fraction': truncated
+    }
+    
+    logger.info(
+        f"Token lengths: mean {profile['mean_length']:.1f}, max {profile['max_length_observed']}; "
+        f"recommended max_length {recommended} covers p{percentile}"
+    )
+    
+    return profile
\ No newline at end of file
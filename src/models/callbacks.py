@@ -0,0 +1,440 @@
+"""
+Trainer callbacks for training telemetry and budgeted runs
+"""
+
+import os
+import json
+import math
+import time
+import functools
+import torch
+import torch.distributed as dist
+from transformers import TrainerCallback, TrainerState, TrainerControl, TrainingArguments
+from typing import Dict, List, Any, Optional
+import logging
+
+from ..utils.memory import get_peak_rss_mb
+from ..utils.profiler import create_profiler, export_profile
+
+logger = logging.getLogger(__name__)
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Record training throughput per logging interval
+    
+    Tokens and samples are counted by a forward pre-hook on the model, so they
+    are exact whatever the collator or dataloader workers do. Dataloader wait is
+    the time between the end of the previous compute step and the next training
+    forward pass; optimizer step time comes from optimizer step hooks. Rates are
+    computed over active training time (data wait plus compute), so evaluation,
+    logging and checkpointing do not dilute them. Each interval is appended to
+    ``throughput.jsonl`` in the output directory.
+    """
+    
+    def __init__(self, output_dir: str, filename: str = "throughput.jsonl"):
+        self.output_path = os.path.join(output_dir, filename)
+        self.history: List[Dict[str, Any]] = []
+        self.summary: Dict[str, Any] = {}
+        self._hooks = []
+        self._reset_totals()
+        self._reset_interval()
+    
+    def _reset_totals(self):
+        self._train_start = None
+        self._total = self._empty_counts()
+    
+    def _reset_interval(self):
+        self._interval_start = time.perf_counter()
+        self._interval = self._empty_counts()
+        self._last_compute_end = None
+        self._compute_start = None
+        self._optimizer_start = None
+    
+    @staticmethod
+    def _empty_counts() -> Dict[str, Any]:
+        return {'samples': 0, 'tokens': 0, 'padded_tokens': 0, 'active_time': 0.0,
+                'dataloader_wait': 0.0, 'optimizer_time': 0.0, 'optimizer_steps': 0}
+    
+    def _add(self, key: str, value):
+        self._interval[key] += value
+        self._total[key] += value
+    
+    def _mark_compute_end(self):
+        now = time.perf_counter()
+        if self._compute_start is not None:
+            self._add('active_time', now - self._compute_start)
+            self._compute_start = None
+        self._last_compute_end = now
+    
+    def _forward_pre_hook(self, module, args, kwargs):
+        if not module.training:
+            return
+        now = time.perf_counter()
+        if self._last_compute_end is not None:
+            wait = now - self._last_compute_end
+            self._add('dataloader_wait', wait)
+            self._add('active_time', wait)
+            self._last_compute_end = None
+        if self._compute_start is None:
+            self._compute_start = now
+        
+        input_ids = kwargs.get('input_ids')
+        attention_mask = kwargs.get('attention_mask')
+        if input_ids is not None:
+            self._add('samples', int(input_ids.shape[0]))
+            self._add('padded_tokens', int(input_ids.numel()))
+            if attention_mask is not None:
+                self._add('tokens', int(attention_mask.sum().item()))
+            else:
+                self._add('tokens', int(input_ids.numel()))
+    
+    def _optimizer_pre_hook(self, optimizer, args, kwargs):
+        self._optimizer_start = time.perf_counter()
+    
+    def _optimizer_post_hook(self, optimizer, args, kwargs):
+        if self._optimizer_start is not None:
+            self._add('optimizer_time', time.perf_counter() - self._optimizer_start)
+            self._add('optimizer_steps', 1)
+            self._optimizer_start = None
+    
+    def on_train_begin(self, args: TrainingArguments, state: TrainerState, control: TrainerControl,
+                       model=None, optimizer=None, **kwargs):
+        self._reset_totals()
+        self._reset_interval()
+        self._train_start = time.perf_counter()
+        self.history = []
+        
+        if model is not None:
+            try:
+                self._hooks.append(model.register_forward_pre_hook(self._forward_pre_hook, with_kwargs=True))
+            except TypeError:
+                logger.warning("Forward pre-hooks with kwargs need torch>=2.0; token statistics disabled")
+        
+        # Unwrap accelerate's optimizer wrapper to reach the torch optimizer
+        inner_optimizer = getattr(optimizer, 'optimizer', optimizer)
+        if hasattr(inner_optimizer, 'register_step_pre_hook'):
+            self._hooks.append(inner_optimizer.register_step_pre_hook(self._optimizer_pre_hook))
+            self._hooks.append(inner_optimizer.register_step_post_hook(self._optimizer_post_hook))
+        
+        if state.is_world_process_zero and os.path.exists(self.output_path):
+            os.remove(self.output_path)
+    
+    def on_substep_end(self, args, state, control, **kwargs):
+        self._mark_compute_end()
+    
+    def on_step_end(self, args, state, control, **kwargs):
+        self._mark_compute_end()
+    
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._last_compute_end = time.perf_counter()
+    
+    def on_save(self, args, state, control, **kwargs):
+        self._last_compute_end = time.perf_counter()
+    
+    def on_log(self, args: TrainingArguments, state: TrainerState, control: TrainerControl,
+               logs: Optional[Dict[str, float]] = None, **kwargs):
+        logs = logs or {}
+        # Close the interval on each log; skip logs with no training samples since the last one
+        if self._interval['samples'] > 0:
+            record = self._build_record(self._interval, time.perf_counter() - self._interval_start)
+            record.update({'step': state.global_step, 'epoch': state.epoch})
+            if 'loss' in logs:
+                record['loss'] = logs['loss']
+            if 'learning_rate' in logs:
+                record['learning_rate'] = logs['learning_rate']
+            self.history.append(record)
+            
+            if state.is_world_process_zero:
+                with open(self.output_path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+            
+            self._reset_interval()
+        self._last_compute_end = time.perf_counter()
+    
+    def on_train_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        
+        if self._train_start is not None:
+            self.summary = self._build_record(self._total, time.perf_counter() - self._train_start)
+            self.summary['global_step'] = state.global_step
+            self.summary['timeseries_path'] = self.output_path
+    
+    @staticmethod
+    def _build_record(counts: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+        """Derive rates and ratios from raw counters"""
+        active = max(counts['active_time'], 1e-9)
+        padded = counts['padded_tokens']
+        record = {
+            'elapsed_seconds': elapsed,
+            'active_seconds': counts['active_time'],
+            'samples': counts['samples'],
+            'samples_per_second': counts['samples'] / active,
+            'tokens_per_second': counts['tokens'] / active,
+            'padded_tokens_per_second': padded / active,
+            'padding_ratio': 1.0 - counts['tokens'] / padded if padded else 0.0,
+            'dataloader_wait_seconds': counts['dataloader_wait'],
+            'dataloader_wait_fraction': counts['dataloader_wait'] / active,
+            'step_seconds': (
+                counts['active_time'] / counts['optimizer_steps'] if counts['optimizer_steps'] else None
+            ),
+            'optimizer_step_seconds': (
+                counts['optimizer_time'] / counts['optimizer_steps'] if counts['optimizer_steps'] else None
+            ),
+            'peak_rss_mb': get_peak_rss_mb()
+        }
+        if torch.cuda.is_available():
+            record['peak_cuda_memory_mb'] = torch.cuda.max_memory_allocated() / (1024 * 1024)
+        return record
+
+
+class BudgetCallback(TrainerCallback):
+    """
+    Keep a budgeted run within its wall-clock deadline
+    
+    The planned step count comes from a short timing probe, which misses the
+    optimizer, data loading and per-step overheads. After a few real steps the
+    callback re-fits the run to the measured step time: it shortens
+    ``state.max_steps``, spreads the evaluations/checkpoints over the new step
+    count and rescales the learning-rate schedule so it still decays to the
+    end of the budget. After that, if the next step would end past the
+    deadline, training stops early. The last step always saves a checkpoint
+    (and evaluates, with synchronous evaluation) so the final weights compete
+    for the best model. With data-parallel workers the timings and the stop
+    decision are all-reduced so every rank behaves the same.
+    """
+    
+    def __init__(self,
+                 deadline: float,
+                 evaluate: bool = False,
+                 num_evaluations: int = 5,
+                 evaluation_seconds: float = 0.0,
+                 refit_steps: int = 20):
+        """
+        Args:
+            deadline: time.perf_counter() value by which training must end
+                (None for a sample budget: only the last-step evaluation applies)
+            evaluate: Evaluate on the last step (synchronous evaluation)
+            num_evaluations: Evaluations/checkpoints to spread over the run
+            evaluation_seconds: Estimated time of all periodic evaluations that
+                run in the training process
+            refit_steps: Steps measured before re-fitting the plan
+        """
+        self.deadline = deadline
+        self.evaluate = evaluate
+        self.num_evaluations = num_evaluations
+        self.evaluation_seconds = evaluation_seconds
+        self.refit_steps = refit_steps
+        self.refit = None
+        self.stopped_at_step = None
+        self.step_seconds = None
+        self._start = None
+        self._start_step = 0
+    
+    def on_train_begin(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        self._start = time.perf_counter()
+        self._start_step = state.global_step
+        self.refit = None
+        self.stopped_at_step = None
+    
+    @staticmethod
+    def _max_across_ranks(value: float) -> float:
+        if dist.is_available() and dist.is_initialized():
+            tensor = torch.tensor([value], dtype=torch.float64)
+            dist.all_reduce(tensor, op=dist.ReduceOp.MAX)
+            value = float(tensor.item())
+        return value
+    
+    @staticmethod
+    def _rescale_schedule(lr_scheduler, max_steps: int) -> bool:
+        """Point Hugging Face's step-based LR lambdas at a new total step count"""
+        lr_lambdas = getattr(lr_scheduler, 'lr_lambdas', None) or []
+        rescaled = False
+        for i, fn in enumerate(lr_lambdas):
+            if isinstance(fn, functools.partial) and 'num_training_steps' in fn.keywords:
+                lr_lambdas[i] = functools.partial(fn.func, *fn.args, **{**fn.keywords, 'num_training_steps': max_steps})
+                rescaled = True
+        return rescaled
+    
+    def _refit(self, state: TrainerState, now: float, lr_scheduler):
+        """Shorten the run to what the measured step time allows"""
+        fitted_steps = state.global_step + int(
+            (self.deadline - now - self.evaluation_seconds) * 0.95 / self.step_seconds
+        )
+        self.refit = {'step': state.global_step, 'step_seconds': self.step_seconds,
+                      'planned_steps': state.max_steps, 'max_steps': state.max_steps}
+        if fitted_steps >= state.max_steps:
+            return
+        
+        max_steps = max(fitted_steps, state.global_step + 1)
+        interval = max(1, math.ceil(max_steps / self.num_evaluations))
+        state.max_steps = max_steps
+        state.eval_steps = state.save_steps = interval
+        self.refit.update({'max_steps': max_steps, 'eval_steps': interval,
+                           'schedule_rescaled': self._rescale_schedule(lr_scheduler, max_steps)})
+        logger.info(
+            f"Measured {self.step_seconds:.3f}s/step; budget re-fitted to {max_steps} steps "
+            f"(evaluating every {interval})"
+        )
+    
+    def _check_deadline(self, state: TrainerState, control: TrainerControl, lr_scheduler):
+        now = time.perf_counter()
+        steps = state.global_step - self._start_step
+        self.step_seconds = self._max_across_ranks((now - self._start) / max(steps, 1))
+        
+        if self.refit is None and steps >= self.refit_steps:
+            self._refit(state, now, lr_scheduler)
+        
+        out_of_time = self._max_across_ranks(float(now + self.step_seconds > self.deadline)) > 0
+        if out_of_time and not control.should_training_stop:
+            logger.info(
+                f"Time budget reached at step {state.global_step}/{state.max_steps} "
+                f"({self.step_seconds:.3f}s/step); stopping"
+            )
+            self.stopped_at_step = state.global_step
+            control.should_training_stop = True
+            control.should_save = True
+    
+    def on_step_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl,
+                    lr_scheduler=None, **kwargs):
+        if self.deadline is not None:
+            self._check_deadline(state, control, lr_scheduler)
+        
+        if control.should_training_stop and self.evaluate:
+            control.should_evaluate = True
+        return control
+
+
+class EpochLimitCallback(TrainerCallback):
+    """
+    Stop a run after num_epochs without shortening its schedule
+    
+    The learning-rate schedule stays sized for the run's full epoch count and
+    a checkpoint is saved at the stop, so resuming from it continues the run
+    exactly where it paused (used by the tuner to train trials rung by rung).
+    """
+    
+    def __init__(self, num_epochs: int, evaluate: bool = False):
+        """
+        Args:
+            num_epochs: Epochs after which training stops
+            evaluate: Also evaluate at the stop (synchronous evaluation)
+        """
+        self.num_epochs = num_epochs
+        self.evaluate = evaluate
+    
+    def on_epoch_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        if state.epoch is not None and state.epoch >= self.num_epochs - 1e-6:
+            control.should_training_stop = True
+            control.should_save = True
+            if self.evaluate:
+                control.should_evaluate = True
+        return control
+
+
+class ProgressCallback(TrainerCallback):
+    """
+    Publish training progress to a JSON file for another process to poll
+    
+    The file holds the step, epoch, latest loss/learning rate, latest
+    evaluation metrics, elapsed time and an ETA. Updates are rate-limited
+    and written atomically (temporary file plus rename), so readers never
+    see a partial file.
+    """
+    
+    def __init__(self, output_path: str, min_interval: float = 1.0):
+        self.output_path = output_path
+        self.min_interval = min_interval
+        self.progress: Dict[str, Any] = {}
+        self._start = None
+        self._last_write = 0.0
+    
+    def _write(self, state: TrainerState, phase: str, force: bool = False):
+        now = time.perf_counter()
+        if not state.is_world_process_zero or (not force and now - self._last_write < self.min_interval):
+            return
+        elapsed = now - self._start if self._start is not None else 0.0
+        fraction = state.global_step / state.max_steps if state.max_steps else 0.0
+        self.progress.update({
+            'phase': phase,
+            'step': state.global_step,
+            'max_steps': state.max_steps,
+            'epoch': state.epoch,
+            'fraction': fraction,
+            'elapsed_seconds': elapsed,
+            'eta_seconds': elapsed * (1.0 - fraction) / fraction if fraction > 0 else None,
+            'updated_at': time.time()
+        })
+        tmp_path = f"{self.output_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.progress, f)
+        os.replace(tmp_path, self.output_path)
+        self._last_write = now
+    
+    def on_train_begin(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        self._start = time.perf_counter()
+        self.progress = {}
+        self._write(state, 'training', force=True)
+    
+    def on_step_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        self._write(state, 'training')
+    
+    def on_log(self, args: TrainingArguments, state: TrainerState, control: TrainerControl,
+               logs: Optional[Dict[str, float]] = None, **kwargs):
+        logs = logs or {}
+        for key in ('loss', 'learning_rate'):
+            if key in logs:
+                self.progress[key] = logs[key]
+        self._write(state, 'training')
+    
+    def on_evaluate(self, args: TrainingArguments, state: TrainerState, control: TrainerControl,
+                    metrics: Optional[Dict[str, float]] = None, **kwargs):
+        if metrics:
+            self.progress['eval_metrics'] = {**metrics, 'step': state.global_step}
+        self._write(state, 'training', force=True)
+    
+    def on_train_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        self._write(state, 'finishing', force=True)
+
+
+class TorchProfilerCallback(TrainerCallback):
+    """
+    Capture a window of training steps with torch.profiler
+    
+    Profiling starts at the first step at or after start_step (skip the
+    first steps to leave warm-up out of the trace) and stops after num_steps
+    optimizer steps or at the end of training. Every process writes its own
+    trace, named with its rank.
+    """
+    
+    def __init__(self, start_step: int, num_steps: int, name: str = "train"):
+        self.start_step = start_step
+        self.num_steps = num_steps
+        self.name = name
+        self.files: Optional[Dict[str, str]] = None
+        self._profiler = None
+        self._first_step = None
+    
+    def on_step_begin(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        if self._profiler is None and self.files is None and state.global_step >= self.start_step:
+            self._profiler = create_profiler()
+            self._profiler.start()
+            self._first_step = state.global_step
+    
+    def on_step_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        if self._profiler is not None:
+            self._profiler.step()
+            if state.global_step - self._first_step >= self.num_steps:
+                self._finish(args, state)
+    
+    def on_train_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        if self._profiler is not None:
+            self._finish(args, state)
+    
+    def _finish(self, args: TrainingArguments, state: TrainerState):
+        self._profiler.stop()
+        name = f"{self.name}-rank{args.process_index}-steps{self._first_step + 1}-{state.global_step}"
+        self.files = {**export_profile(self._profiler, name), 'steps': [self._first_step + 1, state.global_step]}
+        self._profiler = None
\ No newline at end of file
@@ -0,0 +1,488 @@
+"""
+Asynchronous checkpoint writing and out-of-process checkpoint evaluation
+"""
+
+import os
+import re
+import json
+import dataclasses
+import time
+import shutil
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import torch
+import torch.nn.functional as F
+from safetensors.torch import load_file
+from transformers import AutoConfig, AutoModelForSequenceClassification, Trainer, TrainerCallback
+from transformers.trainer import OPTIMIZER_NAME, SCHEDULER_NAME, TRAINER_STATE_NAME, TRAINING_ARGS_NAME
+from transformers.trainer_utils import PREFIX_CHECKPOINT_DIR
+from typing import Dict, List, Any, Optional, Callable, Set
+import logging
+
+from ..data.dataset import TokenizedDataset
+from ..utils.config import config
+from ..utils.cpu import available_cores, pin_to_cores
+from ..utils.metrics import MetricsAccumulator
+from .lora import adapter_state_dict, inject_lora, is_adapter_dir, load_adapter, load_adapter_weights, save_adapter
+
+logger = logging.getLogger(__name__)
+
+_CHECKPOINT_PATTERN = re.compile(rf"^{PREFIX_CHECKPOINT_DIR}-(\d+)$")
+
+
+def _snapshot(obj: Any) -> Any:
+    """Copy every tensor in a (nested) state dict to CPU so training can keep mutating the originals"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: _snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot(value) for value in obj)
+    return obj
+
+
+class AsyncCheckpointWriter:
+    """
+    Write checkpoints on a background thread
+    
+    At most max_pending snapshots are held in memory; submitting another one
+    blocks until the oldest write has finished.
+    """
+    
+    def __init__(self, max_pending: int = 1):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self._slots = threading.Semaphore(max_pending)
+        self._futures: List[concurrent.futures.Future] = []
+        self.write_seconds = 0.0
+        self.blocked_seconds = 0.0
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        start = time.perf_counter()
+        self._slots.acquire()
+        self.blocked_seconds += time.perf_counter() - start
+        
+        def run():
+            write_start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.write_seconds += time.perf_counter() - write_start
+                self._slots.release()
+        
+        future = self._executor.submit(run)
+        self._futures.append(future)
+        return future
+    
+    def wait(self):
+        """Block until every submitted write has finished; re-raise the first failure"""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+    
+    def shutdown(self):
+        self.wait()
+        self._executor.shutdown()
+
+
+# Validation set of an evaluation worker process, loaded once by _init_eval_worker
+_eval_dataset: Optional[TokenizedDataset] = None
+
+
+def _init_eval_worker(dataset_path: str, cores: List[int], config_dict: Dict[str, Any]):
+    """Pin an evaluation worker and memory-map the validation set"""
+    global _eval_dataset
+    config.update_from_dict(config_dict)
+    pin_to_cores(cores)
+    torch.set_num_interop_threads(1)
+    _eval_dataset = TokenizedDataset.load(dataset_path)
+
+
+def _load_checkpoint_model(checkpoint_dir: str, lora_config: Optional[Dict[str, Any]] = None):
+    """Rebuild the training model from a checkpoint's config and weights"""
+    model_config = AutoConfig.from_pretrained(checkpoint_dir)
+    if is_adapter_dir(checkpoint_dir):
+        # Adapter-only checkpoint: the frozen encoder comes from the base model
+        adapter = load_adapter(checkpoint_dir)
+        lora_config = adapter['config']
+        model = AutoModelForSequenceClassification.from_pretrained(
+            lora_config['base_model'], config=model_config, ignore_mismatched_sizes=True
+        )
+        inject_lora(model, rank=lora_config['rank'], alpha=lora_config['alpha'],
+                    target_modules=lora_config['target_modules'])
+        load_adapter_weights(model, adapter['state'])
+        model.eval()
+        return model
+    
+    model = AutoModelForSequenceClassification.from_config(model_config)
+    if lora_config is not None:
+        inject_lora(model, rank=lora_config['rank'], alpha=lora_config['alpha'],
+                    target_modules=lora_config['target_modules'])
+    
+    weights_path = os.path.join(checkpoint_dir, "model.safetensors")
+    if os.path.exists(weights_path):
+        state_dict = load_file(weights_path)
+    else:
+        state_dict = torch.load(os.path.join(checkpoint_dir, "pytorch_model.bin"), map_location='cpu', weights_only=True)
+    # Tied weights are stored once; strict loading would reject the missing alias
+    model.load_state_dict(state_dict, strict=False)
+    model.eval()
+    return model
+
+
+def _evaluate_checkpoint(checkpoint_dir: str, step: int, lora_config: Optional[Dict[str, Any]],
+                         batch_size: int) -> Dict[str, Any]:
+    """Evaluate one checkpoint on the worker's validation set"""
+    start = time.perf_counter()
+    model = _load_checkpoint_model(checkpoint_dir, lora_config)
+    accumulator = MetricsAccumulator(model.config.num_labels)
+    loss_sum = 0.0
+    
+    loader = torch.utils.data.DataLoader(_eval_dataset, batch_size=batch_size)
+    with torch.no_grad():
+        for batch in loader:
+            labels = batch.pop('labels')
+            logits = model(**batch).logits
+            loss_sum += F.cross_entropy(logits, labels, reduction='sum').item()
+            accumulator.update(labels.numpy(), logits.argmax(dim=-1).numpy())
+    
+    # Same metrics as ModelTrainer.compute_metrics, from one confusion matrix
+    weighted = accumulator.averages()['weighted']
+    runtime = time.perf_counter() - start
+    return {
+        'checkpoint': checkpoint_dir,
+        'step': step,
+        'metrics': {
+            'eval_loss': loss_sum / max(accumulator.num_samples, 1),
+            'eval_accuracy': accumulator.accuracy(),
+            'eval_f1': weighted['f1'],
+            'eval_precision': weighted['precision'],
+            'eval_recall': weighted['recall'],
+            'eval_runtime': runtime,
+            'eval_samples_per_second': accumulator.num_samples / runtime if runtime > 0 else 0.0
+        }
+    }
+
+
+class CheckpointEvaluator:
+    """
+    Evaluate saved checkpoints in a separate process while training continues
+    
+    The validation set is tokenized once and memory-mapped by the worker. The
+    worker is pinned to its own cores (the last num_cores available) and the
+    training process's torch thread pool shrinks to the remaining ones.
+    """
+    
+    def __init__(self,
+                 dataset,
+                 work_dir: str,
+                 lora_config: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 64,
+                 num_cores: int = 1):
+        os.makedirs(work_dir, exist_ok=True)
+        dataset_path = os.path.join(work_dir, "val.pt")
+        if not isinstance(dataset, TokenizedDataset):
+            dataset = TokenizedDataset.from_dataset(dataset)
+        dataset.save(dataset_path)
+        
+        cores = available_cores()
+        num_cores = max(1, min(num_cores, len(cores)))
+        worker_cores = cores[-num_cores:]
+        if len(cores) > num_cores:
+            torch.set_num_threads(len(cores) - num_cores)
+        
+        self.work_dir = work_dir
+        self.lora_config = lora_config
+        self.batch_size = batch_size
+        self.pending: Dict[str, concurrent.futures.Future] = {}
+        # Evaluated checkpoints whose results were returned by poll but not yet applied
+        self.unapplied: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_eval_worker,
+            initargs=(dataset_path, worker_cores, config.to_dict())
+        )
+        logger.info(f"Checkpoint evaluation worker pinned to cores {worker_cores}")
+    
+    def submit(self, checkpoint_dir: str, step: int):
+        """Queue a checkpoint for evaluation (safe to call from the writer thread)"""
+        future = self._executor.submit(_evaluate_checkpoint, checkpoint_dir, step, self.lora_config, self.batch_size)
+        with self._lock:
+            self.pending[checkpoint_dir] = future
+    
+    def poll(self) -> List[Dict[str, Any]]:
+        """
+        Results of the evaluations that have finished since the last call
+        
+        Their checkpoints stay pending until release() is called for them, so
+        rotation cannot delete a checkpoint before its result could make it
+        the best one.
+        """
+        with self._lock:
+            done = [path for path, future in self.pending.items() if future.done()]
+            futures = [self.pending.pop(path) for path in done]
+            self.unapplied.update(done)
+        return sorted((future.result() for future in futures), key=lambda result: result['step'])
+    
+    def wait(self) -> List[Dict[str, Any]]:
+        """Block until every queued evaluation has finished and return their results"""
+        with self._lock:
+            futures = list(self.pending.values())
+        concurrent.futures.wait(futures)
+        return self.poll()
+    
+    def release(self, checkpoint_dir: str):
+        """Mark the result of a polled checkpoint as applied"""
+        with self._lock:
+            self.unapplied.discard(checkpoint_dir)
+    
+    def is_pending(self, checkpoint_dir: str) -> bool:
+        """Whether the checkpoint is queued, being evaluated or its result has not been applied yet"""
+        with self._lock:
+            return checkpoint_dir in self.pending or checkpoint_dir in self.unapplied
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self.pending.clear()
+            self.unapplied.clear()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class AsyncEvaluationCallback(TrainerCallback):
+    """
+    Feed out-of-process evaluation results back into the Trainer
+    
+    Finished evaluations are appended to the log history, update the best
+    checkpoint and count towards early stopping. Results arrive a few steps
+    after their checkpoint was saved, so training may run slightly past the
+    point where synchronous early stopping would have stopped it.
+    """
+    
+    def __init__(self,
+                 evaluator: CheckpointEvaluator,
+                 metric_for_best_model: str = "f1",
+                 greater_is_better: bool = True,
+                 early_stopping_patience: Optional[int] = None):
+        self.evaluator = evaluator
+        self.metric = metric_for_best_model if metric_for_best_model.startswith("eval_") else f"eval_{metric_for_best_model}"
+        self.greater_is_better = greater_is_better
+        self.early_stopping_patience = early_stopping_patience
+        self.stale_evaluations = 0
+        self.results: List[Dict[str, Any]] = []
+    
+    def apply(self, results: List[Dict[str, Any]], state, control=None):
+        """Record evaluation results and update best checkpoint and early stopping"""
+        for result in results:
+            metrics = result['metrics']
+            self.results.append(result)
+            state.log_history.append({**metrics, 'step': result['step']})
+            logger.info(f"Checkpoint {os.path.basename(result['checkpoint'])}: "
+                        f"{self.metric}={metrics[self.metric]:.4f} ({metrics['eval_runtime']:.1f}s)")
+            
+            operator = np.greater if self.greater_is_better else np.less
+            value = metrics[self.metric]
+            if state.best_metric is None or operator(value, state.best_metric):
+                state.best_metric = value
+                state.best_model_checkpoint = result['checkpoint']
+                self.stale_evaluations = 0
+            else:
+                self.stale_evaluations += 1
+            # Only now may rotation delete the checkpoint (if it did not become the best)
+            self.evaluator.release(result['checkpoint'])
+            
+            if (control is not None and self.early_stopping_patience
+                    and self.stale_evaluations >= self.early_stopping_patience):
+                logger.info(f"Early stopping: no improvement in {self.stale_evaluations} evaluations")
+                control.should_training_stop = True
+    
+    def on_step_end(self, args, state, control, **kwargs):
+        self.apply(self.evaluator.poll(), state, control)
+
+
+class AsyncCheckpointTrainer(Trainer):
+    """
+    Trainer whose checkpoints are written by an AsyncCheckpointWriter
+    
+    Saving only copies the weights (and, unless save_only_model is set, the
+    optimizer and scheduler state) to CPU memory; serialization, rotation and
+    queueing the checkpoint for evaluation happen on the writer thread.
+    Checkpoints are written to a temporary directory and renamed when
+    complete, so resuming never picks up a partial checkpoint.
+    """
+    
+    def __init__(self, *args,
+                 checkpoint_writer: AsyncCheckpointWriter,
+                 checkpoint_evaluator: Optional[CheckpointEvaluator] = None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkpoint_writer = checkpoint_writer
+        self.checkpoint_evaluator = checkpoint_evaluator
+    
+    def _save_checkpoint(self, model, trial, metrics=None):
+        if self.args.world_size > 1:
+            # Optimizer state and RNG files are written per rank; keep the synchronous path
+            return super()._save_checkpoint(model, trial, metrics=metrics)
+        
+        step = self.state.global_step
+        run_dir = self._get_output_dir(trial=trial)
+        output_dir = os.path.join(run_dir, f"{PREFIX_CHECKPOINT_DIR}-{step}")
+        tmp_dir = f"{output_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        
+        if self.hp_search_backend is None and trial is None:
+            self.store_flos()
+        
+        state_dict = _snapshot(self._checkpoint_state_dict())
+        optimizer_state = scheduler_state = None
+        if not self.args.save_only_model:
+            optimizer_state = _snapshot(self.optimizer.state_dict())
+            scheduler_state = self.lr_scheduler.state_dict()
+            self._save_rng_state(tmp_dir)
+        
+        self.state.stateful_callbacks["TrainerControl"] = self.control.state()
+        trainer_state = json.dumps(dataclasses.asdict(self.state), indent=2, sort_keys=True) + "\n"
+        
+        self.checkpoint_writer.submit(
+            self._write_checkpoint, tmp_dir, output_dir, run_dir, step,
+            state_dict, optimizer_state, scheduler_state, trainer_state
+        )
+    
+    def _write_checkpoint(self, tmp_dir: str, output_dir: str, run_dir: str, step: int,
+                          state_dict: Dict[str, torch.Tensor],
+                          optimizer_state: Optional[Dict[str, Any]],
+                          scheduler_state: Optional[Dict[str, Any]],
+                          trainer_state: str):
+        """Serialize a snapshot, publish it atomically and queue it for evaluation (writer thread)"""
+        self._write_weights(tmp_dir, state_dict)
+        if optimizer_state is not None:
+            torch.save(optimizer_state, os.path.join(tmp_dir, OPTIMIZER_NAME))
+            torch.save(scheduler_state, os.path.join(tmp_dir, SCHEDULER_NAME))
+        with open(os.path.join(tmp_dir, TRAINER_STATE_NAME), 'w', encoding='utf-8') as f:
+            f.write(trainer_state)
+        
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+        logger.info(f"Checkpoint written: {output_dir}")
+        
+        if self.checkpoint_evaluator is not None:
+            self.checkpoint_evaluator.submit(output_dir, step)
+        self._rotate_async_checkpoints(run_dir)
+    
+    def _checkpoint_state_dict(self) -> Dict[str, torch.Tensor]:
+        """Tensors a checkpoint holds (snapshotted on the training thread)"""
+        return self.model.state_dict()
+    
+    def _write_weights(self, output_dir: str, state_dict: Dict[str, torch.Tensor]):
+        self.model.save_pretrained(output_dir, state_dict=state_dict, safe_serialization=self.args.save_safetensors)
+    
+    def _rotate_async_checkpoints(self, run_dir: str):
+        """Delete old checkpoints, keeping the best one and any still waiting for evaluation"""
+        limit = self.args.save_total_limit
+        if not limit:
+            return
+        
+        checkpoints = sorted(
+            (int(match.group(1)), os.path.join(run_dir, name))
+            for name in os.listdir(run_dir)
+            if (match := _CHECKPOINT_PATTERN.match(name))
+        )
+        for _, path in checkpoints[:-limit]:
+            # Check pending before reading the best checkpoint: apply() updates the
+            # best checkpoint before releasing a result, so a released checkpoint
+            # that became the best is seen as such
+            if self.checkpoint_evaluator is not None and self.checkpoint_evaluator.is_pending(path):
+                continue
+            if path == self.state.best_model_checkpoint:
+                continue
+            logger.info(f"Deleting older checkpoint {path}")
+            shutil.rmtree(path, ignore_errors=True)
+    
+    def finish_async(self, evaluation_callback: Optional[AsyncEvaluationCallback] = None):
+        """
+        Wait for pending writes and evaluations after training
+        
+        Applies the remaining evaluation results and loads the best checkpoint
+        when load_best_model_at_end-style selection is wanted.
+        """
+        self.checkpoint_writer.wait()
+        if self.checkpoint_evaluator is not None:
+            if evaluation_callback is not None:
+                evaluation_callback.apply(self.checkpoint_evaluator.wait(), self.state)
+            self.checkpoint_evaluator.shutdown()
+            if self.state.best_model_checkpoint and os.path.isdir(self.state.best_model_checkpoint):
+                self._load_best_model()
+            # Final rotation with the best checkpoint known
+            self._rotate_async_checkpoints(self.args.output_dir)
+        
+        logger.info(f"Checkpoint writes took {self.checkpoint_writer.write_seconds:.1f}s in the background; "
+                    f"training blocked {self.checkpoint_writer.blocked_seconds:.1f}s waiting for the writer")
+    
+    def close_async(self):
+        """
+        Stop the writer thread and the evaluation process
+        
+        Safe to call more than once and after a failed or cancelled run, where
+        it also removes the evaluator's tokenized validation set.
+        """
+        try:
+            self.checkpoint_writer.shutdown()
+        except Exception as e:
+            logger.warning(f"Background checkpoint write failed: {e}")
+        finally:
+            if self.checkpoint_evaluator is not None:
+                self.checkpoint_evaluator.shutdown()
+
+
+class AdapterCheckpointMixin:
+    """
+    Trainer mixin that writes LoRA checkpoints as adapter artifacts
+    
+    Checkpoints hold the adapter and task-head tensors and the model config
+    instead of the whole model; the frozen encoder is reloaded from the base
+    model. The optimizer state already covers only the trainable parameters.
+    Each checkpoint-N directory is a loadable adapter, and resuming or loading
+    the best checkpoint copies its tensors back into the model being trained.
+    """
+    
+    def __init__(self, *args, adapter_config: Dict[str, Any], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.adapter_config = adapter_config
+    
+    def _checkpoint_state_dict(self) -> Dict[str, torch.Tensor]:
+        return adapter_state_dict(self.model)
+    
+    def _write_weights(self, output_dir: str, state_dict: Dict[str, torch.Tensor]):
+        save_adapter(self.model, output_dir, self.adapter_config, state_dict)
+        self.model.config.save_pretrained(output_dir)
+    
+    def _save(self, output_dir: Optional[str] = None, state_dict=None):
+        output_dir = output_dir if output_dir is not None else self.args.output_dir
+        self._write_weights(output_dir, adapter_state_dict(self.model))
+        if self.tokenizer is not None:
+            self.tokenizer.save_pretrained(output_dir)
+        torch.save(self.args, os.path.join(output_dir, TRAINING_ARGS_NAME))
+    
+    def _load_from_checkpoint(self, resume_from_checkpoint, model=None):
+        if not is_adapter_dir(resume_from_checkpoint):
+            return super()._load_from_checkpoint(resume_from_checkpoint, model)
+        load_adapter_weights(model or self.model, load_adapter(resume_from_checkpoint)['state'])
+    
+    def _load_best_model(self):
+        if not is_adapter_dir(self.state.best_model_checkpoint):
+            return super()._load_best_model()
+        logger.info(f"Loading best adapter from {self.state.best_model_checkpoint} (score: {self.state.best_metric})")
+        load_adapter_weights(self.model, load_adapter(self.state.best_model_checkpoint)['state'])
+
+
+class AdapterCheckpointTrainer(AdapterCheckpointMixin, Trainer):
+    """Trainer with adapter-only checkpoints"""
+
+
+class AsyncAdapterCheckpointTrainer(AdapterCheckpointMixin, AsyncCheckpointTrainer):
+    """AsyncCheckpointTrainer with adapter-only checkpoints"""
\ No newline at end of file
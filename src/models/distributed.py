@@ -0,0 +1,232 @@
+"""
+Multi-process CPU data-parallel training over gloo
+"""
+
+import os
+import json
+import time
+import queue
+import traceback
+import multiprocessing
+import torch.distributed as dist
+from typing import Dict, List, Optional, Any
+import logging
+
+from .trainer import ModelTrainer
+from ..utils.config import config
+from ..utils.cpu import available_cores, split_cores, pin_to_cores
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_rendezvous(rendezvous: Optional[str], output_dir: str, nnodes: int) -> str:
+    """Turn a rendezvous file path or tcp://host:port address into an init_method URL"""
+    if rendezvous is None:
+        if nnodes > 1:
+            raise ValueError("Multi-node training needs a rendezvous file on a shared filesystem or a tcp://host:port address")
+        rendezvous = os.path.join(output_dir, ".rendezvous")
+        # A file store left over from a previous run would hang the rendezvous
+        if os.path.exists(rendezvous):
+            os.remove(rendezvous)
+    
+    if rendezvous.startswith(('tcp://', 'file://')):
+        return rendezvous
+    return f"file://{os.path.abspath(rendezvous)}"
+
+
+def _worker(local_rank: int,
+            nproc: int,
+            nnodes: int,
+            node_rank: int,
+            init_method: str,
+            cores: List[int],
+            trainer_kwargs: Dict[str, Any],
+            train_kwargs: Dict[str, Any],
+            config_dict: Dict[str, Any],
+            result_queue):
+    """Run one data-parallel training process"""
+    rank = node_rank * nproc + local_rank
+    world_size = nnodes * nproc
+    
+    # Environment read by ModelTrainer and the Hugging Face/accelerate stack
+    os.environ.update({
+        'RANK': str(rank),
+        'WORLD_SIZE': str(world_size),
+        'LOCAL_RANK': str(local_rank),
+        'LOCAL_WORLD_SIZE': str(nproc)
+    })
+    if init_method.startswith('tcp://'):
+        host, port = init_method[len('tcp://'):].rsplit(':', 1)
+        os.environ.update({'MASTER_ADDR': host, 'MASTER_PORT': port})
+    
+    # Spawned processes start from the default config; apply the launcher's overrides
+    config.update_from_dict(config_dict)
+    pin_to_cores(cores)
+    logging.basicConfig(
+        level=logging.INFO if rank == 0 else logging.WARNING,
+        format=f'%(asctime)s - rank {rank} - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    try:
+        dist.init_process_group('gloo', init_method=init_method, rank=rank, world_size=world_size)
+        
+        trainer = ModelTrainer(**trainer_kwargs)
+        result = trainer.train(**train_kwargs)
+        
+        if rank == 0:
+            result_queue.put({
+                'world_size': world_size,
+                'metrics': result['train_result'].metrics,
+                'val_results': result['val_results'],
+                'test_results': result['test_results'],
+                'throughput': trainer.throughput_callback.summary,
+                'model_path': result['model_path']
+            })
+    except Exception:
+        logger.error(f"Rank {rank} failed:\n{traceback.format_exc()}")
+        raise
+    finally:
+        if dist.is_initialized():
+            dist.destroy_process_group()
+
+
+def launch_distributed(trainer_kwargs: Dict[str, Any],
+                       train_kwargs: Dict[str, Any],
+                       nproc: int,
+                       nnodes: int = 1,
+                       node_rank: int = 0,
+                       rendezvous: Optional[str] = None,
+                       cores_per_proc: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Train with nproc data-parallel processes on this node
+    
+    Each process is pinned to its own core slice and trains on a shard of the
+    data (Hugging Face's DistributedSampler); gradients are all-reduced over
+    gloo every optimizer step. For several nodes, run the same command on each
+    node with its node_rank and a rendezvous both can reach.
+    
+    Args:
+        trainer_kwargs: Arguments for ModelTrainer
+        train_kwargs: Arguments for ModelTrainer.train (batch_size is global)
+        nproc: Number of processes on this node
+        nnodes: Number of nodes
+        node_rank: Rank of this node
+        rendezvous: Rendezvous file on a shared filesystem or tcp://host:port
+            of node 0 (defaults to a file in the output directory)
+        cores_per_proc: Cores pinned to each process (defaults to an even share)
+    
+    Returns:
+        Rank 0's results on node 0, None on other nodes
+    """
+    output_dir = trainer_kwargs.get('output_dir', './models/finetuned_model')
+    os.makedirs(output_dir, exist_ok=True)
+    init_method = _resolve_rendezvous(rendezvous, output_dir, nnodes)
+    
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    processes = []
+    for local_rank, cores in enumerate(split_cores(nproc, cores_per_proc)):
+        process = context.Process(
+            target=_worker,
+            args=(local_rank, nproc, nnodes, node_rank, init_method, cores,
+                  trainer_kwargs, train_kwargs, config.to_dict(), result_queue)
+        )
+        process.start()
+        processes.append(process)
+    
+    logger.info(f"Launched {nproc} workers on node {node_rank} of {nnodes} ({init_method})")
+    
+    # Fetch rank 0's result before joining so a large result cannot block its exit
+    result = None
+    while result is None and any(p.is_alive() for p in processes):
+        if any(p.exitcode not in (None, 0) for p in processes):
+            break
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+    
+    # Surviving workers of a failed run would block forever in the next all-reduce
+    if any(p.exitcode not in (None, 0) for p in processes):
+        for process in processes:
+            process.terminate()
+    for process in processes:
+        process.join()
+    
+    if result is None:
+        try:
+            result = result_queue.get_nowait()
+        except queue.Empty:
+            pass
+    
+    exit_codes = [p.exitcode for p in processes]
+    if any(code != 0 for code in exit_codes):
+        raise RuntimeError(f"Distributed training failed (exit codes: {exit_codes})")
+    
+    return result
+
+
+def benchmark_scaling(trainer_kwargs: Dict[str, Any],
+                      train_kwargs: Dict[str, Any],
+                      max_procs: int,
+                      process_counts: Optional[List[int]] = None,
+                      cores_per_proc: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Measure data-parallel scaling efficiency from 1 to max_procs processes
+    
+    Every run uses the same global batch size (strong scaling), so efficiency
+    is throughput(N) / (N * throughput(1)).
+    
+    Args:
+        trainer_kwargs: Arguments for ModelTrainer (output_dir gets a
+            subdirectory per process count)
+        train_kwargs: Arguments for ModelTrainer.train
+        max_procs: Largest number of processes
+        process_counts: Process counts to run (defaults to powers of two up to max_procs)
+        cores_per_proc: Cores pinned to each process (defaults to an even share
+            of the cores for every process count)
+    
+    Returns:
+        Dictionary with one entry per process count
+    """
+    if process_counts is None:
+        process_counts = [1]
+        while process_counts[-1] * 2 < max_procs:
+            process_counts.append(process_counts[-1] * 2)
+        if process_counts[-1] != max_procs:
+            process_counts.append(max_procs)
+    
+    output_dir = trainer_kwargs.get('output_dir', './models/finetuned_model')
+    runs = []
+    for nproc in process_counts:
+        run_kwargs = dict(trainer_kwargs, output_dir=os.path.join(output_dir, f"scaling_{nproc}"))
+        start = time.perf_counter()
+        result = launch_distributed(run_kwargs, train_kwargs, nproc, cores_per_proc=cores_per_proc)
+        wall = time.perf_counter() - start
+        
+        samples_per_second = result['metrics'].get('train_samples_per_second', 0.0)
+        runs.append({
+            'nproc': nproc,
+            'cores_per_proc': len(split_cores(nproc, cores_per_proc)[0]),
+            'wall_seconds': wall,
+            'train_runtime': result['metrics'].get('train_runtime'),
+            'train_samples_per_second': samples_per_second
+        })
+        logger.info(f"{nproc} processes: {samples_per_second:.1f} samples/s")
+    
+    baseline = runs[0]['train_samples_per_second'] / runs[0]['nproc']
+    for run in runs:
+        run['speedup'] = run['train_samples_per_second'] / (baseline or 1e-9)
+        run['efficiency'] = run['speedup'] / run['nproc']
+    
+    report = {
+        'cores_available': len(available_cores()),
+        'runs': runs
+    }
+    
+    report_path = os.path.join(output_dir, "scaling.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Scaling report saved to {report_path}")
+    
+    return report
\ No newline at end of file
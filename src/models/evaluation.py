@@ -0,0 +1,520 @@
+"""
+Single-pass streaming evaluation
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Callable, Iterator, Sequence, Tuple
+import logging
+
+from ..data.loader import DataLoader
+from ..utils.cache import path_stamp
+from ..utils.metrics import MetricsAccumulator, joint_counts, paired_bootstrap, _safe_divide
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingEvaluator:
+    """
+    Accumulate evaluation statistics batch by batch
+    
+    Only a confusion matrix (MetricsAccumulator) and per-bin calibration sums
+    are kept, so memory does not grow with the number of samples. Every
+    metric is derived from them in compute().
+    """
+    
+    def __init__(self, num_labels: int, label_names: Optional[List[str]] = None, num_bins: int = 15):
+        self.num_labels = num_labels
+        self.label_names = label_names or [str(i) for i in range(num_labels)]
+        self.num_bins = num_bins
+        self.metrics = MetricsAccumulator(num_labels, self.label_names)
+        self.bin_counts = np.zeros(num_bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(num_bins, dtype=np.float64)
+        self.bin_correct = np.zeros(num_bins, dtype=np.int64)
+        self.nll_sum = 0.0
+        self.brier_sum = 0.0
+    
+    @property
+    def num_samples(self) -> int:
+        return self.metrics.num_samples
+    
+    def update(self, logits: np.ndarray, label_ids: np.ndarray):
+        """
+        Add a batch of model outputs
+        
+        Args:
+            logits: Array of shape (batch_size, num_labels)
+            label_ids: True label ids
+        """
+        logits = np.asarray(logits, dtype=np.float64)
+        label_ids = np.asarray(label_ids, dtype=np.int64)
+        
+        # Stable softmax
+        shifted = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(shifted)
+        probabilities = exp / exp.sum(axis=1, keepdims=True)
+        predictions = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(predictions)), predictions]
+        
+        self.metrics.update(label_ids, predictions)
+        
+        bins = np.minimum((confidence * self.num_bins).astype(np.int64), self.num_bins - 1)
+        self.bin_counts += np.bincount(bins, minlength=self.num_bins)
+        self.bin_confidence += np.bincount(bins, weights=confidence, minlength=self.num_bins)
+        self.bin_correct += np.bincount(bins, weights=predictions == label_ids, minlength=self.num_bins).astype(np.int64)
+        
+        log_normalizer = np.log(exp.sum(axis=1))
+        self.nll_sum += float((log_normalizer - shifted[np.arange(len(label_ids)), label_ids]).sum())
+        one_hot = np.eye(self.num_labels)[label_ids]
+        self.brier_sum += float(((probabilities - one_hot) ** 2).sum())
+    
+    def merge(self, other: 'StreamingEvaluator') -> 'StreamingEvaluator':
+        """Add the statistics of another evaluator (e.g. another shard of the data)"""
+        if other.num_bins != self.num_bins:
+            raise ValueError(f"Cannot merge evaluators with {other.num_bins} and {self.num_bins} bins")
+        self.metrics.merge(other.metrics)
+        self.bin_counts += other.bin_counts
+        self.bin_confidence += other.bin_confidence
+        self.bin_correct += other.bin_correct
+        self.nll_sum += other.nll_sum
+        self.brier_sum += other.brier_sum
+        return self
+    
+    def compute(self) -> Dict[str, Any]:
+        """Derive accuracy, per-class precision/recall/F1 and calibration metrics"""
+        total = self.num_samples
+        all_labels = np.arange(self.num_labels)
+        stats = self.metrics.per_class(all_labels)
+        averages = self.metrics.averages(all_labels)
+        
+        bin_accuracy = _safe_divide(self.bin_correct, self.bin_counts)
+        bin_confidence = _safe_divide(self.bin_confidence, self.bin_counts)
+        gaps = np.abs(bin_accuracy - bin_confidence)
+        
+        return {
+            'num_samples': int(total),
+            'accuracy': self.metrics.accuracy(),
+            'precision_macro': averages['macro']['precision'],
+            'recall_macro': averages['macro']['recall'],
+            'f1_macro': averages['macro']['f1'],
+            'precision_weighted': averages['weighted']['precision'],
+            'recall_weighted': averages['weighted']['recall'],
+            'f1_weighted': averages['weighted']['f1'],
+            'per_class': {
+                name: {
+                    'precision': float(stats['precision'][i]),
+                    'recall': float(stats['recall'][i]),
+                    'f1': float(stats['f1'][i]),
+                    'support': int(stats['support'][i])
+                }
+                for i, name in enumerate(self.label_names)
+            },
+            'confusion_matrix': self.metrics.confusion.tolist(),
+            'labels': list(self.label_names),
+            'calibration': {
+                'ece': float((gaps * self.bin_counts).sum() / total) if total else 0.0,
+                'mce': float(gaps[self.bin_counts > 0].max()) if total else 0.0,
+                'nll': self.nll_sum / total if total else 0.0,
+                'brier': self.brier_sum / total if total else 0.0,
+                'bins': [
+                    {
+                        'lower': i / self.num_bins,
+                        'upper': (i + 1) / self.num_bins,
+                        'count': int(self.bin_counts[i]),
+                        'accuracy': float(bin_accuracy[i]),
+                        'confidence': float(bin_confidence[i])
+                    }
+                    for i in range(self.num_bins)
+                ]
+            }
+        }
+
+
+def _label_mappings(predictor, adapter: Optional[str]) -> Dict[str, Any]:
+    return predictor.adapters[adapter]['label_mappings'] if adapter else predictor.label_mappings
+
+
+def _label_names(label_mappings: Dict[str, Any]) -> List[str]:
+    return [label_mappings['id_to_label'][str(i)] for i in range(len(label_mappings['label_to_id']))]
+
+
+def _labelled_rows(chunk: pd.DataFrame,
+                   data_loader: DataLoader,
+                   label_to_id: Dict[str, int],
+                   unknown_labels: Optional[Dict[str, int]] = None) -> Tuple[List[str], np.ndarray]:
+    """Texts and label ids of a chunk's rows whose label the model knows"""
+    labels = chunk[data_loader.label_column].astype(str)
+    known = labels.isin(label_to_id.keys())
+    if unknown_labels is not None:
+        for label, count in labels[~known].value_counts().items():
+            unknown_labels[label] = unknown_labels.get(label, 0) + int(count)
+    
+    texts = chunk[data_loader.text_column].astype(str)[known].tolist()
+    return texts, labels[known].map(label_to_id).to_numpy(dtype=np.int64)
+
+
+def predict_texts(predictor,
+                  texts: Sequence[str],
+                  num_labels: int,
+                  batch_size: int = 64,
+                  adapter: Optional[str] = None) -> np.ndarray:
+    """
+    Logits for any number of texts, in input order
+    
+    Texts are sorted by length so each batch pads only to its own longest text.
+    """
+    logits = np.empty((len(texts), num_labels), dtype=np.float32)
+    order = np.argsort([len(t) for t in texts], kind='stable')
+    for i in range(0, len(order), batch_size):
+        positions = order[i:i + batch_size]
+        logits[positions] = predictor.predict_logits([texts[p] for p in positions], adapter=adapter)
+    return logits
+
+
+class PredictionCache:
+    """
+    Cache of model logits keyed by model and texts
+    
+    Keys combine the model directory's modification stamp, the adapter and the
+    exact texts, so evaluating the same model on the same data again (even
+    from a re-uploaded copy of the file) reads the logits instead of running
+    the model, and a retrained model never hits stale entries.
+    """
+    
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(cache_dir, "predictions")
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def model_fingerprint(predictor, adapter: Optional[str] = None) -> str:
+        """Model path and weights stamp, plus the adapter and its sequence length"""
+        model_path = predictor.adapters[adapter]['path'] if adapter else predictor.model_path
+        max_length = predictor.adapters[adapter]['max_length'] if adapter else predictor.max_length
+        mtime_ns, size = path_stamp(model_path)
+        return f"{os.path.abspath(model_path)}:{mtime_ns}:{size}|{adapter}|{max_length}"
+    
+    def key(self, fingerprint: str, texts: Sequence[str]) -> str:
+        """Cache key for a model fingerprint and the exact texts"""
+        text_hashes = pd.util.hash_pandas_object(pd.Series(texts, dtype=object), index=False)
+        digest = hashlib.sha256()
+        digest.update(f"{fingerprint}|".encode('utf-8'))
+        digest.update(text_hashes.to_numpy().tobytes())
+        return digest.hexdigest()[:32]
+    
+    def load(self, key: str) -> Optional[np.ndarray]:
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        return np.load(path) if os.path.exists(path) else None
+    
+    def save(self, key: str, logits: np.ndarray):
+        tmp_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, logits)
+        # Publish atomically so readers never see a partial file
+        os.replace(tmp_path, os.path.join(self.cache_dir, f"{key}.npy"))
+
+
+def iter_labelled_batches(file_path: str,
+                          label_to_id: Dict[str, int],
+                          batch_size: int = 64,
+                          chunk_size: int = 10000,
+                          max_samples: Optional[int] = None,
+                          unknown_labels: Optional[Dict[str, int]] = None) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """
+    Stream (texts, label ids) batches from a labelled data file
+    
+    The file is read chunk by chunk; within a chunk texts are sorted by length
+    so each batch pads only to its own longest text. Rows whose label is not
+    in label_to_id are skipped and counted in unknown_labels.
+    
+    Args:
+        file_path: CSV, JSON or JSON Lines file with text and label columns
+        label_to_id: Label mapping of the model
+        batch_size: Texts per batch
+        chunk_size: Rows read from the file at a time
+        max_samples: Stop after this many samples
+        unknown_labels: Dictionary updated with counts of skipped labels
+    
+    Yields:
+        Tuples of (texts, label ids)
+    """
+    data_loader = DataLoader()
+    seen = 0
+    
+    for chunk in data_loader.iter_chunks(file_path, chunk_size=chunk_size):
+        texts, label_ids = _labelled_rows(chunk, data_loader, label_to_id, unknown_labels)
+        if max_samples is not None:
+            texts, label_ids = texts[:max_samples - seen], label_ids[:max_samples - seen]
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        
+        for i in range(0, len(order), batch_size):
+            positions = order[i:i + batch_size]
+            yield [texts[p] for p in positions], label_ids[positions]
+        
+        seen += len(texts)
+        if max_samples is not None and seen >= max_samples:
+            break
+
+
+def evaluate_file(predictor,
+                  file_path: str,
+                  batch_size: int = 64,
+                  chunk_size: int = 10000,
+                  num_bins: int = 15,
+                  max_samples: Optional[int] = None,
+                  adapter: Optional[str] = None,
+                  bootstrap: int = 0,
+                  confidence: float = 0.95,
+                  progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Evaluate a predictor on a labelled data file in one streaming pass
+    
+    Args:
+        predictor: ModelPredictor
+        file_path: CSV, JSON or JSON Lines file with text and label columns
+        batch_size: Texts per forward pass
+        chunk_size: Rows read from the file at a time
+        num_bins: Number of confidence bins for calibration
+        max_samples: Stop after this many samples
+        adapter: Adapter to evaluate (adapter models only)
+        bootstrap: Number of bootstrap resamples for confidence intervals (0 disables)
+        confidence: Confidence level of the intervals
+        progress_callback: Called with the number of samples evaluated so far
+    
+    Returns:
+        Evaluation results dictionary
+    """
+    adapter = predictor._resolve_adapter(adapter)
+    label_mappings = _label_mappings(predictor, adapter)
+    label_names = _label_names(label_mappings)
+    
+    evaluator = StreamingEvaluator(len(label_names), label_names, num_bins=num_bins)
+    unknown_labels: Dict[str, int] = {}
+    start = time.perf_counter()
+    
+    for texts, label_ids in iter_labelled_batches(file_path, label_mappings['label_to_id'], batch_size,
+                                                  chunk_size, max_samples, unknown_labels):
+        evaluator.update(predictor.predict_logits(texts, adapter=adapter), label_ids)
+        if progress_callback is not None:
+            progress_callback(evaluator.num_samples)
+    
+    seconds = time.perf_counter() - start
+    if unknown_labels:
+        logger.warning(f"Skipped {sum(unknown_labels.values())} samples with labels unknown to the model: "
+                       f"{sorted(unknown_labels)}")
+    
+    results = _summarize(evaluator, predictor, adapter, file_path, unknown_labels, seconds)
+    if bootstrap and results['num_samples']:
+        results['confidence_intervals'] = evaluator.metrics.bootstrap(
+            bootstrap, confidence, labels=np.arange(len(label_names))
+        )
+    
+    logger.info(f"Evaluated {results['num_samples']} samples in {seconds:.1f}s: "
+                f"accuracy {results['accuracy']:.4f}, macro F1 {results['f1_macro']:.4f}, "
+                f"ECE {results['calibration']['ece']:.4f}")
+    
+    return results
+
+
+def _summarize(evaluator: StreamingEvaluator,
+               predictor,
+               adapter: Optional[str],
+               file_path: str,
+               unknown_labels: Dict[str, int],
+               seconds: float) -> Dict[str, Any]:
+    results = evaluator.compute()
+    results.update({
+        'model_path': predictor.model_path,
+        'adapter': adapter,
+        'data_file': file_path,
+        'skipped_unknown_labels': unknown_labels,
+        'timing': {
+            'seconds': seconds,
+            'samples_per_second': results['num_samples'] / seconds if seconds > 0 else 0.0
+        }
+    })
+    return results
+
+
+class ChunkedEvaluation:
+    """
+    Resumable chunk-by-chunk evaluation of a labelled file
+    
+    run() yields after every chunk, so a caller can show running metrics or
+    stop early; calling run() again continues after the last completed chunk
+    (earlier chunks are re-read but not re-evaluated). A chunk's statistics
+    are added only once it is complete, so results() is always consistent.
+    With a PredictionCache, each chunk's logits are cached and repeat
+    evaluations of the same model and data skip inference.
+    """
+    
+    def __init__(self,
+                 predictor,
+                 file_path: str,
+                 chunk_size: int = 2000,
+                 batch_size: int = 64,
+                 num_bins: int = 15,
+                 adapter: Optional[str] = None,
+                 cache: Optional[PredictionCache] = None):
+        """
+        Args:
+            predictor: ModelPredictor
+            file_path: CSV, JSON or JSON Lines file with text and label columns
+            chunk_size: Rows evaluated between progress updates
+            batch_size: Texts per forward pass
+            num_bins: Number of confidence bins for calibration
+            adapter: Adapter to evaluate (adapter models only)
+            cache: Cache for chunk logits (None disables caching)
+        """
+        self.predictor = predictor
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.adapter = predictor._resolve_adapter(adapter)
+        self.cache = cache
+        self.fingerprint = PredictionCache.model_fingerprint(predictor, self.adapter) if cache else None
+        
+        self.label_to_id = _label_mappings(predictor, self.adapter)['label_to_id']
+        label_names = _label_names(_label_mappings(predictor, self.adapter))
+        self.evaluator = StreamingEvaluator(len(label_names), label_names, num_bins=num_bins)
+        self.unknown_labels: Dict[str, int] = {}
+        self.chunks_done = 0
+        self.cached_chunks = 0
+        self.rows_read = 0
+        self.seconds = 0.0
+        self.finished = False
+    
+    def _chunk_logits(self, texts: List[str]) -> np.ndarray:
+        key = self.cache.key(self.fingerprint, texts) if self.cache is not None else None
+        logits = self.cache.load(key) if key is not None else None
+        if logits is not None:
+            self.cached_chunks += 1
+            return logits
+        
+        logits = predict_texts(self.predictor, texts, self.evaluator.num_labels, self.batch_size, self.adapter)
+        if key is not None:
+            self.cache.save(key, logits)
+        return logits
+    
+    def run(self) -> Iterator[Dict[str, Any]]:
+        """
+        Evaluate the remaining chunks
+        
+        Yields:
+            progress() after each chunk
+        """
+        data_loader = DataLoader()
+        for index, chunk in enumerate(data_loader.iter_chunks(self.file_path, chunk_size=self.chunk_size)):
+            if index < self.chunks_done:
+                continue
+            
+            start = time.perf_counter()
+            unknown_labels: Dict[str, int] = {}
+            texts, label_ids = _labelled_rows(chunk, data_loader, self.label_to_id, unknown_labels)
+            if texts:
+                self.evaluator.update(self._chunk_logits(texts), label_ids)
+            
+            for label, count in unknown_labels.items():
+                self.unknown_labels[label] = self.unknown_labels.get(label, 0) + count
+            self.rows_read += len(chunk)
+            self.chunks_done += 1
+            self.seconds += time.perf_counter() - start
+            yield self.progress()
+        
+        self.finished = True
+        logger.info(f"Evaluated {self.evaluator.num_samples} samples of {self.file_path} in {self.seconds:.1f}s "
+                    f"({self.cached_chunks}/{self.chunks_done} chunks from the prediction cache)")
+    
+    def progress(self) -> Dict[str, Any]:
+        """Chunks, rows and samples processed so far"""
+        return {
+            'chunks': self.chunks_done,
+            'cached_chunks': self.cached_chunks,
+            'rows_read': self.rows_read,
+            'num_samples': self.evaluator.num_samples,
+            'seconds': self.seconds,
+            'finished': self.finished
+        }
+    
+    def results(self) -> Dict[str, Any]:
+        """Evaluation results over the chunks completed so far"""
+        results = _summarize(self.evaluator, self.predictor, self.adapter, self.file_path,
+                             dict(self.unknown_labels), self.seconds)
+        results['progress'] = self.progress()
+        return results
+
+
+def compare_models(predictor_a,
+                   predictor_b,
+                   file_path: str,
+                   batch_size: int = 64,
+                   chunk_size: int = 10000,
+                   max_samples: Optional[int] = None,
+                   num_resamples: int = 1000,
+                   confidence: float = 0.95,
+                   adapter_a: Optional[str] = None,
+                   adapter_b: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compare two models on the same test file with a paired bootstrap
+    
+    Both models see the same batches in one streaming pass; only the joint
+    counts of (true label, prediction A, prediction B) are kept.
+    
+    Args:
+        predictor_a: Baseline ModelPredictor
+        predictor_b: Candidate ModelPredictor
+        file_path: CSV, JSON or JSON Lines file with text and label columns
+        batch_size: Texts per forward pass
+        chunk_size: Rows read from the file at a time
+        max_samples: Stop after this many samples
+        num_resamples: Number of bootstrap resamples
+        confidence: Confidence level of the intervals
+        adapter_a: Adapter of model A (adapter models only)
+        adapter_b: Adapter of model B (adapter models only)
+    
+    Returns:
+        Paired bootstrap results (differences are B - A)
+    """
+    adapter_a = predictor_a._resolve_adapter(adapter_a)
+    adapter_b = predictor_b._resolve_adapter(adapter_b)
+    label_to_id = _label_mappings(predictor_a, adapter_a)['label_to_id']
+    if _label_mappings(predictor_b, adapter_b)['label_to_id'] != label_to_id:
+        raise ValueError("Models can only be compared when they share the same label mapping")
+    
+    num_labels = len(label_to_id)
+    counts = np.zeros((num_labels,) * 3, dtype=np.int64)
+    unknown_labels: Dict[str, int] = {}
+    
+    for texts, label_ids in iter_labelled_batches(file_path, label_to_id, batch_size,
+                                                  chunk_size, max_samples, unknown_labels):
+        predictions_a = predictor_a.predict_logits(texts, adapter=adapter_a).argmax(axis=1)
+        predictions_b = predictor_b.predict_logits(texts, adapter=adapter_b).argmax(axis=1)
+        counts += joint_counts(label_ids, predictions_a, predictions_b, num_labels)
+    
+    if not counts.any():
+        raise ValueError(f"No samples with known labels in {file_path}")
+    
+    results = paired_bootstrap(counts, num_resamples, confidence, labels=np.arange(num_labels))
+    results.update({
+        'model_a': predictor_a.model_path,
+        'model_b': predictor_b.model_path,
+        'adapter_a': adapter_a,
+        'adapter_b': adapter_b,
+        'data_file': file_path,
+        'skipped_unknown_labels': unknown_labels
+    })
+    
+    logger.info(f"Accuracy {results['accuracy']['model_a']:.4f} vs {results['accuracy']['model_b']:.4f} "
+                f"(difference {results['accuracy']['difference']['estimate']:+.4f}, "
+                f"p={results['accuracy']['p_value']:.3f})")
+    
+    return results
+
+
+def save_results(results: Dict[str, Any], output_path: str):
+    """Write evaluation results as JSON"""
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Evaluation results saved to {output_path}")
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+Frozen-encoder embedding cache and classification heads trained on it
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from safetensors.torch import save_file, load_file
+from transformers import AutoTokenizer
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+HEAD_CONFIG_NAME = "head_config.json"
+HEAD_WEIGHTS_NAME = "head_model.safetensors"
+
+
+class ClassificationHead(nn.Module):
+    """Linear or one-hidden-layer MLP classifier over pooled embeddings"""
+    
+    def __init__(self, input_dim: int, num_labels: int, head_type: str = "linear",
+                 hidden_dim: int = 256, dropout: float = 0.1):
+        super().__init__()
+        if head_type == "linear":
+            self.layers = nn.Sequential(nn.Dropout(dropout), nn.Linear(input_dim, num_labels))
+        elif head_type == "mlp":
+            self.layers = nn.Sequential(
+                nn.Dropout(dropout),
+                nn.Linear(input_dim, hidden_dim),
+                nn.GELU(),
+                nn.Dropout(dropout),
+                nn.Linear(hidden_dim, num_labels)
+            )
+        else:
+            raise ValueError(f"Unknown head type: {head_type}")
+    
+    def forward(self, features: torch.Tensor) -> torch.Tensor:
+        return self.layers(features)
+
+
+def pool_outputs(outputs, attention_mask: torch.Tensor, pooling: str = "mean") -> torch.Tensor:
+    """
+    Pool encoder outputs into one vector per text
+    
+    Args:
+        outputs: Output of the base encoder
+        attention_mask: Attention mask of the inputs
+        pooling: 'mean' (masked mean of the last hidden states), 'cls' (first
+            token) or 'pooler' (the model's pooler output)
+    
+    Returns:
+        Tensor of shape (batch_size, hidden_size)
+    """
+    hidden = outputs.last_hidden_state
+    if pooling == "mean":
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+    if pooling == "cls":
+        return hidden[:, 0]
+    if pooling == "pooler":
+        if getattr(outputs, 'pooler_output', None) is None:
+            raise ValueError("This model has no pooler; use 'mean' or 'cls' pooling")
+        return outputs.pooler_output
+    raise ValueError(f"Unknown pooling: {pooling}")
+
+
+def encode_texts(encoder: nn.Module,
+                 tokenizer: AutoTokenizer,
+                 texts: Sequence[str],
+                 max_length: int = 512,
+                 pooling: str = "mean",
+                 batch_size: int = 64,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Run a frozen encoder over texts and pool the outputs
+    
+    Texts are processed in length-sorted batches so each batch pads to its own
+    longest text rather than max_length.
+    
+    Args:
+        encoder: Base encoder (e.g. model.base_model)
+        tokenizer: Hugging Face tokenizer
+        texts: Input texts
+        max_length: Maximum sequence length
+        pooling: Pooling method (see pool_outputs)
+        batch_size: Number of texts per forward pass
+        out: Optional array (e.g. a memmap) of shape (len(texts), hidden_size) to fill
+    
+    Returns:
+        Array of pooled embeddings
+    """
+    device = next(encoder.parameters()).device
+    if out is None:
+        out = np.empty((len(texts), encoder.config.hidden_size), dtype=np.float32)
+    
+    lengths = np.fromiter((len(str(t)) for t in texts), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind='stable')
+    
+    encoder.eval()
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            inputs = tokenizer(
+                [str(texts[i]) for i in positions],
+                truncation=True,
+                padding=True,
+                max_length=max_length,
+                return_tensors='pt'
+            )
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            pooled = pool_outputs(encoder(**inputs), inputs['attention_mask'], pooling)
+            out[positions] = pooled.float().cpu().numpy()
+    
+    return out
+
+
+class EmbeddingCache:
+    """Memory-mapped cache of pooled embeddings keyed by encoder and data"""
+    
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(cache_dir, "embeddings")
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def _model_fingerprint(model_name: str) -> str:
+        """Model name plus, for local directories, the weights' modification time"""
+        if os.path.isdir(model_name):
+            stamps = [
+                str(os.path.getmtime(os.path.join(model_name, name)))
+                for name in sorted(os.listdir(model_name)) if name.endswith(('.safetensors', '.bin'))
+            ]
+            return os.path.abspath(model_name) + ':' + ','.join(stamps)
+        return model_name
+    
+    def key(self, model_name: str, texts: Sequence[str], max_length: int, pooling: str) -> str:
+        """Cache key for an encoder, its settings and the exact texts"""
+        text_hashes = pd.util.hash_pandas_object(pd.Series(texts, dtype=object).astype(str), index=False)
+        digest = hashlib.sha256()
+        digest.update(f"{self._model_fingerprint(model_name)}|{max_length}|{pooling}|".encode('utf-8'))
+        digest.update(text_hashes.to_numpy().tobytes())
+        return digest.hexdigest()[:32]
+    
+    def get_or_compute(self,
+                       encoder: nn.Module,
+                       tokenizer: AutoTokenizer,
+                       model_name: str,
+                       texts: Sequence[str],
+                       max_length: int = 512,
+                       pooling: str = "mean",
+                       batch_size: int = 64) -> Tuple[np.ndarray, bool]:
+        """
+        Load cached embeddings or compute and cache them
+        
+        Args:
+            encoder: Base encoder
+            tokenizer: Hugging Face tokenizer
+            model_name: Name or path identifying the encoder weights
+            texts: Input texts
+            max_length: Maximum sequence length
+            pooling: Pooling method
+            batch_size: Number of texts per forward pass
+        
+        Returns:
+            Tuple of (read-only memory-mapped embeddings, whether they came from the cache)
+        """
+        key = self.key(model_name, texts, max_length, pooling)
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        
+        if os.path.exists(path):
+            logger.info(f"Embedding cache hit: {path}")
+            return np.load(path, mmap_mode='r'), True
+        
+        start = time.perf_counter()
+        tmp_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp.npy")
+        out = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float32, shape=(len(texts), encoder.config.hidden_size)
+        )
+        encode_texts(encoder, tokenizer, texts, max_length=max_length, pooling=pooling,
+                     batch_size=batch_size, out=out)
+        out.flush()
+        del out
+        # Publish atomically so readers never see a partial file
+        os.replace(tmp_path, path)
+        
+        with open(os.path.join(self.cache_dir, f"{key}.json"), 'w') as f:
+            json.dump({'model_name': model_name, 'num_texts': len(texts), 'max_length': max_length,
+                       'pooling': pooling, 'seconds': time.perf_counter() - start}, f, indent=2)
+        
+        logger.info(f"Cached {len(texts)} embeddings in {time.perf_counter() - start:.1f}s: {path}")
+        return np.load(path, mmap_mode='r'), False
+
+
+def train_head(train_features: np.ndarray,
+               train_labels: np.ndarray,
+               num_labels: int,
+               val_features: Optional[np.ndarray] = None,
+               val_labels: Optional[np.ndarray] = None,
+               head_type: str = "linear",
+               hidden_dim: int = 256,
+               dropout: float = 0.1,
+               num_epochs: int = 100,
+               learning_rate: float = 1e-3,
+               weight_decay: float = 0.01,
+               batch_size: int = 256,
+               patience: int = 10,
+               seed: int = 42) -> Tuple[ClassificationHead, List[Dict[str, float]]]:
+    """
+    Train a classification head on cached features
+    
+    Args:
+        train_features: Training embeddings
+        train_labels: Training label ids
+        num_labels: Number of labels
+        val_features: Validation embeddings (enables early stopping)
+        val_labels: Validation label ids
+        head_type: 'linear' or 'mlp'
+        hidden_dim: Hidden size of the MLP head
+        dropout: Dropout on the head input (and hidden layer)
+        num_epochs: Maximum number of epochs
+        learning_rate: AdamW learning rate
+        weight_decay: AdamW weight decay
+        batch_size: Batch size
+        patience: Epochs without validation improvement before stopping
+        seed: Random seed
+    
+    Returns:
+        Tuple of (best head, per-epoch history)
+    """
+    torch.manual_seed(seed)
+    generator = torch.Generator().manual_seed(seed)
+    
+    X = torch.from_numpy(np.array(train_features, dtype=np.float32))
+    y = torch.as_tensor(np.asarray(train_labels), dtype=torch.long)
+    has_val = val_features is not None and len(val_features) > 0
+    if has_val:
+        X_val = torch.from_numpy(np.array(val_features, dtype=np.float32))
+        y_val = torch.as_tensor(np.asarray(val_labels), dtype=torch.long)
+    
+    head = ClassificationHead(X.shape[1], num_labels, head_type=head_type, hidden_dim=hidden_dim, dropout=dropout)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=learning_rate, weight_decay=weight_decay)
+    loss_fn = nn.CrossEntropyLoss()
+    
+    history = []
+    best_loss, best_state, stale = float('inf'), None, 0
+    for epoch in range(num_epochs):
+        head.train()
+        permutation = torch.randperm(len(X), generator=generator)
+        total_loss = 0.0
+        for start in range(0, len(X), batch_size):
+            batch = permutation[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = loss_fn(head(X[batch]), y[batch])
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        
+        record = {'epoch': epoch + 1, 'train_loss': total_loss / max(len(X), 1)}
+        monitored = record['train_loss']
+        if has_val:
+            head.eval()
+            with torch.no_grad():
+                logits = head(X_val)
+            record['val_loss'] = loss_fn(logits, y_val).item()
+            record['val_accuracy'] = (logits.argmax(dim=-1) == y_val).float().mean().item()
+            monitored = record['val_loss']
+        history.append(record)
+        
+        if monitored < best_loss - 1e-6:
+            best_loss, stale = monitored, 0
+            best_state = {k: v.detach().clone() for k, v in head.state_dict().items()}
+        else:
+            stale += 1
+            if has_val and stale >= patience:
+                logger.info(f"Early stopping head training after {epoch + 1} epochs")
+                break
+    
+    if best_state is not None:
+        head.load_state_dict(best_state)
+    head.eval()
+    
+    return head, history
+
+
+def is_head_dir(path: str) -> bool:
+    """Check whether a model directory holds a head trained on a frozen encoder"""
+    return os.path.exists(os.path.join(path, HEAD_CONFIG_NAME))
+
+
+def save_head(head: ClassificationHead, output_dir: str, head_config: Dict[str, Any]):
+    """Save a head and the settings needed to rebuild it and its features"""
+    os.makedirs(output_dir, exist_ok=True)
+    save_file({k: v.contiguous() for k, v in head.state_dict().items()},
+              os.path.join(output_dir, HEAD_WEIGHTS_NAME))
+    with open(os.path.join(output_dir, HEAD_CONFIG_NAME), 'w') as f:
+        json.dump(head_config, f, indent=2)
+    logger.info(f"Head saved to {output_dir}")
+
+
+def load_head(path: str, device: Optional[torch.device] = None) -> Dict[str, Any]:
+    """
+    Load a head saved by save_head
+    
+    Returns:
+        Dictionary with 'config' and the 'module' in eval mode
+    """
+    with open(os.path.join(path, HEAD_CONFIG_NAME), 'r') as f:
+        head_config = json.load(f)
+    head = ClassificationHead(
+        head_config['input_dim'], head_config['num_labels'],
+        head_type=head_config['head_type'], hidden_dim=head_config.get('hidden_dim', 256)
+    )
+    head.load_state_dict(load_file(os.path.join(path, HEAD_WEIGHTS_NAME)))
+    head.to(device or 'cpu')
+    head.eval()
+    return {'config': head_config, 'module': head}
\ No newline at end of file
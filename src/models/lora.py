@@ -0,0 +1,244 @@
+"""
+Low-rank adapters (LoRA) for parameter-efficient fine-tuning
+"""
+
+import os
+import json
+import math
+import torch
+import torch.nn as nn
+from safetensors.torch import save_file, load_file
+from typing import Dict, List, Any, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADAPTER_CONFIG_NAME = "adapter_config.json"
+ADAPTER_WEIGHTS_NAME = "adapter_model.safetensors"
+
+# Attention projections of BERT/RoBERTa, DistilBERT and GPT-style/DeBERTa-v2 models
+DEFAULT_TARGET_MODULES = ("query", "value", "q_lin", "v_lin", "q_proj", "v_proj")
+
+
+class LoRALinear(nn.Module):
+    """
+    Linear layer with a frozen base weight and a low-rank update
+    
+    Computes ``base(x) + scaling * x A^T B^T``. B starts at zero so training
+    starts from the base model. The adapter tensors can be swapped at any time
+    (see set_adapter); without an adapter the layer is the base layer.
+    """
+    
+    def __init__(self, base: nn.Linear, rank: int = 0, alpha: float = 16.0, dropout: float = 0.0):
+        super().__init__()
+        self.base = base
+        self.dropout = nn.Dropout(dropout) if dropout > 0 else nn.Identity()
+        self.register_parameter('lora_A', None)
+        self.register_parameter('lora_B', None)
+        self.scaling = 0.0
+        
+        if rank > 0:
+            self.lora_A = nn.Parameter(base.weight.new_empty(rank, base.in_features))
+            self.lora_B = nn.Parameter(base.weight.new_zeros(base.out_features, rank))
+            nn.init.kaiming_uniform_(self.lora_A, a=math.sqrt(5))
+            self.scaling = alpha / rank
+    
+    def set_adapter(self, lora_A: Optional[torch.Tensor], lora_B: Optional[torch.Tensor], scaling: float):
+        """Use another adapter's tensors (None disables the low-rank update)"""
+        self.lora_A = nn.Parameter(lora_A, requires_grad=False) if lora_A is not None else None
+        self.lora_B = nn.Parameter(lora_B, requires_grad=False) if lora_B is not None else None
+        self.scaling = scaling
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        output = self.base(x)
+        if self.lora_A is not None:
+            output = output + (self.dropout(x) @ self.lora_A.t() @ self.lora_B.t()) * self.scaling
+        return output
+    
+    def merged(self) -> nn.Linear:
+        """Plain linear layer with the low-rank update folded into the weight"""
+        linear = nn.Linear(self.base.in_features, self.base.out_features,
+                           bias=self.base.bias is not None,
+                           device=self.base.weight.device, dtype=self.base.weight.dtype)
+        with torch.no_grad():
+            weight = self.base.weight.clone()
+            if self.lora_A is not None:
+                weight += (self.lora_B @ self.lora_A) * self.scaling
+            linear.weight.copy_(weight)
+            if self.base.bias is not None:
+                linear.bias.copy_(self.base.bias)
+        return linear
+
+
+def _matches(name: str, target_modules: Sequence[str]) -> bool:
+    return name.rsplit('.', 1)[-1] in target_modules
+
+
+def inject_lora(model: nn.Module,
+                rank: int = 8,
+                alpha: float = 16.0,
+                dropout: float = 0.0,
+                target_modules: Sequence[str] = DEFAULT_TARGET_MODULES) -> List[str]:
+    """
+    Wrap the encoder's target linear layers with LoRALinear
+    
+    Args:
+        model: Sequence classification model
+        rank: Rank of the update (0 wraps the layers without an adapter)
+        alpha: Scaling numerator; the update is scaled by alpha / rank
+        dropout: Dropout applied to the adapter input
+        target_modules: Names (last path component) of the layers to wrap
+    
+    Returns:
+        Names of the wrapped layers
+    """
+    encoder = getattr(model, model.base_model_prefix, model)
+    prefix = f"{model.base_model_prefix}." if encoder is not model else ""
+    
+    wrapped = []
+    for name, module in list(encoder.named_modules()):
+        if not isinstance(module, nn.Linear) or not _matches(name, target_modules):
+            continue
+        parent_name, _, child_name = name.rpartition('.')
+        parent = encoder.get_submodule(parent_name) if parent_name else encoder
+        setattr(parent, child_name, LoRALinear(module, rank=rank, alpha=alpha, dropout=dropout))
+        wrapped.append(prefix + name)
+    
+    if not wrapped:
+        raise ValueError(f"No linear layers named {list(target_modules)} found in {type(model).__name__}")
+    
+    return wrapped
+
+
+def head_parameter_names(model: nn.Module) -> List[str]:
+    """Names of the task-head parameters (everything outside the base encoder)"""
+    prefix = f"{model.base_model_prefix}."
+    return [name for name, _ in model.named_parameters() if not name.startswith(prefix)]
+
+
+def mark_trainable(model: nn.Module) -> Dict[str, int]:
+    """
+    Freeze everything except the adapters and the task head
+    
+    Returns:
+        Dictionary with trainable and total parameter counts
+    """
+    head = set(head_parameter_names(model))
+    for name, param in model.named_parameters():
+        param.requires_grad = name in head or '.lora_' in name
+    
+    trainable = sum(p.numel() for p in model.parameters() if p.requires_grad)
+    total = sum(p.numel() for p in model.parameters())
+    logger.info(f"LoRA: training {trainable:,} of {total:,} parameters ({trainable / total:.2%})")
+    
+    return {'trainable_parameters': trainable, 'total_parameters': total}
+
+
+def adapter_state_dict(model: nn.Module) -> Dict[str, torch.Tensor]:
+    """Adapter and task-head tensors of a LoRA model"""
+    head = set(head_parameter_names(model))
+    return {
+        name: param.detach().cpu().contiguous()
+        for name, param in model.named_parameters()
+        if name in head or '.lora_' in name
+    }
+
+
+def save_adapter(model: nn.Module, output_dir: str, adapter_config: Dict[str, Any],
+                 state_dict: Optional[Dict[str, torch.Tensor]] = None) -> str:
+    """
+    Save the adapter artifact (config and adapter/head weights)
+    
+    Args:
+        model: LoRA model
+        output_dir: Directory to write to
+        adapter_config: Base model name, rank, alpha, target modules, ...
+        state_dict: Previously taken adapter_state_dict(model) to write instead
+            of the model's current tensors
+    
+    Returns:
+        Path of the weights file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    weights_path = os.path.join(output_dir, ADAPTER_WEIGHTS_NAME)
+    save_file(state_dict if state_dict is not None else adapter_state_dict(model), weights_path)
+    with open(os.path.join(output_dir, ADAPTER_CONFIG_NAME), 'w') as f:
+        json.dump(adapter_config, f, indent=2)
+    
+    logger.info(f"Adapter saved to {output_dir} ({os.path.getsize(weights_path) / (1024 * 1024):.2f} MB)")
+    return weights_path
+
+
+def is_adapter_dir(path: str) -> bool:
+    """Check whether a model directory holds an adapter artifact"""
+    return os.path.exists(os.path.join(path, ADAPTER_CONFIG_NAME))
+
+
+def load_adapter(path: str, device: Optional[torch.device] = None) -> Dict[str, Any]:
+    """
+    Load an adapter artifact
+    
+    Args:
+        path: Adapter directory
+        device: Device to load the tensors to
+    
+    Returns:
+        Dictionary with 'config' and 'state'
+    """
+    with open(os.path.join(path, ADAPTER_CONFIG_NAME), 'r') as f:
+        adapter_config = json.load(f)
+    state = load_file(os.path.join(path, ADAPTER_WEIGHTS_NAME), device=str(device or 'cpu'))
+    return {'config': adapter_config, 'state': state}
+
+
+def load_adapter_weights(model: nn.Module, state: Dict[str, torch.Tensor]):
+    """
+    Copy saved adapter and head tensors into a LoRA model's own parameters
+    
+    Unlike apply_adapter the parameters stay trainable, so this is used to
+    resume training from an adapter checkpoint.
+    
+    Args:
+        model: Model prepared with inject_lora at the adapter's rank
+        state: Adapter tensors (load_adapter(path)['state'])
+    """
+    result = model.load_state_dict(state, strict=False)
+    if result.unexpected_keys:
+        raise ValueError(f"Adapter tensors do not match the model: {result.unexpected_keys[:5]}")
+
+
+def apply_adapter(model: nn.Module, adapter: Dict[str, Any]):
+    """
+    Point a LoRA-wrapped model at an adapter's tensors (no copies)
+    
+    Args:
+        model: Model prepared with inject_lora
+        adapter: Adapter from load_adapter
+    """
+    adapter_config, state = adapter['config'], adapter['state']
+    scaling = adapter_config['alpha'] / adapter_config['rank']
+    
+    for name, module in model.named_modules():
+        if isinstance(module, LoRALinear):
+            module.set_adapter(state.get(f"{name}.lora_A"), state.get(f"{name}.lora_B"), scaling)
+    
+    for name in head_parameter_names(model):
+        if name in state:
+            module_name, _, param_name = name.rpartition('.')
+            setattr(model.get_submodule(module_name), param_name, nn.Parameter(state[name], requires_grad=False))
+
+
+def clear_adapter(model: nn.Module):
+    """Disable the low-rank updates so the encoder behaves like the base model"""
+    for module in model.modules():
+        if isinstance(module, LoRALinear):
+            module.set_adapter(None, None, 0.0)
+
+
+def merge_lora(model: nn.Module) -> nn.Module:
+    """Replace every LoRALinear with a plain linear layer holding the merged weight"""
+    for name, module in list(model.named_modules()):
+        if isinstance(module, LoRALinear):
+            parent_name, _, child_name = name.rpartition('.')
+            setattr(model.get_submodule(parent_name), child_name, module.merged())
+    return model
\ No newline at end of file
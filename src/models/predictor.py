@@ -9,9 +9,45 @@ from typing import List, Dict, Any, Tuple, Optional
 import logging
 import json
 import os
+import copy
+import time
+import threading
+
+from .lora import (
+    LoRALinear, inject_lora, load_adapter, apply_adapter, clear_adapter, merge_lora,
+    is_adapter_dir, ADAPTER_WEIGHTS_NAME
+)
+from .heads import load_head, pool_outputs, is_head_dir, HEAD_WEIGHTS_NAME
+from ..utils.memory import get_current_rss_mb
 
 logger = logging.getLogger(__name__)
 
+# Base encoders shared by every adapter and head predictor in the process, keyed by (base model, device)
+_shared_base_models: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_shared_base_lock = threading.Lock()
+
+
+def get_shared_base_model(base_model: str, device: torch.device) -> Dict[str, Any]:
+    """
+    Load a base model once per process
+    
+    Args:
+        base_model: Name or path of the base model
+        device: Device to place the model on
+    
+    Returns:
+        Dictionary with the model, a lock serializing forward passes and the active adapter
+    """
+    key = (base_model, str(device))
+    with _shared_base_lock:
+        if key not in _shared_base_models:
+            model = AutoModelForSequenceClassification.from_pretrained(base_model)
+            model.to(device)
+            model.eval()
+            _shared_base_models[key] = {'model': model, 'lock': threading.Lock(), 'active': None}
+            logger.info(f"Loaded shared base model {base_model}")
+        return _shared_base_models[key]
+
 
 class ModelPredictor:
     """Handle model inference and predictions"""
@@ -27,20 +63,45 @@ class ModelPredictor:
         self.model = None
         self.tokenizer = None
         self.label_mappings = None
+        self.max_length = 512
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.adapters: Dict[str, Dict[str, Any]] = {}
+        self.active_adapter = None
+        self.merged = False
+        self.head = None
+        self.head_config = None
+        self._shared = None
+        # Optional InferenceTelemetry (src/api/telemetry.py) receiving stage timings and batch shapes
+        self.telemetry = None
         
         self.load_model()
     
     def load_model(self):
         """Load the trained model, tokenizer, and label mappings"""
         try:
-            # Load model and tokenizer
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            if is_adapter_dir(self.model_path):
+                # Adapter artifact: share the base encoder and switch adapters on it
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+                self.active_adapter = self.load_adapter(self.model_path)
+                self._activate(self.active_adapter)
+                logger.info(f"Adapter '{self.active_adapter}' loaded on shared base model")
+                return
             
-            # Move model to device
-            self.model.to(self.device)
-            self.model.eval()
+            if is_head_dir(self.model_path):
+                # Head trained on a frozen encoder: share the encoder with other heads
+                head = load_head(self.model_path, self.device)
+                self.head, self.head_config = head['module'], head['config']
+                self._shared = get_shared_base_model(self.head_config['base_model'], self.device)
+                self.model = self._shared['model']
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            else:
+                # Load model and tokenizer
+                self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+                
+                # Move model to device
+                self.model.to(self.device)
+                self.model.eval()
             
             # Load label mappings
             mappings_path = os.path.join(self.model_path, "label_mappings.json")
@@ -49,26 +110,194 @@ class ModelPredictor:
                     self.label_mappings = json.load(f)
             else:
                 logger.warning("Label mappings not found. Using default integer labels.")
+                num_labels = self.head_config['num_labels'] if self.head is not None else self.model.config.num_labels
                 self.label_mappings = {
-                    'id_to_label': {str(i): f'label_{i}' for i in range(self.model.config.num_labels)},
-                    'label_to_id': {f'label_{i}': i for i in range(self.model.config.num_labels)}
+                    'id_to_label': {str(i): f'label_{i}' for i in range(num_labels)},
+                    'label_to_id': {f'label_{i}': i for i in range(num_labels)}
                 }
             
+            # Use the sequence length the model was trained with
+            training_info = self._load_training_info()
+            if training_info and training_info.get('max_length'):
+                self.max_length = int(training_info['max_length'])
+            
             logger.info(f"Model loaded successfully from {self.model_path}")
             logger.info(f"Device: {self.device}")
+            logger.info(f"Max sequence length: {self.max_length}")
             logger.info(f"Available labels: {list(self.label_mappings['label_to_id'].keys())}")
             
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
     
-    def predict_single(self, text: str, return_probabilities: bool = False) -> Dict[str, Any]:
+    def load_adapter(self, adapter_path: str, name: Optional[str] = None) -> str:
+        """
+        Load an adapter artifact so requests can select it
+        
+        Args:
+            adapter_path: Directory written by LoRA training
+            name: Name to register the adapter under (defaults to the directory name)
+        
+        Returns:
+            Adapter name
+        """
+        if self.merged:
+            raise ValueError("Adapters cannot be loaded after merging; create a new predictor")
+        if self.model is not None and not self.adapters:
+            raise ValueError("Adapters can only be loaded by a predictor serving an adapter model")
+        
+        adapter = load_adapter(adapter_path, self.device)
+        name = name or os.path.basename(os.path.normpath(adapter_path))
+        
+        shared = get_shared_base_model(adapter['config']['base_model'], self.device)
+        if self._shared is not None and shared is not self._shared:
+            raise ValueError(f"Adapter {name} needs base model {adapter['config']['base_model']}, "
+                             f"not the one already loaded")
+        with shared['lock']:
+            # Wrap the target layers the first time an adapter uses this encoder
+            if not any(isinstance(m, LoRALinear) for m in shared['model'].modules()):
+                inject_lora(shared['model'], rank=0, target_modules=adapter['config']['target_modules'])
+        self._shared = shared
+        self.model = shared['model']
+        
+        mappings_path = os.path.join(adapter_path, "label_mappings.json")
+        if os.path.exists(mappings_path):
+            with open(mappings_path, 'r') as f:
+                adapter['label_mappings'] = json.load(f)
+        else:
+            num_labels = adapter['config']['num_labels']
+            adapter['label_mappings'] = {
+                'id_to_label': {str(i): f'label_{i}' for i in range(num_labels)},
+                'label_to_id': {f'label_{i}': i for i in range(num_labels)}
+            }
+        
+        training_info = self._load_training_info(adapter_path)
+        adapter['max_length'] = int(training_info['max_length']) if training_info and training_info.get('max_length') else 512
+        adapter['path'] = adapter_path
+        
+        self.adapters[name] = adapter
+        return name
+    
+    def set_adapter(self, name: str):
+        """Make an adapter the default for requests that do not name one"""
+        if self.merged and name != self.active_adapter:
+            raise ValueError(f"Adapter {self.active_adapter} is merged; other adapters are unavailable")
+        if name not in self.adapters:
+            raise ValueError(f"Unknown adapter: {name}")
+        self.active_adapter = name
+        self._activate(name)
+    
+    def merge_adapter(self, name: Optional[str] = None):
+        """
+        Fold an adapter into a private copy of the base model
+        
+        The merged model runs at full-model speed (no low-rank matmuls, no
+        shared lock) at the cost of one more full set of weights in memory.
+        
+        Args:
+            name: Adapter to merge (defaults to the active adapter)
+        """
+        name = name or self.active_adapter
+        if name not in self.adapters:
+            raise ValueError(f"Unknown adapter: {name}")
+        
+        with self._shared['lock']:
+            model = copy.deepcopy(self._shared['model'])
+        apply_adapter(model, self.adapters[name])
+        self.model = merge_lora(model)
+        self.model.eval()
+        self._shared = None
+        self.merged = True
+        self.active_adapter = name
+        self._activate(name)
+        logger.info(f"Merged adapter '{name}' into a private copy of the base model")
+    
+    def _activate(self, name: str):
+        """Use an adapter's labels and sequence length as the predictor defaults"""
+        adapter = self.adapters[name]
+        self.label_mappings = adapter['label_mappings']
+        self.max_length = adapter['max_length']
+    
+    def _resolve_adapter(self, adapter: Optional[str]) -> Optional[str]:
+        """Adapter to use for a request, or None for a full model"""
+        if not self.adapters:
+            if adapter is not None:
+                raise ValueError("This model has no adapters")
+            return None
+        name = adapter or self.active_adapter
+        if name not in self.adapters:
+            raise ValueError(f"Unknown adapter: {name}")
+        if self.merged and name != self.active_adapter:
+            raise ValueError(f"Adapter {self.active_adapter} is merged; other adapters are unavailable")
+        return name
+    
+    def _tokenize(self, texts, max_length: int) -> Dict[str, torch.Tensor]:
+        """Tokenize one text or a batch and move it to the device"""
+        start = time.perf_counter()
+        inputs = self.tokenizer(
+            texts,
+            truncation=True,
+            padding=True,
+            max_length=max_length,
+            return_tensors='pt'
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        if self.telemetry is not None:
+            self.telemetry.observe_stage('tokenization', time.perf_counter() - start)
+            self.telemetry.observe_batch(*inputs['input_ids'].shape)
+        return inputs
+    
+    def _forward(self, inputs: Dict[str, torch.Tensor], adapter: Optional[str] = None) -> torch.Tensor:
+        """Run the model (timed when telemetry is attached)"""
+        if self.telemetry is None:
+            return self._run_model(inputs, adapter)
+        
+        start = time.perf_counter()
+        logits = self._run_model(inputs, adapter)
+        if logits.is_cuda:
+            # Kernels run asynchronously; wait so the time is not billed to post-processing
+            torch.cuda.synchronize(logits.device)
+        self.telemetry.observe_stage('forward', time.perf_counter() - start)
+        return logits
+    
+    def _run_model(self, inputs: Dict[str, torch.Tensor], adapter: Optional[str] = None) -> torch.Tensor:
+        """Run the model, switching the shared base model to the request's adapter"""
+        with torch.no_grad():
+            if self._shared is None:
+                return self.model(**inputs).logits
+            
+            entry = self.adapters[adapter] if adapter else None
+            with self._shared['lock']:
+                if self._shared['active'] is not entry:
+                    if entry is None:
+                        clear_adapter(self.model)
+                    else:
+                        apply_adapter(self.model, entry)
+                    self._shared['active'] = entry
+                
+                if self.head is not None:
+                    outputs = self.model.base_model(**inputs)
+                    return self.head(pool_outputs(outputs, inputs['attention_mask'], self.head_config['pooling']))
+                return self.model(**inputs).logits
+    
+    def _load_training_info(self, model_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Load training_info.json from the model directory if it exists"""
+        training_info_path = os.path.join(model_path or self.model_path, "training_info.json")
+        if not os.path.exists(training_info_path):
+            return None
+        with open(training_info_path, 'r') as f:
+            return json.load(f)
+    
+    def predict_single(self, text: str, return_probabilities: bool = False,
+                       adapter: Optional[str] = None) -> Dict[str, Any]:
         """
         Make a prediction for a single text input
         
         Args:
             text: Input text to classify
             return_probabilities: Whether to return class probabilities
+            adapter: Adapter to use (adapter models only; defaults to the active one)
             
         Returns:
             Dictionary containing prediction results
@@ -76,30 +305,24 @@ class ModelPredictor:
         if not text or not text.strip():
             raise ValueError("Input text cannot be empty")
         
-        # Tokenize input
-        inputs = self.tokenizer(
-            text,
-            truncation=True,
-            padding=True,
-            max_length=512,
-            return_tensors='pt'
-        )
+        adapter = self._resolve_adapter(adapter)
+        label_mappings = self.adapters[adapter]['label_mappings'] if adapter else self.label_mappings
+        max_length = self.adapters[adapter]['max_length'] if adapter else self.max_length
         
-        # Move inputs to device
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # Tokenize input
+        inputs = self._tokenize(text, max_length)
         
         # Make prediction
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            
-            # Get probabilities
-            probabilities = torch.softmax(logits, dim=-1)
-            predicted_class_id = torch.argmax(probabilities, dim=-1).item()
-            confidence = probabilities[0][predicted_class_id].item()
+        logits = self._forward(inputs, adapter)
+        start = time.perf_counter()
+        
+        # Get probabilities
+        probabilities = torch.softmax(logits, dim=-1)
+        predicted_class_id = torch.argmax(probabilities, dim=-1).item()
+        confidence = probabilities[0][predicted_class_id].item()
         
         # Convert to label
-        predicted_label = self.label_mappings['id_to_label'][str(predicted_class_id)]
+        predicted_label = label_mappings['id_to_label'][str(predicted_class_id)]
         
         result = {
             'text': text,
@@ -110,15 +333,18 @@ class ModelPredictor:
         
         if return_probabilities:
             all_probs = {}
-            for label_id, label_name in self.label_mappings['id_to_label'].items():
+            for label_id, label_name in label_mappings['id_to_label'].items():
                 all_probs[label_name] = float(probabilities[0][int(label_id)].item())
             result['probabilities'] = all_probs
         
+        if self.telemetry is not None:
+            self.telemetry.observe_stage('postprocess', time.perf_counter() - start)
         return result
     
     def predict_batch(self, texts: List[str], 
                      batch_size: int = 32,
-                     return_probabilities: bool = False) -> List[Dict[str, Any]]:
+                     return_probabilities: bool = False,
+                     adapter: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Make predictions for a batch of texts
         
@@ -126,6 +352,7 @@ class ModelPredictor:
             texts: List of input texts
             batch_size: Batch size for processing
             return_probabilities: Whether to return class probabilities
+            adapter: Adapter to use (adapter models only; defaults to the active one)
             
         Returns:
             List of prediction dictionaries
@@ -133,47 +360,56 @@ class ModelPredictor:
         if not texts:
             return []
         
+        adapter = self._resolve_adapter(adapter)
         results = []
         
         # Process in batches
         for i in range(0, len(texts), batch_size):
             batch_texts = texts[i:i + batch_size]
-            batch_results = self._predict_batch_internal(batch_texts, return_probabilities)
+            batch_results = self._predict_batch_internal(batch_texts, return_probabilities, adapter)
             results.extend(batch_results)
         
         return results
     
+    def predict_logits(self, texts: List[str], adapter: Optional[str] = None) -> np.ndarray:
+        """
+        Raw model outputs for one batch of texts
+        
+        Args:
+            texts: Input texts (tokenized and padded together)
+            adapter: Resolved adapter name, or None for a full model
+        
+        Returns:
+            Array of shape (len(texts), num_labels)
+        """
+        return self._batch_logits(texts, adapter).float().cpu().numpy()
+    
+    def _batch_logits(self, texts: List[str], adapter: Optional[str] = None) -> torch.Tensor:
+        """Tokenize a batch and run the model on it"""
+        max_length = self.adapters[adapter]['max_length'] if adapter else self.max_length
+        return self._forward(self._tokenize(texts, max_length), adapter)
+    
     def _predict_batch_internal(self, texts: List[str], 
-                               return_probabilities: bool = False) -> List[Dict[str, Any]]:
+                               return_probabilities: bool = False,
+                               adapter: Optional[str] = None) -> List[Dict[str, Any]]:
         """Internal method for batch prediction"""
-        # Tokenize batch
-        inputs = self.tokenizer(
-            texts,
-            truncation=True,
-            padding=True,
-            max_length=512,
-            return_tensors='pt'
-        )
-        
-        # Move to device
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        label_mappings = self.adapters[adapter]['label_mappings'] if adapter else self.label_mappings
         
         # Make predictions
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            
-            # Get probabilities
-            probabilities = torch.softmax(logits, dim=-1)
-            predicted_class_ids = torch.argmax(probabilities, dim=-1)
-            confidences = torch.max(probabilities, dim=-1)[0]
+        logits = self._batch_logits(texts, adapter)
+        start = time.perf_counter()
+        
+        # Get probabilities
+        probabilities = torch.softmax(logits, dim=-1)
+        predicted_class_ids = torch.argmax(probabilities, dim=-1)
+        confidences = torch.max(probabilities, dim=-1)[0]
         
         # Convert to results
         results = []
         for i, text in enumerate(texts):
             predicted_class_id = predicted_class_ids[i].item()
             confidence = confidences[i].item()
-            predicted_label = self.label_mappings['id_to_label'][str(predicted_class_id)]
+            predicted_label = label_mappings['id_to_label'][str(predicted_class_id)]
             
             result = {
                 'text': text,
@@ -184,12 +420,14 @@ class ModelPredictor:
             
             if return_probabilities:
                 all_probs = {}
-                for label_id, label_name in self.label_mappings['id_to_label'].items():
+                for label_id, label_name in label_mappings['id_to_label'].items():
                     all_probs[label_name] = float(probabilities[i][int(label_id)].item())
                 result['probabilities'] = all_probs
             
             results.append(result)
         
+        if self.telemetry is not None:
+            self.telemetry.observe_stage('postprocess', time.perf_counter() - start)
         return results
     
     def get_model_info(self) -> Dict[str, Any]:
@@ -202,19 +440,38 @@ class ModelPredictor:
         info = {
             'model_path': self.model_path,
             'model_type': self.model.config.model_type,
-            'num_labels': self.model.config.num_labels,
+            'num_labels': len(self.label_mappings['label_to_id']) if self.label_mappings else self.model.config.num_labels,
             'max_position_embeddings': getattr(self.model.config, 'max_position_embeddings', 'N/A'),
             'vocab_size': self.model.config.vocab_size,
             'device': str(self.device),
-            'labels': list(self.label_mappings['label_to_id'].keys()) if self.label_mappings else []
+            'max_length': self.max_length,
+            'labels': list(self.label_mappings['label_to_id'].keys()) if self.label_mappings else [],
+            'memory': {
+                'model_parameters_mb': sum(p.numel() * p.element_size() for p in self.model.parameters()) / (1024 * 1024),
+                'rss_mb': get_current_rss_mb()
+            }
         }
         
+        if self.head is not None:
+            info['head'] = self.head_config
+        
+        if self.adapters:
+            info['adapters'] = {
+                'base_model': self.adapters[self.active_adapter]['config']['base_model'],
+                'active': self.active_adapter,
+                'loaded': list(self.adapters.keys()),
+                'merged': self.merged,
+                'shared_base': self._shared is not None,
+                'adapter_mb': {
+                    name: sum(t.numel() * t.element_size() for t in adapter['state'].values()) / (1024 * 1024)
+                    for name, adapter in self.adapters.items()
+                }
+            }
+        
         # Add training info if available
-        training_info_path = os.path.join(self.model_path, "training_info.json")
-        if os.path.exists(training_info_path):
-            with open(training_info_path, 'r') as f:
-                training_info = json.load(f)
-                info['training_info'] = training_info
+        training_info = self._load_training_info()
+        if training_info is not None:
+            info['training_info'] = training_info
         
         return info
     
@@ -257,4 +514,53 @@ def create_predictor(model_path: str) -> ModelPredictor:
     Returns:
         ModelPredictor instance
     """
-    return ModelPredictor(model_path)
\ No newline at end of file
+    return ModelPredictor(model_path)
+
+
+def _artifact_size_mb(model_path: str) -> float:
+    """Size of the weight files in a model or adapter directory"""
+    if is_adapter_dir(model_path):
+        names = (ADAPTER_WEIGHTS_NAME,)
+    elif is_head_dir(model_path):
+        names = (HEAD_WEIGHTS_NAME,)
+    else:
+        names = ("model.safetensors", "pytorch_model.bin")
+    return sum(
+        os.path.getsize(os.path.join(model_path, name))
+        for name in names if os.path.exists(os.path.join(model_path, name))
+    ) / (1024 * 1024)
+
+
+def benchmark_serving_memory(model_paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Load several models into one process and record what each one costs
+    
+    Adapter and head directories share one base encoder, so after the first
+    one each further one adds roughly its artifact size; full models add a
+    complete set of weights each.
+    
+    Args:
+        model_paths: Model or adapter directories
+    
+    Returns:
+        One entry per model with artifact size and resident memory growth
+    """
+    predictors = []
+    report = []
+    for model_path in model_paths:
+        rss_before = get_current_rss_mb()
+        predictor = ModelPredictor(model_path)
+        predictor.predict_single("warm up")
+        rss_after = get_current_rss_mb()
+        predictors.append(predictor)
+        
+        report.append({
+            'model_path': model_path,
+            'adapter': is_adapter_dir(model_path),
+            'head': is_head_dir(model_path),
+            'artifact_size_mb': _artifact_size_mb(model_path),
+            'rss_increase_mb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            'rss_mb': rss_after
+        })
+    
+    return report
\ No newline at end of file
@@ -4,33 +4,53 @@ Model training logic using Hugging Face Transformers
 
 import os
 import json
+import math
 import torch
+import torch.distributed as dist
 import numpy as np
 from transformers import (
     AutoTokenizer, AutoModelForSequenceClassification,
-    TrainingArguments, Trainer, EarlyStoppingCallback
+    TrainingArguments, Trainer, TrainerCallback, EarlyStoppingCallback
 )
-from transformers.trainer_utils import EvalPrediction
+from transformers.trainer_utils import EvalPrediction, get_last_checkpoint
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Union
 import logging
+import time
 from datetime import datetime
 
 from ..data.loader import DataLoader
 from ..data.dataset import TextClassificationDataset, create_data_loaders
+from ..data.profiling import profile_token_lengths
+from .callbacks import ThroughputCallback, BudgetCallback, TorchProfilerCallback
+from .lora import inject_lora, mark_trainable, save_adapter, ADAPTER_WEIGHTS_NAME
+from .heads import EmbeddingCache, train_head, save_head
+from .evaluation import StreamingEvaluator
+from .checkpointing import (AsyncCheckpointWriter, AsyncCheckpointTrainer, CheckpointEvaluator, AsyncEvaluationCallback,
+                            AdapterCheckpointTrainer, AsyncAdapterCheckpointTrainer)
 from ..utils.config import config
 from ..utils.metrics import MetricsCalculator
+from ..utils.memory import get_peak_rss_mb, get_current_rss_mb, get_available_memory_mb, reset_peak_rss
 
 logger = logging.getLogger(__name__)
 
 
+def cpu_supports_bf16() -> bool:
+    """Check whether the CPU has native bf16 support (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
 class ModelTrainer:
     """Handle model training and evaluation"""
     
     def __init__(self, 
                  model_name: str = "bert-base-uncased",
                  num_labels: int = 2,
-                 output_dir: str = "./models/finetuned_model"):
+                 output_dir: str = "./models/finetuned_model",
+                 callbacks: Optional[List[TrainerCallback]] = None):
         """
         Initialize the trainer
         
@@ -38,27 +58,55 @@ class ModelTrainer:
             model_name: Name of the pre-trained model
             num_labels: Number of classification labels
             output_dir: Directory to save the trained model
+            callbacks: Extra Trainer callbacks (e.g. progress reporting)
         """
         self.model_name = model_name
         self.num_labels = num_labels
         self.output_dir = output_dir
         self.tokenizer = None
         self.model = None
-        self.data_loader = DataLoader()
+        self.data_loader = DataLoader(near_duplicate_threshold=config.data.near_duplicate_threshold)
         self.metrics_calculator = None
         self.training_history = []
+        self.max_length = None
+        self.token_length_profile = None
+        self.throughput_callback = None
+        self.memory_options = {}
+        self.batch_size_probe = None
+        self.init_from = None
+        self.base_label_to_id = None
+        self.previous_watermark = None
+        self.data_watermark = None
+        self.incremental_info = None
+        self.resumed_from = None
+        self.lora_config = None
+        self.checkpointing_info = None
+        self.budget_plan = None
+        self.profile_info = None
+        self.extra_callbacks = list(callbacks or [])
+        
+        # Set by the launcher when running as one of several data-parallel workers
+        self.world_size = int(os.environ.get('WORLD_SIZE', 1))
+        self.is_main_process = int(os.environ.get('RANK', 0)) == 0
         
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
         
         logger.info(f"Initialized trainer for {model_name} with {num_labels} labels")
     
-    def load_model_and_tokenizer(self):
-        """Load the pre-trained model and tokenizer"""
+    def load_model_and_tokenizer(self, model_path: Optional[str] = None):
+        """
+        Load the pre-trained model and tokenizer
+        
+        Args:
+            model_path: Model name or directory to load instead of model_name
+                (e.g. a previously fine-tuned model)
+        """
+        model_path = model_path or self.model_name
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
             self.model = AutoModelForSequenceClassification.from_pretrained(
-                self.model_name,
+                model_path,
                 num_labels=self.num_labels
             )
             
@@ -67,17 +115,43 @@ class ModelTrainer:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
                 self.model.config.pad_token_id = self.tokenizer.eos_token_id
             
-            logger.info(f"Loaded model and tokenizer: {self.model_name}")
+            logger.info(f"Loaded model and tokenizer: {model_path}")
             
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
     
+    def load_previous_model(self, model_dir: str):
+        """
+        Continue from a model fine-tuned by this trainer
+        
+        Loads the model and tokenizer together with the label mappings (so label
+        ids stay stable) and the data watermark recorded by that run.
+        
+        Args:
+            model_dir: Directory of the previously fine-tuned model
+        """
+        self.load_model_and_tokenizer(model_dir)
+        self.init_from = model_dir
+        
+        mappings_path = os.path.join(model_dir, "label_mappings.json")
+        if os.path.exists(mappings_path):
+            with open(mappings_path, 'r', encoding='utf-8') as f:
+                self.base_label_to_id = json.load(f)['label_to_id']
+        
+        watermark_path = os.path.join(model_dir, "data_watermark.json")
+        if os.path.exists(watermark_path):
+            with open(watermark_path, 'r') as f:
+                self.previous_watermark = json.load(f)
+    
     def prepare_datasets(self, 
                         train_file: str,
                         val_file: Optional[str] = None,
                         test_file: Optional[str] = None,
-                        max_length: int = 512) -> Dict[str, TextClassificationDataset]:
+                        max_length: int = 512,
+                        max_length_percentile: Optional[float] = None,
+                        watermark: Optional[Dict[str, Any]] = None,
+                        replay_fraction: float = 0.0) -> Dict[str, TextClassificationDataset]:
         """
         Prepare datasets for training
         
@@ -86,25 +160,94 @@ class ModelTrainer:
             val_file: Path to validation data file (optional)
             test_file: Path to test data file (optional)
             max_length: Maximum sequence length
+            max_length_percentile: If set, profile the training texts and use the
+                smallest max_length (up to max_length) covering this percentile
+            watermark: If set, only use training rows appended after this data
+                watermark (see DataLoader.create_watermark)
+            replay_fraction: Old rows replayed alongside the new ones, as a
+                fraction of the number of new rows
             
         Returns:
             Dictionary containing datasets
         """
         # Load training data
         train_df = self.data_loader.load_data(train_file)
+        self.data_watermark = self.data_loader.create_watermark(train_df, train_file)
         
-        # If validation/test files not provided, split the training data
-        if val_file is None or test_file is None:
-            train_df, val_df, test_df = self.data_loader.split_data(
-                train_df,
-                train_ratio=config.training.train_split,
-                val_ratio=config.training.val_split,
-                test_ratio=config.training.test_split,
-                random_state=config.training.seed
+        split_train_file = val_file is None or test_file is None
+        
+        # Keep only the rows appended since the watermark (plus replayed old rows).
+        # The selection is hash split so old rows never reach the val and test splits.
+        selection = None
+        if watermark is not None:
+            selection = self.data_loader.select_since_watermark(
+                train_df, watermark, replay_fraction=replay_fraction, random_state=config.training.seed,
+                split_ratios=(
+                    config.training.train_split, config.training.val_split, config.training.test_split
+                ) if split_train_file else None
             )
+            selected_rows = sum(len(indices) for indices in selection.values())
+            if selected_rows == 0:
+                raise ValueError(f"No new samples in {train_file} since the watermark")
+            self.incremental_info = {
+                'watermark': watermark,
+                'total_rows': len(train_df),
+                'selected_rows': selected_rows,
+                'replay_fraction': replay_fraction
+            }
+        
+        # If validation/test files not provided, split the training data
+        if split_train_file:
+            if selection is not None:
+                frames = {name: (train_df, indices) for name, indices in selection.items()}
+            elif config.training.split_method == "hash":
+                # Stable split: keep one frame and select rows by position
+                splits = self.data_loader.split_indices(
+                    train_df,
+                    train_ratio=config.training.train_split,
+                    val_ratio=config.training.val_split,
+                    test_ratio=config.training.test_split,
+                    stratify=config.training.split_stratify
+                )
+                frames = {name: (train_df, indices) for name, indices in splits.items()}
+            else:
+                train_df, val_df, test_df = self.data_loader.split_data(
+                    train_df,
+                    train_ratio=config.training.train_split,
+                    val_ratio=config.training.val_split,
+                    test_ratio=config.training.test_split,
+                    random_state=config.training.seed
+                )
+                frames = {'train': (train_df, None), 'val': (val_df, None), 'test': (test_df, None)}
         else:
+            if selection is not None:
+                train_df = train_df.iloc[selection['train']]
             val_df = self.data_loader.load_data(val_file) if val_file else None
             test_df = self.data_loader.load_data(test_file) if test_file else None
+            val_df, test_df = self.data_loader.remove_split_leakage(train_df, val_df, test_df)
+            frames = {'train': (train_df, None), 'val': (val_df, None), 'test': (test_df, None)}
+        
+        # Pick max_length from the training set's token-length distribution
+        if max_length_percentile is not None:
+            df, indices = frames['train']
+            texts = df[self.data_loader.text_column].to_numpy()
+            if indices is not None:
+                texts = texts[indices]
+            self.token_length_profile = profile_token_lengths(
+                texts, self.tokenizer,
+                percentile=max_length_percentile,
+                upper_bound=max_length
+            )
+            max_length = self.token_length_profile['recommended_max_length']
+        self.max_length = max_length
+        
+        # Keep the label ids of the model we continue from
+        if self.base_label_to_id is not None:
+            unknown = set(self.data_loader.label_to_id) - set(self.base_label_to_id)
+            if unknown:
+                raise ValueError(f"Labels not known to {self.init_from}: {sorted(unknown)}")
+            self.data_loader.label_to_id = dict(self.base_label_to_id)
+            self.data_loader.id_to_label = {idx: label for label, idx in self.base_label_to_id.items()}
         
         # Update metrics calculator with label names
         label_names = list(self.data_loader.label_to_id.keys())
@@ -113,29 +256,19 @@ class ModelTrainer:
         # Create datasets
         datasets = {}
         
-        datasets['train'] = TextClassificationDataset.from_dataframe(
-            train_df, self.tokenizer, 
-            label_to_id=self.data_loader.label_to_id,
-            max_length=max_length
-        )
-        
-        if val_df is not None:
-            datasets['val'] = TextClassificationDataset.from_dataframe(
-                val_df, self.tokenizer,
-                label_to_id=self.data_loader.label_to_id,
-                max_length=max_length
-            )
-        
-        if test_df is not None:
-            datasets['test'] = TextClassificationDataset.from_dataframe(
-                test_df, self.tokenizer,
-                label_to_id=self.data_loader.label_to_id,
-                max_length=max_length
-            )
+        for name, (df, indices) in frames.items():
+            if df is not None:
+                datasets[name] = TextClassificationDataset.from_dataframe(
+                    df, self.tokenizer,
+                    label_to_id=self.data_loader.label_to_id,
+                    max_length=max_length,
+                    indices=indices
+                )
         
         # Save label mappings
-        mappings_path = os.path.join(self.output_dir, "label_mappings.json")
-        self.data_loader.save_label_mappings(mappings_path)
+        if self.is_main_process:
+            mappings_path = os.path.join(self.output_dir, "label_mappings.json")
+            self.data_loader.save_label_mappings(mappings_path)
         
         return datasets
     
@@ -177,7 +310,25 @@ class ModelTrainer:
               max_length: int = 512,
               save_steps: int = 500,
               eval_steps: int = 500,
-              logging_steps: int = 100) -> Dict[str, Any]:
+              logging_steps: int = 100,
+              auto_max_length: bool = False,
+              max_length_percentile: float = 99.0,
+              micro_batch_size: Optional[int] = None,
+              bf16: Optional[bool] = None,
+              gradient_checkpointing: Optional[bool] = None,
+              auto_batch_size: bool = False,
+              memory_limit_mb: Optional[float] = None,
+              init_from: Optional[str] = None,
+              resume_from_checkpoint: Optional[Union[str, bool]] = None,
+              since_watermark: bool = False,
+              replay_fraction: float = 0.0,
+              lora_rank: Optional[int] = None,
+              async_checkpointing: Optional[bool] = None,
+              weights_only_checkpoints: Optional[bool] = None,
+              async_evaluation: Optional[bool] = None,
+              time_budget: Optional[float] = None,
+              sample_budget: Optional[int] = None,
+              profile_steps: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
         """
         Train the model
         
@@ -194,6 +345,44 @@ class ModelTrainer:
             save_steps: Steps between model saves
             eval_steps: Steps between evaluations
             logging_steps: Steps between logging
+            auto_max_length: Choose max_length from the training data's token
+                lengths (max_length becomes the upper bound)
+            max_length_percentile: Percentile of texts auto_max_length must cover
+            micro_batch_size: Per-step batch size; gradients are accumulated so
+                the effective batch size stays batch_size (None uses batch_size
+                or config.training.micro_batch_size)
+            bf16: Use bf16 mixed precision (None uses config.training.bf16)
+            gradient_checkpointing: Recompute activations in the backward pass
+                to save memory (None uses config.training.gradient_checkpointing)
+            auto_batch_size: Probe for the largest micro-batch that fits in
+                memory; batch_size is kept as the effective batch size
+            memory_limit_mb: Memory ceiling for the probe (defaults to the
+                device memory or the memory currently available)
+            init_from: Directory of a previously fine-tuned model to continue
+                from instead of model_name
+            resume_from_checkpoint: Checkpoint directory to resume an
+                interrupted run from, or True for the latest checkpoint in
+                output_dir (restores optimizer, scheduler and step)
+            since_watermark: Only train on rows appended to train_file since
+                the data watermark recorded by init_from
+            replay_fraction: Old rows replayed with the new ones when training
+                since the watermark, as a fraction of the number of new rows
+            lora_rank: Train only rank-r LoRA adapters and the classifier head
+                and save a small adapter artifact (None uses
+                config.training.lora_rank; 0 trains the full model)
+            async_checkpointing: Write checkpoints on a background thread (None
+                uses config.training.async_checkpointing)
+            weights_only_checkpoints: Save only the weights in checkpoints; such
+                runs cannot be resumed exactly (None uses config)
+            async_evaluation: Evaluate every saved checkpoint in a separate
+                process instead of pausing training every eval_steps; results
+                drive best-model selection and early stopping (None uses config)
+            time_budget: Wall-clock budget in seconds for training and the final
+                evaluations; replaces num_epochs (None uses config)
+            sample_budget: Number of training samples to process; replaces
+                num_epochs (None uses config)
+            profile_steps: (first step, number of steps) window to capture
+                with torch.profiler; traces go to <logs_dir>/profiles
             
         Returns:
             Training results dictionary
@@ -201,51 +390,304 @@ class ModelTrainer:
         logger.info("Starting model training...")
         
         # Load model and tokenizer
-        if self.model is None or self.tokenizer is None:
+        if init_from:
+            self.load_previous_model(init_from)
+        elif self.model is None or self.tokenizer is None:
             self.load_model_and_tokenizer()
         
+        if since_watermark and self.previous_watermark is None:
+            raise ValueError("since_watermark needs init_from pointing at a model with a recorded data watermark")
+        
         # Prepare datasets
-        datasets = self.prepare_datasets(train_file, val_file, test_file, max_length)
+        datasets = self.prepare_datasets(
+            train_file, val_file, test_file, max_length,
+            max_length_percentile=max_length_percentile if auto_max_length else None,
+            watermark=self.previous_watermark if since_watermark else None,
+            replay_fraction=replay_fraction
+        )
+        
+        return self.train_on_datasets(
+            datasets,
+            num_epochs=num_epochs,
+            batch_size=batch_size,
+            learning_rate=learning_rate,
+            weight_decay=weight_decay,
+            warmup_steps=warmup_steps,
+            save_steps=save_steps,
+            eval_steps=eval_steps,
+            logging_steps=logging_steps,
+            micro_batch_size=micro_batch_size,
+            bf16=bf16,
+            gradient_checkpointing=gradient_checkpointing,
+            auto_batch_size=auto_batch_size,
+            memory_limit_mb=memory_limit_mb,
+            resume_from_checkpoint=resume_from_checkpoint,
+            lora_rank=lora_rank,
+            async_checkpointing=async_checkpointing,
+            weights_only_checkpoints=weights_only_checkpoints,
+            async_evaluation=async_evaluation,
+            time_budget=time_budget,
+            sample_budget=sample_budget,
+            profile_steps=profile_steps
+        )
+    
+    def train_on_datasets(self,
+                          datasets: Dict[str, Any],
+                          num_epochs: int = 3,
+                          batch_size: int = 16,
+                          learning_rate: float = 2e-5,
+                          weight_decay: float = 0.01,
+                          warmup_steps: int = 500,
+                          warmup_ratio: float = 0.0,
+                          save_steps: int = 500,
+                          eval_steps: int = 500,
+                          logging_steps: int = 100,
+                          micro_batch_size: Optional[int] = None,
+                          bf16: Optional[bool] = None,
+                          gradient_checkpointing: Optional[bool] = None,
+                          auto_batch_size: bool = False,
+                          memory_limit_mb: Optional[float] = None,
+                          resume_from_checkpoint: Optional[Union[str, bool]] = None,
+                          lora_rank: Optional[int] = None,
+                          async_checkpointing: Optional[bool] = None,
+                          weights_only_checkpoints: Optional[bool] = None,
+                          async_evaluation: Optional[bool] = None,
+                          time_budget: Optional[float] = None,
+                          sample_budget: Optional[int] = None,
+                          profile_steps: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        Train the model on already prepared datasets
+        
+        Args:
+            datasets: Dictionary with a 'train' dataset and optional 'val'/'test' datasets
+            num_epochs: Number of training epochs
+            batch_size: Training batch size (global across data-parallel workers)
+            learning_rate: Learning rate
+            weight_decay: Weight decay for regularization
+            warmup_steps: Number of warmup steps (overrides warmup_ratio when > 0)
+            warmup_ratio: Fraction of training steps used for warmup
+            save_steps: Steps between model saves
+            eval_steps: Steps between evaluations
+            logging_steps: Steps between logging
+            micro_batch_size: Per-step batch size (see train)
+            bf16: Use bf16 mixed precision (see train)
+            gradient_checkpointing: Recompute activations in the backward pass (see train)
+            auto_batch_size: Probe for the largest micro-batch that fits (see train)
+            memory_limit_mb: Memory ceiling for the probe
+            resume_from_checkpoint: Checkpoint to resume from, or True for the
+                latest checkpoint in output_dir
+            lora_rank: Train LoRA adapters of this rank (see train)
+            async_checkpointing: Write checkpoints on a background thread (see train)
+            weights_only_checkpoints: Save only the weights in checkpoints (see train)
+            async_evaluation: Evaluate checkpoints in a separate process (see train)
+            time_budget: Wall-clock budget in seconds, counted from this call (see train)
+            sample_budget: Number of training samples to process (see train)
+            profile_steps: Step window to profile (see train)
+        
+        Returns:
+            Training results dictionary
+        """
+        budget_start = time.perf_counter()
+        if self.model is None or self.tokenizer is None:
+            self.load_model_and_tokenizer()
+        
+        # With data-parallel workers batch_size is the global batch; each process takes its share
+        if self.world_size > 1:
+            batch_size = max(1, math.ceil(batch_size / self.world_size))
+        
+        # Train only low-rank adapters and the task head
+        lora_rank = lora_rank if lora_rank is not None else config.training.lora_rank
+        if lora_rank and self.lora_config is None:
+            self._setup_lora(lora_rank)
+        
+        # Resolve memory options
+        self.memory_options = self._resolve_memory_options(
+            batch_size, micro_batch_size, bf16, gradient_checkpointing
+        )
+        
+        # Probe for the largest micro-batch that fits and accumulate up to batch_size
+        if auto_batch_size:
+            self.batch_size_probe = self.find_batch_size(
+                max_length=self.max_length,
+                max_batch_size=batch_size,
+                memory_limit_mb=memory_limit_mb or config.training.memory_limit_mb,
+                bf16=self.memory_options['bf16'],
+                gradient_checkpointing=self.memory_options['gradient_checkpointing']
+            )
+            self.memory_options = self._resolve_memory_options(
+                batch_size, self.batch_size_probe['batch_size'],
+                self.memory_options['bf16'], self.memory_options['gradient_checkpointing']
+            )
+        
+        # Checkpoint options; the background writer and evaluator need a single process
+        weights_only_checkpoints = (weights_only_checkpoints if weights_only_checkpoints is not None
+                                    else config.training.weights_only_checkpoints)
+        async_evaluation = ('val' in datasets and self.world_size == 1 and
+                            (async_evaluation if async_evaluation is not None else config.training.async_evaluation))
+        async_checkpointing = self.world_size == 1 and (
+            async_evaluation or
+            (async_checkpointing if async_checkpointing is not None else config.training.async_checkpointing)
+        )
+        sync_evaluation = 'val' in datasets and not async_evaluation
+        
+        # Fit the step count, LR schedule and evaluation cadence to a time or sample budget
+        time_budget = time_budget if time_budget is not None else config.training.time_budget
+        sample_budget = sample_budget if sample_budget is not None else config.training.sample_budget
+        self.budget_plan = None
+        max_steps = -1
+        if time_budget or sample_budget:
+            self.budget_plan = self._plan_budget(
+                datasets, budget_start, time_budget, sample_budget, sync_evaluation
+            )
+            max_steps = self.budget_plan['max_steps']
+            save_steps = eval_steps = self.budget_plan['eval_steps']
+            if warmup_steps > 0:
+                warmup_steps = min(warmup_steps, self.budget_plan['warmup_steps'])
+            logging_steps = min(logging_steps, eval_steps)
         
         # Set up training arguments
         training_args = TrainingArguments(
             output_dir=self.output_dir,
             num_train_epochs=num_epochs,
-            per_device_train_batch_size=batch_size,
-            per_device_eval_batch_size=batch_size,
+            max_steps=max_steps,
+            per_device_train_batch_size=self.memory_options['micro_batch_size'],
+            per_device_eval_batch_size=self.memory_options['micro_batch_size'],
+            gradient_accumulation_steps=self.memory_options['gradient_accumulation_steps'],
+            bf16=self.memory_options['bf16'],
+            gradient_checkpointing=self.memory_options['gradient_checkpointing'],
             learning_rate=learning_rate,
             weight_decay=weight_decay,
             warmup_steps=warmup_steps,
+            warmup_ratio=warmup_ratio,
             logging_dir=os.path.join(self.output_dir, 'logs'),
             logging_steps=logging_steps,
-            evaluation_strategy="steps" if 'val' in datasets else "no",
-            eval_steps=eval_steps if 'val' in datasets else None,
+            evaluation_strategy="steps" if sync_evaluation else "no",
+            eval_steps=eval_steps if sync_evaluation else None,
             save_steps=save_steps,
-            save_total_limit=3,
-            load_best_model_at_end=True if 'val' in datasets else False,
+            save_total_limit=config.training.save_total_limit,
+            save_only_model=weights_only_checkpoints,
+            load_best_model_at_end=sync_evaluation,
             metric_for_best_model="f1" if 'val' in datasets else None,
             greater_is_better=True,
             seed=config.training.seed,
             dataloader_pin_memory=torch.cuda.is_available(),
+            use_cpu=self.world_size > 1 and not torch.cuda.is_available(),
+            ddp_backend="gloo" if self.world_size > 1 and not torch.cuda.is_available() else None,
+            ddp_find_unused_parameters=False if self.world_size > 1 else None,
             report_to=None  # Disable wandb/tensorboard logging
         )
         
         # Initialize trainer
-        trainer = Trainer(
+        self.throughput_callback = ThroughputCallback(self.output_dir)
+        callbacks = [self.throughput_callback, *self.extra_callbacks]
+        if sync_evaluation:
+            callbacks.append(EarlyStoppingCallback(early_stopping_patience=config.training.early_stopping_patience))
+        budget_callback = None
+        if self.budget_plan is not None:
+            budget_callback = BudgetCallback(
+                self.budget_plan['deadline'],
+                evaluate=sync_evaluation,
+                num_evaluations=self.budget_plan['num_evaluations'],
+                evaluation_seconds=self.budget_plan.get('evaluation_seconds', 0.0),
+                refit_steps=min(20, max(1, self.budget_plan['max_steps'] // 10))
+            )
+            callbacks.append(budget_callback)
+        profiler_callback = TorchProfilerCallback(*profile_steps) if profile_steps else None
+        if profiler_callback is not None:
+            callbacks.append(profiler_callback)
+        
+        trainer_kwargs = dict(
             model=self.model,
             args=training_args,
             train_dataset=datasets['train'],
             eval_dataset=datasets.get('val'),
             compute_metrics=self.compute_metrics,
-            callbacks=[EarlyStoppingCallback(early_stopping_patience=3)] if 'val' in datasets else None
+            callbacks=callbacks
         )
+        evaluation_callback = None
+        if async_checkpointing:
+            evaluator = None
+            if async_evaluation:
+                evaluator = CheckpointEvaluator(
+                    datasets['val'], os.path.join(self.output_dir, '.eval'),
+                    lora_config=self.lora_config,
+                    batch_size=self.memory_options['micro_batch_size'],
+                    num_cores=config.training.eval_cores
+                )
+                evaluation_callback = AsyncEvaluationCallback(
+                    evaluator, metric_for_best_model="f1",
+                    early_stopping_patience=config.training.early_stopping_patience
+                )
+                callbacks.append(evaluation_callback)
+            trainer_kwargs.update(checkpoint_writer=AsyncCheckpointWriter(), checkpoint_evaluator=evaluator)
+            trainer_class = AsyncCheckpointTrainer
+        else:
+            trainer_class = Trainer
+        # In LoRA mode checkpoints hold only the adapter and head, like the final artifact
+        if self.lora_config is not None:
+            trainer_kwargs['adapter_config'] = self.lora_config
+            trainer_class = AsyncAdapterCheckpointTrainer if async_checkpointing else AdapterCheckpointTrainer
+        trainer = trainer_class(**trainer_kwargs)
         
-        # Train the model
-        train_result = trainer.train()
+        # Resume from the latest checkpoint of an interrupted run
+        if resume_from_checkpoint is True:
+            resume_from_checkpoint = get_last_checkpoint(self.output_dir)
+            if resume_from_checkpoint is None:
+                logger.warning(f"No checkpoint found in {self.output_dir}; starting from scratch")
+        if resume_from_checkpoint:
+            logger.info(f"Resuming from {resume_from_checkpoint}")
+        self.resumed_from = resume_from_checkpoint or None
         
-        # Save the final model
-        trainer.save_model()
-        self.tokenizer.save_pretrained(self.output_dir)
+        # Train the model; the background writer and evaluation process are
+        # stopped even if training fails or the job is cancelled
+        try:
+            train_result = trainer.train(resume_from_checkpoint=self.resumed_from)
+            if async_checkpointing:
+                # Flush background checkpoint writes and evaluations; load the best checkpoint
+                trainer.finish_async(evaluation_callback)
+        finally:
+            if async_checkpointing:
+                trainer.close_async()
+        
+        self.checkpointing_info = {
+            'async_checkpointing': async_checkpointing,
+            'weights_only': weights_only_checkpoints,
+            'async_evaluation': async_evaluation
+        }
+        if async_checkpointing:
+            self.checkpointing_info.update({
+                'background_write_seconds': trainer.checkpoint_writer.write_seconds,
+                'blocked_seconds': trainer.checkpoint_writer.blocked_seconds,
+                'best_checkpoint': trainer.state.best_model_checkpoint
+            })
+            if evaluation_callback is not None:
+                self.checkpointing_info['evaluations'] = [
+                    {'step': result['step'], **result['metrics']} for result in evaluation_callback.results
+                ]
+        
+        if self.budget_plan is not None:
+            self.budget_plan.update({
+                'completed_steps': trainer.state.global_step,
+                'stopped_at_step': budget_callback.stopped_at_step,
+                'measured_step_seconds': budget_callback.step_seconds,
+                'refit': budget_callback.refit,
+                'best_checkpoint': trainer.state.best_model_checkpoint
+            })
+        self.profile_info = profiler_callback.files if profiler_callback is not None else None
+        
+        # Save the final model (only the adapter artifact in LoRA mode)
+        if self.lora_config is not None:
+            if self.is_main_process:
+                save_adapter(self.model, self.output_dir, self.lora_config)
+        else:
+            trainer.save_model()
+        if self.is_main_process:
+            self.tokenizer.save_pretrained(self.output_dir)
+        
+        # Evaluate the final model on the validation set
+        val_results = {}
+        if 'val' in datasets:
+            val_results = trainer.evaluate()
         
         # Evaluate on test set if available
         test_results = {}
@@ -253,28 +695,534 @@ class ModelTrainer:
             test_results = trainer.evaluate(datasets['test'])
             logger.info(f"Test results: {test_results}")
         
+        if self.budget_plan is not None:
+            elapsed = time.perf_counter() - budget_start
+            self.budget_plan['elapsed_seconds'] = elapsed
+            self.budget_plan.pop('deadline')
+            if time_budget and elapsed > time_budget:
+                logger.warning(f"Time budget of {time_budget:.0f}s exceeded by {elapsed - time_budget:.1f}s")
+        
         # Save training history
-        self._save_training_info(train_result, test_results)
+        if self.is_main_process:
+            self._save_training_info(train_result, test_results, val_results)
+        
+        # Report the cost of the chosen memory options
+        summary = self.throughput_callback.summary
+        if summary:
+            # Both are None when no step ran (e.g. resuming a finished run) or RSS is unavailable
+            peak_rss_mb, step_seconds = summary['peak_rss_mb'], summary['step_seconds']
+            logger.info(
+                f"bf16={self.memory_options['bf16']}, "
+                f"gradient_checkpointing={self.memory_options['gradient_checkpointing']}, "
+                f"micro_batch_size={self.memory_options['micro_batch_size']}"
+                f"x{self.memory_options['gradient_accumulation_steps']}: "
+                f"peak RSS {f'{peak_rss_mb:.0f} MB' if peak_rss_mb is not None else 'n/a'}, "
+                f"step time {f'{step_seconds:.3f}s' if step_seconds is not None else 'n/a'}"
+            )
         
         logger.info("Training completed successfully!")
         
         return {
             'train_result': train_result,
+            'val_results': val_results,
             'test_results': test_results,
             'model_path': self.output_dir
         }
     
-    def _save_training_info(self, train_result, test_results):
+    def _setup_lora(self, rank: int):
+        """Wrap the attention projections with LoRA adapters and freeze the rest"""
+        wrapped = inject_lora(
+            self.model,
+            rank=rank,
+            alpha=config.training.lora_alpha,
+            dropout=config.training.lora_dropout,
+            target_modules=config.training.lora_target_modules
+        )
+        counts = mark_trainable(self.model)
+        # Frozen embeddings would otherwise cut the graph under gradient checkpointing
+        self.model.enable_input_require_grads()
+        
+        self.lora_config = {
+            'base_model': self.init_from or self.model_name,
+            'rank': rank,
+            'alpha': config.training.lora_alpha,
+            'dropout': config.training.lora_dropout,
+            'target_modules': list(config.training.lora_target_modules),
+            'num_wrapped_modules': len(wrapped),
+            'num_labels': self.num_labels,
+            **counts
+        }
+    
+    def train_head(self,
+                   train_file: str,
+                   val_file: Optional[str] = None,
+                   test_file: Optional[str] = None,
+                   max_length: int = 512,
+                   auto_max_length: bool = False,
+                   max_length_percentile: float = 99.0,
+                   head_type: str = "linear",
+                   hidden_dim: int = 256,
+                   pooling: str = "mean",
+                   num_epochs: int = 100,
+                   learning_rate: float = 1e-3,
+                   weight_decay: float = 0.01,
+                   batch_size: int = 256,
+                   encode_batch_size: int = 64) -> Dict[str, Any]:
+        """
+        Train only a classification head on frozen-encoder embeddings
+        
+        The encoder runs once per dataset; pooled embeddings are cached as
+        memory-mapped files keyed by encoder and data, so later runs with other
+        heads or label sets on the same texts skip straight to head training.
+        
+        Args:
+            train_file: Path to training data
+            val_file: Path to validation data (optional)
+            test_file: Path to test data (optional)
+            max_length: Maximum sequence length
+            auto_max_length: Choose max_length from token lengths (see train)
+            max_length_percentile: Percentile of texts auto_max_length must cover
+            head_type: 'linear' or 'mlp'
+            hidden_dim: Hidden size of the MLP head
+            pooling: 'mean', 'cls' or 'pooler' (see heads.pool_outputs)
+            num_epochs: Maximum head training epochs
+            learning_rate: Head learning rate
+            weight_decay: Head weight decay
+            batch_size: Head training batch size
+            encode_batch_size: Texts per encoder forward pass
+        
+        Returns:
+            Training results dictionary
+        """
+        logger.info("Starting head-only training on a frozen encoder...")
+        start = time.perf_counter()
+        
+        if self.model is None or self.tokenizer is None:
+            self.load_model_and_tokenizer()
+        
+        datasets = self.prepare_datasets(
+            train_file, val_file, test_file, max_length,
+            max_length_percentile=max_length_percentile if auto_max_length else None
+        )
+        
+        # Encode every split once (cached); hash splits share one frame and one cache entry
+        cache = EmbeddingCache(config.data.cache_dir)
+        encoder_name = self.init_from or self.model_name
+        features, cache_hits = {}, {}
+        for name, dataset in datasets.items():
+            embeddings, cache_hits[name] = cache.get_or_compute(
+                self.model.base_model, self.tokenizer, encoder_name, dataset.texts,
+                max_length=self.max_length, pooling=pooling, batch_size=encode_batch_size
+            )
+            positions = dataset.indices if dataset.indices is not None else slice(None)
+            features[name] = (np.asarray(embeddings[positions]), np.asarray(dataset.labels)[positions])
+        encode_seconds = time.perf_counter() - start
+        
+        head_start = time.perf_counter()
+        head, history = train_head(
+            *features['train'],
+            num_labels=self.num_labels,
+            val_features=features['val'][0] if 'val' in features else None,
+            val_labels=features['val'][1] if 'val' in features else None,
+            head_type=head_type,
+            hidden_dim=hidden_dim,
+            num_epochs=num_epochs,
+            learning_rate=learning_rate,
+            weight_decay=weight_decay,
+            batch_size=batch_size,
+            seed=config.training.seed
+        )
+        head_seconds = time.perf_counter() - head_start
+        
+        results = {}
+        for name in ('val', 'test'):
+            if name in features:
+                with torch.no_grad():
+                    logits = head(torch.from_numpy(features[name][0])).numpy()
+                metrics = self.compute_metrics(EvalPrediction(predictions=logits, label_ids=features[name][1]))
+                results[name] = {f"eval_{k}": float(v) for k, v in metrics.items()}
+        if 'test' in results:
+            logger.info(f"Test results: {results['test']}")
+        
+        head_config = {
+            'base_model': encoder_name,
+            'pooling': pooling,
+            'max_length': self.max_length,
+            'head_type': head_type,
+            'hidden_dim': hidden_dim,
+            'input_dim': int(features['train'][0].shape[1]),
+            'num_labels': self.num_labels
+        }
+        save_head(head, self.output_dir, head_config)
+        self.tokenizer.save_pretrained(self.output_dir)
+        self.data_loader.save_label_mappings(os.path.join(self.output_dir, "label_mappings.json"))
+        
+        training_info = {
+            'model_name': self.model_name,
+            'init_from': self.init_from,
+            'num_labels': self.num_labels,
+            'max_length': self.max_length,
+            'token_length_profile': self.token_length_profile,
+            'training_time': str(datetime.now()),
+            'head': head_config,
+            'head_history': history,
+            'timing': {
+                'encode_seconds': encode_seconds,
+                'head_seconds': head_seconds,
+                'embedding_cache_hits': cache_hits
+            },
+            'data_watermark': self.data_watermark,
+            'val_results': results.get('val', {}),
+            'test_results': results.get('test', {}),
+            'label_mappings': {
+                'label_to_id': self.data_loader.label_to_id,
+                'id_to_label': self.data_loader.id_to_label
+            }
+        }
+        with open(os.path.join(self.output_dir, "training_info.json"), 'w') as f:
+            json.dump(training_info, f, indent=2)
+        
+        logger.info(f"Head trained in {head_seconds:.1f}s (encoding {encode_seconds:.1f}s)")
+        
+        return {
+            'head_history': history,
+            'val_results': results.get('val', {}),
+            'test_results': results.get('test', {}),
+            'model_path': self.output_dir
+        }
+    
+    def find_batch_size(self,
+                        max_length: int = 512,
+                        max_batch_size: int = 256,
+                        memory_limit_mb: Optional[float] = None,
+                        headroom: float = 0.8,
+                        bf16: bool = False,
+                        gradient_checkpointing: bool = False,
+                        num_steps: int = 2) -> Dict[str, Any]:
+        """
+        Find the largest batch size that fits in memory
+        
+        Runs a few forward and backward passes on synthetic max_length batches at
+        doubling batch sizes. The memory growth per sample is used to project the
+        next size, and probing stops before the peak would exceed
+        headroom * memory_limit_mb. Optimizer state (two fp32 copies of the
+        trainable weights for AdamW) is reserved up front because the probe does
+        not step the optimizer, so the model weights are left untouched.
+        
+        Args:
+            max_length: Sequence length to probe with
+            max_batch_size: Largest batch size to try
+            memory_limit_mb: Memory ceiling (defaults to device memory on GPU, or
+                current RSS plus available memory on CPU)
+            headroom: Fraction of the memory limit the peak may use
+            bf16: Probe under bf16 autocast
+            gradient_checkpointing: Probe with gradient checkpointing enabled
+            num_steps: Forward/backward passes per probed size
+            
+        Returns:
+            Dictionary with the chosen batch size, memory budget and probe results
+        """
+        if self.model is None or self.tokenizer is None:
+            self.load_model_and_tokenizer()
+        
+        use_cuda = torch.cuda.is_available()
+        device = torch.device('cuda' if use_cuda else 'cpu')
+        model = self.model.to(device)
+        model.train()
+        if gradient_checkpointing:
+            model.gradient_checkpointing_enable()
+        
+        if memory_limit_mb is None:
+            if use_cuda:
+                memory_limit_mb = torch.cuda.get_device_properties(device).total_memory / (1024 * 1024)
+            else:
+                memory_limit_mb = (get_current_rss_mb() or 0.0) + (get_available_memory_mb() or 0.0)
+        
+        trainable_bytes = sum(p.numel() * 4 for p in model.parameters() if p.requires_grad)
+        optimizer_state_mb = 2 * trainable_bytes / (1024 * 1024)
+        budget_mb = memory_limit_mb * headroom - optimizer_state_mb
+        
+        probes = []
+        best = None
+        batch_size = 1
+        while True:
+            try:
+                peak_mb, step_seconds = self._probe_step(model, device, batch_size, max_length, bf16, num_steps)
+            except RuntimeError as e:
+                if 'out of memory' not in str(e).lower():
+                    raise
+                logger.info(f"Batch size {batch_size} ran out of memory")
+                break
+            finally:
+                model.zero_grad(set_to_none=True)
+            
+            probes.append({'batch_size': batch_size, 'peak_memory_mb': peak_mb, 'step_seconds': step_seconds})
+            logger.info(f"Probed batch size {batch_size}: peak {peak_mb:.0f} MB, {step_seconds:.3f}s/step")
+            
+            if peak_mb > budget_mb:
+                break
+            best = batch_size
+            if batch_size >= max_batch_size:
+                break
+            
+            # Project the next size from the memory growth per sample
+            next_size = min(batch_size * 2, max_batch_size)
+            if len(probes) >= 2:
+                growth = probes[-1]['peak_memory_mb'] - probes[-2]['peak_memory_mb']
+                per_sample = max(growth, 0.0) / (probes[-1]['batch_size'] - probes[-2]['batch_size'])
+                if per_sample > 0 and peak_mb + per_sample * (next_size - batch_size) > budget_mb:
+                    next_size = batch_size + int((budget_mb - peak_mb) / per_sample)
+                    if next_size <= batch_size:
+                        break
+            batch_size = next_size
+        
+        if gradient_checkpointing:
+            model.gradient_checkpointing_disable()
+        
+        if best is None:
+            logger.warning("Even batch size 1 exceeds the memory budget; using 1")
+            best = 1
+        
+        result = {
+            'batch_size': best,
+            'max_length': max_length,
+            'memory_limit_mb': memory_limit_mb,
+            'headroom': headroom,
+            'budget_mb': budget_mb,
+            'optimizer_state_mb': optimizer_state_mb,
+            'probes': probes
+        }
+        logger.info(f"Largest batch size within {budget_mb:.0f} MB: {best}")
+        
+        return result
+    
+    def _probe_step(self, model, device: torch.device, batch_size: int, max_length: int,
+                    bf16: bool, num_steps: int) -> Tuple[float, float]:
+        """Run forward/backward passes on a synthetic batch; return (peak MB, seconds per step)"""
+        input_ids = torch.randint(0, model.config.vocab_size, (batch_size, max_length), device=device)
+        attention_mask = torch.ones_like(input_ids)
+        labels = torch.zeros(batch_size, dtype=torch.long, device=device)
+        
+        if device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(device)
+        else:
+            reset_peak_rss()
+        
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=bf16):
+                loss = model(input_ids=input_ids, attention_mask=attention_mask, labels=labels).loss
+            loss.backward()
+        step_seconds = (time.perf_counter() - start) / num_steps
+        
+        if device.type == 'cuda':
+            peak_mb = torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+        else:
+            peak_mb = get_peak_rss_mb() or 0.0
+        
+        return peak_mb, step_seconds
+    
+    def _measure_step_seconds(self, num_steps: int = 2) -> float:
+        """
+        Seconds per forward/backward pass of one micro-batch at the training shape
+        
+        Reuses the batch-size probe when it timed the chosen micro-batch size.
+        With data-parallel workers the slowest rank's time is used.
+        """
+        micro_batch_size = self.memory_options['micro_batch_size']
+        probes = (self.batch_size_probe or {}).get('probes', [])
+        timed = [probe['step_seconds'] for probe in probes if probe['batch_size'] == micro_batch_size]
+        
+        if timed:
+            step_seconds = timed[-1]
+        else:
+            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            model = self.model.to(device)
+            model.train()
+            if self.memory_options['gradient_checkpointing']:
+                model.gradient_checkpointing_enable()
+            try:
+                # The first pass pays for allocations and kernel selection; time the following ones
+                self._probe_step(model, device, micro_batch_size, self.max_length, self.memory_options['bf16'], 1)
+                _, step_seconds = self._probe_step(
+                    model, device, micro_batch_size, self.max_length, self.memory_options['bf16'], num_steps
+                )
+            finally:
+                model.zero_grad(set_to_none=True)
+                if self.memory_options['gradient_checkpointing']:
+                    model.gradient_checkpointing_disable()
+        
+        if dist.is_available() and dist.is_initialized():
+            slowest = torch.tensor([step_seconds], dtype=torch.float64)
+            dist.all_reduce(slowest, op=dist.ReduceOp.MAX)
+            step_seconds = float(slowest.item())
+        
+        return step_seconds
+    
+    def _plan_budget(self,
+                     datasets: Dict[str, Any],
+                     start: float,
+                     time_budget: Optional[float],
+                     sample_budget: Optional[int],
+                     sync_evaluation: bool,
+                     margin: float = 0.05) -> Dict[str, Any]:
+        """
+        Work out how many optimizer steps fit in a time and/or sample budget
+        
+        The sample budget converts directly to steps. For the time budget one
+        micro-batch step is timed at the training shape; evaluation is assumed
+        to cost a third of a training pass per sample (forward only). The final
+        validation and test evaluations (plus, with asynchronous evaluation,
+        the last checkpoint's) are reserved up front, as are the periodic
+        evaluations when they run in the training process. The step count then
+        fixes the LR schedule (warmup is capped at a tenth of it and the decay
+        ends with the budget) and the evaluation/checkpoint cadence.
+        BudgetCallback re-fits the plan once real step times are known.
+        
+        Args:
+            datasets: Prepared datasets
+            start: time.perf_counter() value the time budget is counted from
+            time_budget: Wall-clock budget in seconds (optional)
+            sample_budget: Number of training samples (optional)
+            sync_evaluation: Whether periodic evaluations pause training
+            margin: Fraction of the remaining time kept spare for checkpoint
+                writes and step-time noise
+        
+        Returns:
+            Dictionary with max_steps, eval_steps, warmup_steps, the deadline and the estimates
+        """
+        samples_per_step = self.memory_options['effective_batch_size'] * self.world_size
+        num_evaluations = max(1, config.training.budget_evaluations)
+        plan = {
+            'time_budget': time_budget,
+            'sample_budget': sample_budget,
+            'samples_per_step': samples_per_step,
+            'num_evaluations': num_evaluations,
+            'deadline': None
+        }
+        limits = []
+        
+        if sample_budget:
+            limits.append(max(1, sample_budget // samples_per_step))
+        
+        if time_budget:
+            micro_step_seconds = self._measure_step_seconds()
+            step_seconds = micro_step_seconds * self.memory_options['gradient_accumulation_steps']
+            # Each rank evaluates its shard of the data
+            sample_eval_seconds = micro_step_seconds / self.memory_options['micro_batch_size'] / 3
+            eval_seconds = len(datasets['val']) * sample_eval_seconds / self.world_size if 'val' in datasets else 0.0
+            test_seconds = len(datasets['test']) * sample_eval_seconds / self.world_size if 'test' in datasets else 0.0
+            evaluation_seconds = num_evaluations * eval_seconds if sync_evaluation else 0.0
+            reserved_seconds = eval_seconds + test_seconds + (0.0 if sync_evaluation else eval_seconds)
+            
+            remaining = time_budget - (time.perf_counter() - start) - reserved_seconds
+            train_seconds = (remaining - evaluation_seconds) * (1.0 - margin)
+            if train_seconds < step_seconds:
+                raise ValueError(
+                    f"A time budget of {time_budget:.0f}s leaves no time for training "
+                    f"({step_seconds:.2f}s per step, {reserved_seconds:.0f}s reserved for final evaluation)"
+                )
+            
+            limits.append(int(train_seconds / step_seconds))
+            plan.update({
+                'estimated_step_seconds': step_seconds,
+                'estimated_eval_seconds': eval_seconds,
+                'evaluation_seconds': evaluation_seconds,
+                'reserved_seconds': reserved_seconds,
+                'deadline': start + time_budget - reserved_seconds
+            })
+        
+        max_steps = min(limits)
+        plan.update({
+            'max_steps': max_steps,
+            'eval_steps': max(1, math.ceil(max_steps / num_evaluations)),
+            'warmup_steps': max_steps // 10,
+            'planned_samples': max_steps * samples_per_step
+        })
+        logger.info(
+            f"Budget plan: {max_steps} steps ({plan['planned_samples']} samples), "
+            f"evaluating every {plan['eval_steps']} steps"
+            + (f", ~{plan['estimated_step_seconds']:.2f}s/step" if time_budget else "")
+        )
+        
+        return plan
+    
+    def _resolve_memory_options(self,
+                                batch_size: int,
+                                micro_batch_size: Optional[int],
+                                bf16: Optional[bool],
+                                gradient_checkpointing: Optional[bool]) -> Dict[str, Any]:
+        """
+        Work out micro-batch size, gradient accumulation and precision
+        
+        Args:
+            batch_size: Requested effective batch size
+            micro_batch_size: Requested per-step batch size (optional)
+            bf16: Whether bf16 mixed precision was requested (optional)
+            gradient_checkpointing: Whether gradient checkpointing was requested (optional)
+            
+        Returns:
+            Dictionary of resolved memory options
+        """
+        if micro_batch_size is None:
+            micro_batch_size = config.training.micro_batch_size or batch_size
+        if bf16 is None:
+            bf16 = config.training.bf16
+        if gradient_checkpointing is None:
+            gradient_checkpointing = config.training.gradient_checkpointing
+        
+        micro_batch_size = max(1, min(micro_batch_size, batch_size))
+        accumulation_steps = -(-batch_size // micro_batch_size)
+        if micro_batch_size * accumulation_steps != batch_size:
+            logger.warning(
+                f"Batch size {batch_size} is not a multiple of micro-batch size {micro_batch_size}; "
+                f"effective batch size will be {micro_batch_size * accumulation_steps}"
+            )
+        
+        if bf16 and not torch.cuda.is_available() and not cpu_supports_bf16():
+            logger.warning("CPU has no native bf16 support; training in fp32 instead")
+            bf16 = False
+        
+        options = {
+            'batch_size': batch_size,
+            'micro_batch_size': micro_batch_size,
+            'gradient_accumulation_steps': accumulation_steps,
+            'effective_batch_size': micro_batch_size * accumulation_steps,
+            'bf16': bool(bf16),
+            'gradient_checkpointing': bool(gradient_checkpointing)
+        }
+        logger.info(f"Memory options: {options}")
+        
+        return options
+    
+    def _save_training_info(self, train_result, test_results, val_results=None):
         """Save training information and results"""
+        metrics = train_result.metrics or {}
         training_info = {
             'model_name': self.model_name,
+            'init_from': self.init_from,
+            'resumed_from': self.resumed_from,
             'num_labels': self.num_labels,
+            'world_size': self.world_size,
+            'max_length': self.max_length,
+            'token_length_profile': self.token_length_profile,
             'training_time': str(datetime.now()),
             'train_result': {
                 'train_loss': float(train_result.training_loss),
-                'train_runtime': float(train_result.training_loss),
-                'train_samples_per_second': float(train_result.training_loss),
+                'train_runtime': float(metrics.get('train_runtime', 0.0)),
+                'train_samples_per_second': float(metrics.get('train_samples_per_second', 0.0)),
+                'train_steps_per_second': float(metrics.get('train_steps_per_second', 0.0)),
             },
+            'memory_options': self.memory_options,
+            'batch_size_probe': self.batch_size_probe,
+            'lora': self._lora_info(),
+            'checkpointing': self.checkpointing_info,
+            'budget': self.budget_plan,
+            'profile': self.profile_info,
+            'throughput': self.throughput_callback.summary if self.throughput_callback else {},
+            'data_watermark': self.data_watermark,
+            'incremental': self.incremental_info,
+            'val_results': val_results or {},
             'test_results': test_results,
             'label_mappings': {
                 'label_to_id': self.data_loader.label_to_id,
@@ -287,6 +1235,21 @@ class ModelTrainer:
             json.dump(training_info, f, indent=2)
         
         logger.info(f"Training info saved to {info_path}")
+        
+        # The next incremental run trains on rows appended after this watermark
+        if self.data_watermark is not None:
+            with open(os.path.join(self.output_dir, "data_watermark.json"), 'w') as f:
+                json.dump(self.data_watermark, f, indent=2)
+    
+    def _lora_info(self) -> Optional[Dict[str, Any]]:
+        """LoRA settings plus the size of the saved adapter artifact"""
+        if self.lora_config is None:
+            return None
+        info = dict(self.lora_config)
+        weights_path = os.path.join(self.output_dir, ADAPTER_WEIGHTS_NAME)
+        if os.path.exists(weights_path):
+            info['artifact_size_mb'] = os.path.getsize(weights_path) / (1024 * 1024)
+        return info
     
     def evaluate_model(self, test_file: str) -> Dict[str, Any]:
         """
@@ -305,7 +1268,8 @@ class ModelTrainer:
         test_df = self.data_loader.load_data(test_file)
         test_dataset = TextClassificationDataset.from_dataframe(
             test_df, self.tokenizer,
-            label_to_id=self.data_loader.label_to_id
+            label_to_id=self.data_loader.label_to_id,
+            max_length=self.max_length or 512
         )
         
         # Create trainer for evaluation
@@ -314,19 +1278,17 @@ class ModelTrainer:
             compute_metrics=self.compute_metrics
         )
         
-        # Evaluate
-        results = trainer.evaluate(test_dataset)
-        
-        # Generate detailed metrics
-        predictions = trainer.predict(test_dataset)
-        y_pred = np.argmax(predictions.predictions, axis=1)
-        y_true = predictions.label_ids
+        # One inference pass: predict() also returns the loss and compute_metrics output
+        predictions = trainer.predict(test_dataset, metric_key_prefix="eval")
         
-        detailed_metrics = self.metrics_calculator.calculate_metrics(y_true, y_pred)
+        # Detailed metrics from the same logits
+        label_names = [self.data_loader.id_to_label[i] for i in range(len(self.data_loader.id_to_label))]
+        evaluator = StreamingEvaluator(len(label_names), label_names)
+        evaluator.update(predictions.predictions, predictions.label_ids)
         
         return {
-            'basic_metrics': results,
-            'detailed_metrics': detailed_metrics
+            'basic_metrics': predictions.metrics,
+            'detailed_metrics': evaluator.compute()
         }
 
 
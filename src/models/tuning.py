@@ -0,0 +1,424 @@
+"""
+Hyperparameter search with successive halving
+"""
+
+import os
+import json
+import math
+import time
+import glob
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import torch
+import numpy as np
+import pandas as pd
+from transformers import AutoTokenizer
+from transformers.trainer_utils import get_last_checkpoint
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+
+from .callbacks import EpochLimitCallback
+from .trainer import ModelTrainer
+from ..data.dataset import TokenizedDataset
+from ..utils.config import config
+from ..utils.cpu import available_cores, split_cores, pin_to_cores
+
+logger = logging.getLogger(__name__)
+
+# Default search space: (low, high, scale) ranges or lists of choices
+DEFAULT_SEARCH_SPACE = {
+    'learning_rate': (1e-5, 1e-4, 'log'),
+    'warmup_ratio': (0.0, 0.2, 'uniform'),
+    'weight_decay': (0.0, 0.1, 'uniform')
+}
+
+
+def _init_worker(core_queue):
+    """Pin a pool worker to its own slice of cores"""
+    pin_to_cores(core_queue.get())
+    torch.set_num_interop_threads(1)
+
+
+def _run_trial(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Train one trial for one rung in a pool worker"""
+    start = time.perf_counter()
+    
+    # A trial is one run sized for max_epochs that pauses at each rung; later
+    # rungs resume its last checkpoint (optimizer and LR schedule included), so
+    # the trial trains like one uninterrupted run with its params
+    trainer = ModelTrainer(
+        model_name=spec['model_name'],
+        num_labels=spec['num_labels'],
+        output_dir=spec['output_dir'],
+        callbacks=[EpochLimitCallback(spec['epochs'], evaluate=True)]
+    )
+    trainer.data_loader.load_label_mappings(spec['label_mappings_path'])
+    shutil.copy(spec['label_mappings_path'], os.path.join(spec['output_dir'], 'label_mappings.json'))
+    
+    datasets = {name: TokenizedDataset.load(path) for name, path in spec['data_paths'].items()}
+    trainer.max_length = datasets['train'].max_length
+    
+    params = spec['params']
+    result = trainer.train_on_datasets(
+        datasets,
+        num_epochs=spec['max_epochs'],
+        batch_size=spec['batch_size'],
+        learning_rate=params['learning_rate'],
+        weight_decay=params['weight_decay'],
+        warmup_steps=0,
+        warmup_ratio=params['warmup_ratio'],
+        save_steps=spec['eval_steps'],
+        eval_steps=spec['eval_steps'],
+        logging_steps=spec['logging_steps'],
+        resume_from_checkpoint=get_last_checkpoint(spec['output_dir']) if spec['resume'] else None,
+        # Later rungs resume, and trials are ranked on synchronous evaluations
+        weights_only_checkpoints=False,
+        async_evaluation=False
+    )
+    
+    val_results = result['val_results']
+    return {
+        'trial_id': spec['trial_id'],
+        'metric': val_results.get(f"eval_{spec['metric']}"),
+        'val_results': val_results,
+        'test_results': result['test_results'],
+        'train_loss': float(result['train_result'].training_loss),
+        'model_path': spec['output_dir'],
+        'seconds': time.perf_counter() - start
+    }
+
+
+class HyperparameterTuner:
+    """Run concurrent fine-tuning trials and prune weak ones with successive halving"""
+    
+    def __init__(self,
+                 model_name: str = "bert-base-uncased",
+                 num_labels: int = 2,
+                 output_dir: str = "./models/tuning",
+                 search_space: Optional[Dict[str, Any]] = None,
+                 num_trials: int = 9,
+                 min_epochs: int = 1,
+                 max_epochs: int = 3,
+                 reduction_factor: int = 3,
+                 max_workers: Optional[int] = None,
+                 cores_per_trial: Optional[int] = None,
+                 metric: str = "f1",
+                 seed: int = 42):
+        """
+        Initialize the tuner
+        
+        Args:
+            model_name: Name of the pre-trained model
+            num_labels: Number of classification labels
+            output_dir: Directory for the shared data, trials, leaderboard and best model
+            search_space: Mapping from hyperparameter to (low, high, 'log'|'uniform')
+                or a list of choices; missing entries use DEFAULT_SEARCH_SPACE
+            num_trials: Number of sampled configurations
+            min_epochs: Epochs every trial gets in the first rung
+            max_epochs: Epochs the surviving trials reach in the last rung
+            reduction_factor: Keep the top 1/reduction_factor of trials at each rung
+            max_workers: Maximum number of concurrent trials (defaults to one per core)
+            cores_per_trial: Cores pinned to each trial (defaults to an even share)
+            metric: Validation metric to maximize
+            seed: Random seed for sampling configurations
+        """
+        if min_epochs < 1 or max_epochs < min_epochs:
+            raise ValueError("Epochs must satisfy 1 <= min_epochs <= max_epochs")
+        if reduction_factor < 2:
+            raise ValueError("Reduction factor must be at least 2")
+        
+        self.model_name = model_name
+        self.num_labels = num_labels
+        self.output_dir = output_dir
+        self.search_space = {**DEFAULT_SEARCH_SPACE, **(search_space or {})}
+        self.num_trials = num_trials
+        self.min_epochs = min_epochs
+        self.max_epochs = max_epochs
+        self.reduction_factor = reduction_factor
+        self.max_workers = max_workers
+        self.cores_per_trial = cores_per_trial
+        self.metric = metric
+        self.seed = seed
+        self.data_dir = os.path.join(output_dir, "data")
+        self.trials: List[Dict[str, Any]] = []
+        self.token_length_profile = None
+        
+        os.makedirs(self.data_dir, exist_ok=True)
+    
+    def rung_epochs(self) -> List[int]:
+        """Cumulative epochs trained by the end of each rung"""
+        epochs = []
+        budget = self.min_epochs
+        while budget < self.max_epochs:
+            epochs.append(budget)
+            budget *= self.reduction_factor
+        epochs.append(self.max_epochs)
+        return epochs
+    
+    def sample_configs(self) -> List[Dict[str, Any]]:
+        """Sample num_trials configurations from the search space"""
+        rng = np.random.default_rng(self.seed)
+        configs = []
+        for _ in range(self.num_trials):
+            params = {}
+            for name, space in self.search_space.items():
+                if isinstance(space, list):
+                    params[name] = space[int(rng.integers(len(space)))]
+                else:
+                    low, high, scale = space
+                    if scale == 'log':
+                        params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                    else:
+                        params[name] = float(rng.uniform(low, high))
+            configs.append(params)
+        return configs
+    
+    def prepare_data(self,
+                     train_file: str,
+                     val_file: Optional[str] = None,
+                     test_file: Optional[str] = None,
+                     max_length: int = 512,
+                     max_length_percentile: Optional[float] = None) -> Dict[str, str]:
+        """
+        Tokenize the data once and save it for all trials
+        
+        Args:
+            train_file: Path to training data file
+            val_file: Path to validation data file (optional)
+            test_file: Path to test data file (optional)
+            max_length: Maximum sequence length
+            max_length_percentile: Pick max_length from token lengths (see ModelTrainer)
+        
+        Returns:
+            Mapping from split name to tokenized dataset path ('test' only
+            when there is test data)
+        """
+        trainer = ModelTrainer(self.model_name, self.num_labels, output_dir=self.data_dir)
+        trainer.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        datasets = trainer.prepare_datasets(
+            train_file, val_file, test_file, max_length,
+            max_length_percentile=max_length_percentile
+        )
+        self.token_length_profile = trainer.token_length_profile
+        
+        if 'val' not in datasets or len(datasets['val']) == 0:
+            raise ValueError("Tuning needs a validation set to rank trials")
+        
+        paths = {}
+        for name in ('train', 'val', 'test'):
+            if name == 'test' and len(datasets.get('test') or []) == 0:
+                continue
+            paths[name] = os.path.join(self.data_dir, f"{name}.pt")
+            TokenizedDataset.from_dataset(datasets[name]).save(paths[name])
+        
+        return paths
+    
+    def _num_workers(self) -> int:
+        num_cores = len(available_cores())
+        if self.max_workers:
+            return max(1, min(self.max_workers, self.num_trials))
+        if self.cores_per_trial:
+            return max(1, min(num_cores // self.cores_per_trial, self.num_trials))
+        return max(1, min(num_cores, self.num_trials))
+    
+    def run(self,
+            train_file: str,
+            val_file: Optional[str] = None,
+            test_file: Optional[str] = None,
+            batch_size: int = 16,
+            max_length: int = 512,
+            max_length_percentile: Optional[float] = None,
+            eval_steps: Optional[int] = None,
+            logging_steps: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run the search
+        
+        Every trial trains for the first rung's epochs; after each rung only the
+        best 1/reduction_factor of the trials (by validation metric) continue,
+        resuming from their last checkpoint, until the survivors reach
+        max_epochs. The learning-rate schedule of every trial spans max_epochs,
+        so each trial is the same run as an uninterrupted max_epochs training
+        with its params.
+        
+        Args:
+            train_file: Path to training data file
+            val_file: Path to validation data file (optional)
+            test_file: Path to test data file (optional)
+            batch_size: Training batch size
+            max_length: Maximum sequence length
+            max_length_percentile: Pick max_length from token lengths (see ModelTrainer)
+            eval_steps: Steps between evaluations within a trial
+            logging_steps: Steps between logging within a trial
+        
+        Returns:
+            Dictionary with the leaderboard, best trial and best model path
+        """
+        start = time.perf_counter()
+        data_paths = self.prepare_data(train_file, val_file, test_file, max_length, max_length_percentile)
+        
+        self.trials = [
+            {'trial_id': i, 'params': params, 'status': 'running', 'rung': -1, 'epochs': 0,
+             'metric': None, 'test_results': None, 'model_path': None, 'seconds': 0.0, 'history': []}
+            for i, params in enumerate(self.sample_configs())
+        ]
+        rungs = self.rung_epochs()
+        num_workers = self._num_workers()
+        
+        logger.info(
+            f"Tuning {self.num_trials} trials over rungs {rungs} (epochs) "
+            f"with {num_workers} concurrent workers"
+        )
+        
+        context = multiprocessing.get_context('spawn')
+        core_queue = context.Queue()
+        for cores in split_cores(num_workers, self.cores_per_trial):
+            core_queue.put(cores)
+        
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(core_queue,)) as executor:
+            active = list(self.trials)
+            for rung, epochs in enumerate(rungs):
+                self._run_rung(executor, active, rung, epochs, data_paths, batch_size,
+                               eval_steps or config.training.eval_steps,
+                               logging_steps or config.training.logging_steps)
+                
+                active = [t for t in active if t['status'] == 'running']
+                if rung == len(rungs) - 1 or not active:
+                    break
+                
+                # Keep the top 1/reduction_factor of this rung's trials
+                active.sort(key=self._sort_key, reverse=True)
+                keep = max(1, len(active) // self.reduction_factor)
+                for trial in active[keep:]:
+                    trial['status'] = 'pruned'
+                    self._remove_checkpoints(trial)
+                active = active[:keep]
+                logger.info(f"Rung {rung}: kept trials {[t['trial_id'] for t in active]}")
+        
+        for trial in self.trials:
+            if trial['status'] == 'running':
+                trial['status'] = 'completed'
+            self._remove_checkpoints(trial)
+        
+        return self._finalize(rungs, time.perf_counter() - start)
+    
+    def _run_rung(self, executor, trials, rung, epochs, data_paths, batch_size, eval_steps, logging_steps):
+        """Train every trial of a rung up to the rung's cumulative epochs"""
+        futures = {}
+        for trial in trials:
+            spec = {
+                'trial_id': trial['trial_id'],
+                'model_name': self.model_name,
+                'num_labels': self.num_labels,
+                'resume': trial['rung'] >= 0,
+                'output_dir': os.path.join(self.output_dir, f"trial_{trial['trial_id']:03d}"),
+                'label_mappings_path': os.path.join(self.data_dir, "label_mappings.json"),
+                # Only trials reaching max_epochs are evaluated on the test set; it never affects ranking
+                'data_paths': {name: path for name, path in data_paths.items()
+                               if name != 'test' or epochs == self.max_epochs},
+                'params': trial['params'],
+                'epochs': epochs,
+                'max_epochs': self.max_epochs,
+                'batch_size': batch_size,
+                'eval_steps': eval_steps,
+                'logging_steps': logging_steps,
+                'metric': self.metric
+            }
+            futures[executor.submit(_run_trial, spec)] = trial
+        
+        for future in as_completed(futures):
+            trial = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Trial {trial['trial_id']} failed in rung {rung}: {e}")
+                trial['status'] = 'failed'
+                trial['error'] = str(e)
+                continue
+            
+            trial.update({
+                'rung': rung,
+                'epochs': epochs,
+                'metric': result['metric'],
+                'test_results': result['test_results'] or None,
+                'model_path': result['model_path'],
+                'seconds': trial['seconds'] + result['seconds']
+            })
+            trial['history'].append({
+                'rung': rung,
+                'epochs': epochs,
+                'metric': result['metric'],
+                'train_loss': result['train_loss'],
+                'val_results': result['val_results']
+            })
+            logger.info(f"Trial {trial['trial_id']} rung {rung} ({epochs} epochs): {self.metric}={result['metric']}")
+    
+    @staticmethod
+    def _remove_checkpoints(trial: Dict[str, Any]):
+        """Delete a trial's checkpoints once it no longer continues (its final model stays)"""
+        if trial['model_path']:
+            for checkpoint in glob.glob(os.path.join(trial['model_path'], 'checkpoint-*')):
+                shutil.rmtree(checkpoint, ignore_errors=True)
+    
+    @staticmethod
+    def _sort_key(trial: Dict[str, Any]) -> Tuple[int, float]:
+        """Rank by rung reached, then by metric"""
+        metric = trial['metric'] if trial['metric'] is not None else -math.inf
+        return trial['rung'], metric
+    
+    def _finalize(self, rungs: List[int], elapsed: float) -> Dict[str, Any]:
+        """Write the leaderboard and copy the best model"""
+        ranked = sorted(
+            [t for t in self.trials if t['status'] != 'failed'], key=self._sort_key, reverse=True
+        ) + [t for t in self.trials if t['status'] == 'failed']
+        
+        leaderboard = []
+        for rank, trial in enumerate(ranked, start=1):
+            leaderboard.append({
+                'rank': rank,
+                'trial_id': trial['trial_id'],
+                'status': trial['status'],
+                'epochs': trial['epochs'],
+                self.metric: trial['metric'],
+                f"test_{self.metric}": (trial['test_results'] or {}).get(f"eval_{self.metric}"),
+                **trial['params'],
+                'seconds': trial['seconds'],
+                'model_path': trial['model_path']
+            })
+        
+        best = ranked[0] if ranked and ranked[0]['status'] != 'failed' else None
+        best_model_path = None
+        if best is not None:
+            best_model_path = os.path.join(self.output_dir, "best_model")
+            if os.path.exists(best_model_path):
+                shutil.rmtree(best_model_path)
+            shutil.copytree(best['model_path'], best_model_path)
+            logger.info(
+                f"Best trial {best['trial_id']}: {self.metric}={best['metric']} "
+                f"with {best['params']} after {best['epochs']} epochs"
+            )
+            if best['test_results']:
+                logger.info(f"Best trial test results: {best['test_results']}")
+        
+        summary = {
+            'model_name': self.model_name,
+            'metric': self.metric,
+            'rung_epochs': rungs,
+            'reduction_factor': self.reduction_factor,
+            'search_space': {k: list(v) for k, v in self.search_space.items()},
+            'elapsed_seconds': elapsed,
+            'token_length_profile': self.token_length_profile,
+            'best_trial': best,
+            'best_model_path': best_model_path,
+            'leaderboard': leaderboard,
+            'trials': self.trials
+        }
+        
+        with open(os.path.join(self.output_dir, "leaderboard.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        pd.DataFrame(leaderboard).to_csv(os.path.join(self.output_dir, "leaderboard.csv"), index=False)
+        
+        logger.info(f"Leaderboard saved to {self.output_dir}")
+        
+        return summary
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Background training jobs for the web interface
+
+Jobs live in an on-disk store (one directory per job with ``job.json``,
+``progress.json`` and ``worker.log``) and run in separate worker processes,
+so they survive browser refreshes and Streamlit reruns. A job moves from
+queued to running to completed, failed or cancelled. Whoever touches the
+queue (the UI on each render, or a worker when it finishes) starts queued
+jobs while a core slot is free; no scheduler daemon is needed.
+
+Run a job's worker with ``python -m src.ui.jobs <job_dir>``.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import signal
+import traceback
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+import logging
+
+from ..utils.config import config
+from ..utils.cpu import available_cores, split_cores, pin_to_cores
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+JOB_FILE = "job.json"
+PROGRESS_FILE = "progress.json"
+LOG_FILE = "worker.log"
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Cores a training job should have before the queue runs several at once
+MIN_CORES_PER_JOB = 4
+
+# Worker processes started by this process, kept so they can be reaped
+_processes: Dict[str, subprocess.Popen] = {}
+
+
+class JobCancelled(BaseException):
+    """Raised in a worker when its job is cancelled (a BaseException so training code does not swallow it)"""
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    """Write JSON atomically so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class JobQueue:
+    """On-disk queue of training jobs run by subprocess workers"""
+    
+    def __init__(self,
+                 root: Optional[str] = None,
+                 max_concurrent: Optional[int] = None):
+        """
+        Args:
+            root: Job store directory (defaults to <logs_dir>/jobs)
+            max_concurrent: Jobs allowed to run at once (defaults to one per
+                MIN_CORES_PER_JOB available cores, at least one); the cores
+                are split evenly between the slots
+        """
+        self.root = root or os.path.join(config.data.logs_dir, "jobs")
+        os.makedirs(self.root, exist_ok=True)
+        num_cores = len(available_cores())
+        self.max_concurrent = max(1, min(max_concurrent or num_cores // MIN_CORES_PER_JOB, num_cores))
+    
+    @contextmanager
+    def _lock(self):
+        """Serialize queue updates across the UI and worker processes"""
+        with open(os.path.join(self.root, ".lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+    
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return _read_json(os.path.join(self.job_dir(job_id), JOB_FILE))
+    
+    def _save(self, job: Dict[str, Any]):
+        _write_json(os.path.join(self.job_dir(job['id']), JOB_FILE), job)
+    
+    def update(self, job_id: str, **fields) -> Dict[str, Any]:
+        """Update fields of a job record"""
+        with self._lock():
+            job = self._load(job_id)
+            job.update(fields)
+            self._save(job)
+        return job
+    
+    def submit(self, params: Dict[str, Any], name: Optional[str] = None) -> str:
+        """
+        Queue a training job
+        
+        Args:
+            params: ModelTrainer arguments (model_name, num_labels, output_dir;
+                num_labels may be None to count the labels in train_file) plus
+                a 'train' dictionary of ModelTrainer.train arguments
+            name: Display name
+        
+        Returns:
+            Job id
+        """
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        os.makedirs(self.job_dir(job_id))
+        job = {
+            'id': job_id,
+            'name': name or os.path.basename(params.get('output_dir', '')) or job_id,
+            'status': 'queued',
+            'params': params,
+            # Workers start from the default config; carry this process's settings over
+            'config': config.to_dict(),
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'pid': None,
+            'slot': None,
+            'cores': None,
+            'cancel_requested': False,
+            'error': None,
+            'result': None
+        }
+        with self._lock():
+            self._save(job)
+        logger.info(f"Queued job {job_id}")
+        
+        self.schedule()
+        return job_id
+    
+    def _is_alive(self, job: Dict[str, Any]) -> bool:
+        process = _processes.get(job['id'])
+        if process is not None:
+            return process.poll() is None
+        if not job.get('pid'):
+            return False
+        try:
+            os.kill(job['pid'], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    
+    def _reconcile(self, jobs: List[Dict[str, Any]]):
+        """Close out running jobs whose worker died without recording a result"""
+        for job in jobs:
+            if job['status'] == 'running' and not self._is_alive(job):
+                job.update({
+                    'status': 'cancelled' if job['cancel_requested'] else 'failed',
+                    'error': job['error'] or (None if job['cancel_requested'] else "Worker exited unexpectedly"),
+                    'finished_at': job['finished_at'] or time.time()
+                })
+                self._save(job)
+                _processes.pop(job['id'], None)
+    
+    def _all_jobs(self) -> List[Dict[str, Any]]:
+        jobs = [self._load(name) for name in os.listdir(self.root) if os.path.isdir(self.job_dir(name))]
+        return sorted((job for job in jobs if job is not None), key=lambda job: job['created_at'])
+    
+    def schedule(self) -> List[str]:
+        """
+        Start queued jobs (oldest first) while slots are free
+        
+        Returns:
+            Ids of the jobs started
+        """
+        started = []
+        with self._lock():
+            jobs = self._all_jobs()
+            self._reconcile(jobs)
+            busy = {job['slot'] for job in jobs if job['status'] == 'running'}
+            free = [slot for slot in range(self.max_concurrent) if slot not in busy]
+            slices = split_cores(self.max_concurrent)
+            
+            for job in jobs:
+                if not free:
+                    break
+                if job['status'] != 'queued':
+                    continue
+                slot = free.pop(0)
+                job.update({'status': 'running', 'slot': slot, 'cores': slices[slot], 'started_at': time.time()})
+                job['pid'] = self._launch(job)
+                self._save(job)
+                started.append(job['id'])
+                logger.info(f"Started job {job['id']} (pid {job['pid']}) on cores {slices[slot]}")
+        
+        return started
+    
+    def _launch(self, job: Dict[str, Any]) -> int:
+        job_dir = self.job_dir(job['id'])
+        with open(os.path.join(job_dir, LOG_FILE), 'a') as log_file:
+            # A new session lets cancel() signal the worker and its children together
+            process = subprocess.Popen(
+                [sys.executable, "-m", "src.ui.jobs", job_dir],
+                cwd=PROJECT_ROOT,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                start_new_session=True
+            )
+        _processes[job['id']] = process
+        return process.pid
+    
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued job, or ask a running job's worker to stop"""
+        with self._lock():
+            job = self._load(job_id)
+            if job['status'] == 'queued':
+                job.update({'status': 'cancelled', 'finished_at': time.time()})
+            elif job['status'] == 'running':
+                job['cancel_requested'] = True
+                try:
+                    os.killpg(job['pid'], signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            self._save(job)
+        logger.info(f"Cancelled job {job_id}")
+        return job
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record with its latest progress under 'progress'"""
+        job = self._load(job_id)
+        if job is not None:
+            job['progress'] = self.progress(job_id)
+        return job
+    
+    def progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Latest progress published by the job's ProgressCallback"""
+        return _read_json(os.path.join(self.job_dir(job_id), PROGRESS_FILE))
+    
+    def list_jobs(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        All jobs, newest first, with their progress
+        
+        Also closes out dead workers and starts queued jobs, so polling the list
+        keeps the queue moving.
+        """
+        self.schedule()
+        jobs = list(reversed(self._all_jobs()))[:limit]
+        for job in jobs:
+            job['progress'] = self.progress(job['id'])
+        return jobs
+    
+    def log_tail(self, job_id: str, num_lines: int = 50) -> str:
+        """Last lines of the worker's output"""
+        path = os.path.join(self.job_dir(job_id), LOG_FILE)
+        if not os.path.exists(path):
+            return ""
+        with open(path, 'r', errors='replace') as f:
+            return ''.join(f.readlines()[-num_lines:])
+
+
+def _summarize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-friendly summary of ModelTrainer.train's result"""
+    return {
+        'model_path': result['model_path'],
+        'train_metrics': result['train_result'].metrics,
+        'val_results': result['val_results'],
+        'test_results': result['test_results']
+    }
+
+
+def _raise_cancelled(signum, frame):
+    raise JobCancelled()
+
+
+def run_job(job_dir: str):
+    """Worker entry point: run one training job and record its outcome"""
+    from ..data.loader import DataLoader
+    from ..models.trainer import ModelTrainer
+    from ..models.callbacks import ProgressCallback
+    
+    queue = JobQueue(root=os.path.dirname(os.path.abspath(job_dir)))
+    job_id = os.path.basename(os.path.abspath(job_dir))
+    job = queue.update(job_id, pid=os.getpid())
+    
+    signal.signal(signal.SIGTERM, _raise_cancelled)
+    config.update_from_dict(job['config'])
+    if job.get('cores'):
+        pin_to_cores(job['cores'])
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    outcome = {}
+    try:
+        params = dict(job['params'])
+        train_kwargs = params.pop('train')
+        if params.get('num_labels') is None:
+            params['num_labels'] = DataLoader().load_data(train_kwargs['train_file'])['label'].nunique()
+        
+        trainer = ModelTrainer(**params, callbacks=[ProgressCallback(os.path.join(job_dir, PROGRESS_FILE))])
+        result = trainer.train(**train_kwargs)
+        outcome = {'status': 'completed', 'result': _summarize_result(result)}
+        logger.info(f"Job {job_id} completed")
+    except JobCancelled:
+        outcome = {'status': 'cancelled'}
+        logger.info(f"Job {job_id} cancelled")
+    except Exception as e:
+        outcome = {'status': 'failed', 'error': f"{e}\n\n{traceback.format_exc(limit=5)}"}
+        logger.error(f"Job {job_id} failed: {e}")
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        queue.update(job_id, finished_at=time.time(), **outcome)
+        # Hand the freed slot to the next queued job
+        queue.schedule()
+
+
+if __name__ == "__main__":
+    run_job(sys.argv[1])
\ No newline at end of file
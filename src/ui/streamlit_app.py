@@ -14,10 +14,14 @@ import time
 from typing import Dict, List, Any
 import logging
 
-from ..models.trainer import ModelTrainer
 from ..models.predictor import ModelPredictor
+from ..models.evaluation import ChunkedEvaluation, PredictionCache
 from ..data.loader import DataLoader, create_sample_dataset
+from ..data.catalog import DatasetCatalog
 from ..utils.config import config
+from ..utils.cache import get_resource_cache
+from ..api.daemon import load_predictor
+from .jobs import JobQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -69,6 +73,12 @@ def main():
         ["Home", "Data Management", "Model Training", "Model Prediction", "API Testing", "Model Analysis"]
     )
     
+    cache_stats = get_resource_cache().stats()
+    st.sidebar.caption(
+        f"Shared model/data cache: {cache_stats['entries']} items, "
+        f"{cache_stats['memory_mb']:.0f}/{cache_stats['max_memory_mb']:.0f} MB"
+    )
+    
     # Route to different pages
     if page == "Home":
         show_home_page()
@@ -149,15 +159,13 @@ def show_data_management_page():
         if uploaded_file is not None:
             # Save uploaded file
             file_path = os.path.join(config.data.data_dir, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+            save_uploaded_file(uploaded_file, file_path)
             
             st.success(f"File uploaded successfully: {uploaded_file.name}")
             
             # Preview data
             try:
-                data_loader = DataLoader()
-                df = data_loader.load_data(file_path)
+                df = load_dataset_cached(file_path)
                 
                 st.subheader("Data Preview")
                 st.dataframe(df.head(10))
@@ -202,33 +210,70 @@ def show_data_management_page():
     
     with tab3:
         st.subheader("Available Datasets")
-        datasets = get_available_datasets()
+        catalog = DatasetCatalog()
+        rows = catalog.list_datasets()
         
-        if datasets:
-            for dataset in datasets:
-                with st.expander(f"📄 {dataset}"):
-                    file_path = os.path.join(config.data.data_dir, dataset)
-                    try:
-                        data_loader = DataLoader()
-                        df = data_loader.load_data(file_path)
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Samples", len(df))
-                        with col2:
-                            st.metric("Labels", df['label'].nunique())
-                        with col3:
-                            st.metric("File Size", f"{os.path.getsize(file_path) / 1024:.1f} KB")
-                        
-                        if st.button(f"Preview {dataset}", key=f"preview_{dataset}"):
-                            st.dataframe(df.head())
-                    
-                    except Exception as e:
-                        st.error(f"Error loading {dataset}: {e}")
+        if rows:
+            missing = [row['name'] for row in rows if not row['profiled']]
+            if missing and st.button(f"Compute statistics for {len(missing)} new or changed dataset(s)"):
+                with st.spinner("Profiling datasets..."):
+                    for name in missing:
+                        catalog.stats(name)
+                rows = catalog.list_datasets()
+            
+            summary = pd.DataFrame(rows)
+            summary['size_mb'] = summary['size_bytes'] / (1024 * 1024)
+            summary['modified'] = pd.to_datetime(summary['modified'], unit='s')
+            st.dataframe(summary[['name', 'num_rows', 'num_labels', 'duplicate_rate', 'mean_tokens',
+                                  'size_mb', 'modified', 'profiled']])
+            
+            selected = st.selectbox("Dataset", [row['name'] for row in rows])
+            show_dataset_details(catalog, selected)
         else:
             st.info("No datasets found. Upload or create a dataset to get started.")
 
 
+def show_dataset_details(catalog: DatasetCatalog, name: str):
+    """Statistics charts and a paginated preview of one catalogued dataset"""
+    try:
+        with st.spinner(f"Loading statistics for {name}..."):
+            stats = catalog.stats(name)
+    except Exception as e:
+        st.error(f"Error profiling {name}: {e}")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Samples", stats['num_rows'])
+    with col2:
+        st.metric("Labels", stats['num_labels'])
+    with col3:
+        st.metric("Duplicate Rate", f"{stats['duplicate_rate']:.1%}")
+    with col4:
+        st.metric("Mean Tokens", f"{stats['token_lengths']['mean_length']:.1f}")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        labels = stats['label_distribution']
+        fig = px.bar(x=list(labels.keys()), y=list(labels.values()), title="Distribution of Labels")
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        histogram = stats['token_lengths']['histogram']
+        fig = px.bar(x=histogram['bin_edges'][:-1], y=histogram['counts'],
+                     title=f"Token Lengths ({stats['token_lengths']['tokenizer']}, "
+                           f"{stats['token_lengths']['num_sampled']} sampled)")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Rows per page", [10, 20, 50, 100], index=1, key=f"page_size_{name}")
+    with col2:
+        num_pages = catalog.num_pages(name, page_size)
+        page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, value=1,
+                               key=f"page_{name}")
+    st.dataframe(catalog.preview(name, page=page - 1, page_size=page_size))
+
+
 def show_training_page():
     """Display the model training page"""
     st.markdown('<h2 class="section-header">🏋️ Model Training</h2>', unsafe_allow_html=True)
@@ -259,8 +304,25 @@ def show_training_page():
         with col2:
             num_epochs = st.number_input("Number of Epochs", min_value=1, max_value=20, value=3)
             batch_size = st.number_input("Batch Size", min_value=1, max_value=64, value=16)
+            auto_batch_size = st.checkbox(
+                "Auto Batch Size",
+                help="Probe the largest micro-batch that fits in memory and accumulate gradients up to the batch size"
+            )
             learning_rate = st.number_input("Learning Rate", min_value=1e-6, max_value=1e-3, value=2e-5, format="%.2e")
             max_length = st.number_input("Max Sequence Length", min_value=64, max_value=512, value=512)
+            auto_max_length = st.checkbox(
+                "Auto Max Length",
+                help="Use the smallest length covering 99% of training texts (capped by the value above)"
+            )
+            time_budget = st.number_input(
+                "Time Budget (minutes)", min_value=0.0, value=0.0, step=5.0,
+                help="Fit the training steps, learning-rate schedule and evaluations to this wall-clock budget "
+                     "instead of the number of epochs (0 disables)"
+            )
+            sample_budget = st.number_input(
+                "Sample Budget", min_value=0, value=0, step=1000,
+                help="Stop after this many training samples instead of the number of epochs (0 disables)"
+            )
     
     # Training controls
     col1, col2, col3 = st.columns(3)
@@ -279,63 +341,94 @@ def show_training_page():
                 shutil.rmtree(output_dir)
                 st.success("Output directory cleared")
     
-    # Training execution
+    # Queue the run; a background worker trains while the page stays responsive
+    queue = JobQueue()
     if start_training:
         if not dataset_file:
             st.error("Please select a dataset for training")
-            return
-        
-        dataset_path = os.path.join(config.data.data_dir, dataset_file)
-        
-        # Initialize trainer
-        with st.spinner("Initializing trainer..."):
-            try:
-                # Load data to determine number of labels
-                data_loader = DataLoader()
-                df = data_loader.load_data(dataset_path)
-                num_labels = df['label'].nunique()
-                
-                trainer = ModelTrainer(
-                    model_name=model_name,
-                    num_labels=num_labels,
-                    output_dir=output_dir
-                )
-                
-                st.success("Trainer initialized successfully!")
-                
-            except Exception as e:
-                st.error(f"Error initializing trainer: {e}")
-                return
-        
-        # Start training
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        else:
+            job_id = queue.submit({
+                'model_name': model_name,
+                'num_labels': None,  # counted from the dataset by the worker
+                'output_dir': output_dir,
+                'train': {
+                    'train_file': os.path.join(config.data.data_dir, dataset_file),
+                    'num_epochs': num_epochs,
+                    'batch_size': batch_size,
+                    'learning_rate': learning_rate,
+                    'max_length': max_length,
+                    'auto_max_length': auto_max_length,
+                    'auto_batch_size': auto_batch_size,
+                    'time_budget': time_budget * 60 if time_budget else None,
+                    'sample_budget': int(sample_budget) or None
+                }
+            })
+            st.success(f"Training job {job_id} queued")
+    
+    show_training_jobs(queue)
+
+
+def show_training_jobs(queue: JobQueue):
+    """List training jobs with live progress, cancellation and history"""
+    st.subheader("Training Jobs")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.button("🔄 Refresh")
+    with col2:
+        auto_refresh = st.checkbox("Auto-refresh while jobs are active", value=True)
+    
+    jobs = queue.list_jobs(limit=50)
+    if not jobs:
+        st.info("No training jobs yet.")
+        return
+    
+    running = sum(job['status'] == 'running' for job in jobs)
+    queued = sum(job['status'] == 'queued' for job in jobs)
+    st.caption(f"{running} running, {queued} queued; up to {queue.max_concurrent} at a time")
+    
+    for job in jobs:
+        progress = job.get('progress') or {}
+        train_file = os.path.basename(job['params']['train'].get('train_file', ''))
+        title = f"{job['name']} — {job['status']} ({train_file}, {job['id']})"
         
-        try:
-            status_text.text("Starting training...")
+        with st.expander(title, expanded=job['status'] in ('running', 'queued')):
+            if job['status'] == 'running':
+                if progress.get('max_steps'):
+                    st.progress(min(progress['fraction'], 1.0))
+                    eta = progress.get('eta_seconds')
+                    st.text(
+                        f"Step {progress['step']}/{progress['max_steps']}, epoch {progress.get('epoch') or 0:.2f}"
+                        + (f", loss {progress['loss']:.4f}" if 'loss' in progress else "")
+                        + (f", ETA {eta / 60:.1f} min" if eta is not None else "")
+                    )
+                else:
+                    st.text("Preparing data and model...")
+                if progress.get('eval_metrics'):
+                    st.json(progress['eval_metrics'])
             
-            # This is a simplified progress simulation
-            # In a real implementation, you'd want to use callbacks to update progress
-            for i in range(100):
-                time.sleep(0.1)  # Simulate training time
-                progress_bar.progress(i + 1)
-                status_text.text(f"Training... Step {i + 1}/100")
+            if job['status'] in ('running', 'queued'):
+                if st.button("⏹️ Cancel", key=f"cancel_{job['id']}", disabled=job['cancel_requested']):
+                    queue.cancel(job['id'])
+                    st.warning(f"Cancelling job {job['id']}")
             
-            # Actually start training
-            result = trainer.train(
-                train_file=dataset_path,
-                num_epochs=num_epochs,
-                batch_size=batch_size,
-                learning_rate=learning_rate,
-                max_length=max_length
-            )
+            if job['started_at']:
+                end = job['finished_at'] or time.time()
+                st.caption(f"Ran for {(end - job['started_at']) / 60:.1f} min on cores {job['cores']}")
             
-            st.success("Training completed successfully!")
-            st.json(result)
+            if job['status'] == 'completed' and job['result']:
+                st.success(f"Model saved to {job['result']['model_path']}")
+                st.json(job['result'])
+            elif job['status'] == 'failed':
+                st.error(job['error'])
             
-        except Exception as e:
-            st.error(f"Training failed: {e}")
-            logger.error(f"Training error: {e}")
+            if job['status'] != 'queued' and st.checkbox("Show worker log", key=f"log_{job['id']}"):
+                st.code(queue.log_tail(job['id']))
+    
+    if auto_refresh and (running or queued):
+        time.sleep(2)
+        rerun = getattr(st, 'rerun', None) or st.experimental_rerun
+        rerun()
 
 
 def show_prediction_page():
@@ -356,7 +449,7 @@ def show_prediction_page():
     if st.button("Load Model"):
         try:
             with st.spinner("Loading model..."):
-                predictor = ModelPredictor(model_path)
+                predictor = load_predictor_cached(model_path)
                 st.session_state.predictor = predictor
                 st.success("Model loaded successfully!")
                 
@@ -581,7 +674,7 @@ def show_analysis_page():
     
     # Load model info
     try:
-        predictor = ModelPredictor(model_path)
+        predictor = load_predictor_cached(model_path)
         model_info = predictor.get_model_info()
         
         # Model information
@@ -618,70 +711,161 @@ def show_analysis_page():
             help="Upload a dataset to evaluate the model"
         )
         
+        chunk_size = st.number_input("Rows per update", min_value=100, max_value=100000, value=2000, step=500)
+        
         if test_file is not None:
-            # Save and evaluate
-            test_path = os.path.join(config.data.data_dir, f"temp_{test_file.name}")
-            with open(test_path, "wb") as f:
-                f.write(test_file.getbuffer())
-            
-            if st.button("Evaluate Model"):
-                try:
-                    with st.spinner("Evaluating model..."):
-                        # Load test data
-                        data_loader = DataLoader()
-                        test_df = data_loader.load_data(test_path)
-                        
-                        # Make predictions
-                        texts = test_df['text'].tolist()
-                        true_labels = test_df['label'].tolist()
-                        
-                        results = predictor.predict_batch(texts)
-                        predicted_labels = [r['predicted_label'] for r in results]
-                        
-                        # Calculate metrics
-                        from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-                        
-                        accuracy = accuracy_score(true_labels, predicted_labels)
-                        report = classification_report(true_labels, predicted_labels, output_dict=True)
-                        cm = confusion_matrix(true_labels, predicted_labels)
-                        
-                        # Display metrics
-                        st.metric("Accuracy", f"{accuracy:.2%}")
-                        
-                        # Classification report
-                        st.subheader("Classification Report")
-                        report_df = pd.DataFrame(report).transpose()
-                        st.dataframe(report_df)
-                        
-                        # Confusion matrix
-                        st.subheader("Confusion Matrix")
-                        fig = px.imshow(
-                            cm,
-                            text_auto=True,
-                            aspect="auto",
-                            title="Confusion Matrix"
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Prediction distribution
-                        st.subheader("Prediction Distribution")
-                        pred_counts = pd.Series(predicted_labels).value_counts()
-                        fig = px.pie(values=pred_counts.values, names=pred_counts.index, 
-                                   title="Distribution of Predictions")
-                        st.plotly_chart(fig, use_container_width=True)
-                
-                except Exception as e:
-                    st.error(f"Evaluation failed: {e}")
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(test_path):
-                        os.remove(test_path)
+            # Uploads for evaluation are kept out of the data directory (and the dataset catalog)
+            upload_dir = os.path.join(config.data.cache_dir, "uploads")
+            os.makedirs(upload_dir, exist_ok=True)
+            test_path = os.path.join(upload_dir, test_file.name)
+            save_uploaded_file(test_file, test_path)
+            show_evaluation(predictor, model_path, test_path, test_file.size, int(chunk_size))
     
     except Exception as e:
         st.error(f"Error loading model: {e}")
 
 
+def show_evaluation(predictor: ModelPredictor, model_path: str, test_path: str, file_size: int, chunk_size: int):
+    """
+    Run an evaluation chunk by chunk with live metrics
+    
+    The evaluation lives in the session, so pressing Stop (which reruns the
+    script and so interrupts the loop between chunks) keeps the partial results
+    and Resume continues from the next chunk. Chunk logits go to the prediction
+    cache, so evaluating the same model and data again skips inference.
+    """
+    key = (model_path, test_path, file_size, chunk_size)
+    evaluation = st.session_state.get('evaluation')
+    if evaluation is not None and st.session_state.get('evaluation_key') != key:
+        evaluation = None
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Evaluate Model"):
+            evaluation = ChunkedEvaluation(predictor, test_path, chunk_size=chunk_size,
+                                           cache=PredictionCache(config.data.cache_dir))
+            st.session_state.evaluation = evaluation
+            st.session_state.evaluation_key = key
+            st.session_state.evaluation_running = True
+    with col2:
+        controls = st.empty()
+        if evaluation is not None and not evaluation.finished:
+            if st.session_state.get('evaluation_running'):
+                if controls.button("Stop Evaluation"):
+                    st.session_state.evaluation_running = False
+            elif controls.button("Resume Evaluation"):
+                st.session_state.evaluation_running = True
+    
+    if evaluation is None:
+        return
+    
+    # Rows are estimated from the line count of the upload; only used for the progress bar
+    with open(test_path, 'rb') as f:
+        estimated_rows = max(sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1, 1)
+    progress_bar = st.progress(0.0)
+    status = st.empty()
+    results_area = st.empty()
+    
+    def render():
+        progress = evaluation.progress()
+        progress_bar.progress(1.0 if progress['finished'] else min(progress['rows_read'] / estimated_rows, 0.99))
+        state = "Finished" if progress['finished'] else (
+            "Evaluating" if st.session_state.get('evaluation_running') else "Stopped")
+        status.text(f"{state}: {progress['num_samples']} samples in {progress['seconds']:.1f}s "
+                    f"({progress['cached_chunks']}/{progress['chunks']} chunks from the prediction cache)")
+        if progress['num_samples']:
+            with results_area.container():
+                show_evaluation_results(evaluation.results())
+    
+    try:
+        if st.session_state.get('evaluation_running') and not evaluation.finished:
+            last_render = 0.0
+            for _ in evaluation.run():
+                # Redrawing the charts costs more than a small chunk; refresh at most twice a second
+                if time.perf_counter() - last_render >= 0.5:
+                    render()
+                    last_render = time.perf_counter()
+            st.session_state.evaluation_running = False
+            controls.empty()
+        render()
+    except Exception as e:
+        st.session_state.evaluation_running = False
+        st.error(f"Evaluation failed: {e}")
+
+
+def show_evaluation_results(results: Dict[str, Any]):
+    """Metrics, classification report and charts of (possibly partial) evaluation results"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Accuracy", f"{results['accuracy']:.2%}")
+    with col2:
+        st.metric("Macro F1", f"{results['f1_macro']:.3f}")
+    with col3:
+        st.metric("Calibration Error (ECE)", f"{results['calibration']['ece']:.3f}")
+    
+    if results['skipped_unknown_labels']:
+        st.warning(f"Skipped samples with labels unknown to the model: "
+                   f"{results['skipped_unknown_labels']}")
+    
+    # Classification report
+    st.subheader("Classification Report")
+    report_df = pd.DataFrame(results['per_class']).transpose()
+    st.dataframe(report_df)
+    
+    # Confusion matrix
+    st.subheader("Confusion Matrix")
+    fig = px.imshow(
+        results['confusion_matrix'],
+        x=results['labels'],
+        y=results['labels'],
+        labels={'x': 'Predicted', 'y': 'True'},
+        text_auto=True,
+        aspect="auto",
+        title="Confusion Matrix"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Prediction distribution
+    st.subheader("Prediction Distribution")
+    pred_counts = pd.Series(
+        pd.DataFrame(results['confusion_matrix']).sum(axis=0).to_numpy(),
+        index=results['labels']
+    )
+    fig = px.pie(values=pred_counts.values, names=pred_counts.index, 
+               title="Distribution of Predictions")
+    st.plotly_chart(fig, use_container_width=True)
+
+
 # Helper functions
+def save_uploaded_file(uploaded_file, file_path: str):
+    """Write an upload, leaving an identical file (and its cached parse) untouched on reruns"""
+    content = bytes(uploaded_file.getbuffer())
+    if os.path.exists(file_path) and os.path.getsize(file_path) == len(content):
+        with open(file_path, "rb") as f:
+            if f.read() == content:
+                return
+    with open(file_path, "wb") as f:
+        f.write(content)
+
+
+def load_predictor_cached(model_path: str) -> ModelPredictor:
+    """
+    Predictor shared by all sessions; reloaded only when the model files change
+    
+    Served by the local inference daemon when it is running, so the UI does
+    not hold its own copy of models the CLI is also using.
+    """
+    return load_predictor(
+        model_path,
+        fallback=lambda path: get_resource_cache().get_or_load('predictor', path, ModelPredictor)
+    )
+
+
+def load_dataset_cached(file_path: str) -> pd.DataFrame:
+    """Parsed and cleaned dataset shared by all sessions (treat as read-only)"""
+    return get_resource_cache().get_or_load('dataset', file_path, lambda path: DataLoader().load_data(path))
+
+
 def get_available_models() -> List[str]:
     """Get list of available trained models"""
     models_dir = config.data.models_dir
@@ -735,9 +919,40 @@ def show_training_history(output_dir: str):
         
         st.subheader("Training History")
         st.json(history)
+        
+        # Throughput time series recorded by ThroughputCallback
+        throughput_path = os.path.join(output_dir, "throughput.jsonl")
+        if os.path.exists(throughput_path):
+            throughput_df = pd.read_json(throughput_path, lines=True)
+            if not throughput_df.empty:
+                show_throughput_charts(throughput_df)
     else:
         st.info("No training history found for this model.")
 
 
+def show_throughput_charts(throughput_df: pd.DataFrame):
+    """Plot training throughput telemetry over steps"""
+    st.subheader("Training Throughput")
+    
+    panels = [
+        ("samples_per_second", "Samples / sec"),
+        ("tokens_per_second", "Tokens / sec"),
+        ("padding_ratio", "Padding Ratio"),
+        ("dataloader_wait_fraction", "Dataloader Wait Fraction"),
+        ("optimizer_step_seconds", "Optimizer Step (s)"),
+        ("peak_rss_mb", "Peak RSS (MB)")
+    ]
+    panels = [(column, title) for column, title in panels if column in throughput_df.columns]
+    
+    fig = make_subplots(rows=(len(panels) + 1) // 2, cols=2, subplot_titles=[title for _, title in panels])
+    for i, (column, title) in enumerate(panels):
+        fig.add_trace(
+            go.Scatter(x=throughput_df['step'], y=throughput_df[column], mode='lines+markers', name=title),
+            row=i // 2 + 1, col=i % 2 + 1
+        )
+    fig.update_layout(height=300 * ((len(panels) + 1) // 2), showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
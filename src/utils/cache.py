@@ -0,0 +1,174 @@
+"""
+Process-wide cache of loaded models and datasets
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from itertools import chain
+import pandas as pd
+import torch.nn as nn
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+import logging
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Files whose changes mean a model directory holds a different model
+MODEL_FILE_EXTENSIONS = ('.safetensors', '.bin', '.pt', '.json', '.txt', '.model')
+
+
+def path_stamp(path: str) -> Tuple[int, int]:
+    """
+    Modification stamp of a file or model directory
+    
+    For a directory this is the newest mtime and total size of its top-level
+    weight, config and vocabulary files, so logs appended during training do
+    not invalidate it.
+    """
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    
+    newest, total = os.stat(path).st_mtime_ns, 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(MODEL_FILE_EXTENSIONS):
+                stat = entry.stat()
+                newest, total = max(newest, stat.st_mtime_ns), total + stat.st_size
+    return newest, total
+
+
+def estimate_size_mb(obj: Any) -> float:
+    """Approximate memory held by a DataFrame, module, or object holding modules"""
+    if isinstance(obj, pd.DataFrame):
+        return float(obj.memory_usage(deep=True).sum()) / (1024 * 1024)
+    
+    modules = [obj] if isinstance(obj, nn.Module) else [
+        value for value in getattr(obj, '__dict__', {}).values() if isinstance(value, nn.Module)
+    ]
+    if not modules:
+        return sys.getsizeof(obj) / (1024 * 1024)
+    
+    # Count tensors shared between modules (e.g. a shared base encoder) once
+    seen, total = set(), 0
+    for module in modules:
+        for tensor in chain(module.parameters(), module.buffers()):
+            if tensor.data_ptr() not in seen:
+                seen.add(tensor.data_ptr())
+                total += tensor.numel() * tensor.element_size()
+    return total / (1024 * 1024)
+
+
+class ResourceCache:
+    """
+    Thread-safe LRU cache of loaded resources bounded by memory
+    
+    Entries are keyed by kind, absolute path and the path's modification stamp,
+    so an edited file or retrained model is reloaded on the next request and
+    its stale entry is dropped. When the estimated total size exceeds
+    max_memory_mb, least recently used entries are evicted (the newest entry is
+    always kept). Each key is loaded by one thread at a time, so concurrent
+    sessions asking for the same model share a single load.
+    """
+    
+    def __init__(self, max_memory_mb: float, sizeof: Callable[[Any], float] = estimate_size_mb):
+        self.max_memory_mb = max_memory_mb
+        self.sizeof = sizeof
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self.memory_mb = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get_or_load(self, kind: str, path: str, loader: Callable[[str], Any], *options: Hashable) -> Any:
+        """
+        Return the cached resource for a path, loading it on a miss
+        
+        Args:
+            kind: Resource kind (e.g. 'predictor', 'dataset'); part of the key
+            path: File or directory the resource is loaded from
+            loader: Called with path to load the resource
+            *options: Extra hashable key parts (loader settings)
+        
+        Returns:
+            The shared resource; callers must not modify it
+        """
+        path = os.path.abspath(path)
+        base_key = (kind, path, options)
+        key = base_key + (path_stamp(path),)
+        
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            load_lock = self._load_locks.setdefault(base_key, threading.Lock())
+        
+        with load_lock:
+            # Another session may have loaded it while this one waited
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+            
+            value = loader(path)
+            size_mb = self.sizeof(value)
+            with self._lock:
+                self.misses += 1
+                for stale in [k for k in self._entries if k[:3] == base_key]:
+                    self._remove(stale)
+                self._entries[key] = (value, size_mb)
+                self.memory_mb += size_mb
+                self._evict()
+            logger.info(f"Cached {kind} {path} ({size_mb:.1f} MB; cache {self.memory_mb:.0f}/{self.max_memory_mb:.0f} MB)")
+            return value
+    
+    def _remove(self, key: Hashable):
+        _, size_mb = self._entries.pop(key)
+        self.memory_mb -= size_mb
+    
+    def _evict(self):
+        while self.memory_mb > self.max_memory_mb and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            logger.info(f"Evicted {key[0]} {key[1]} from the resource cache")
+        if self.memory_mb > self.max_memory_mb:
+            logger.warning(f"Cached resource alone exceeds the cache budget of {self.max_memory_mb:.0f} MB")
+    
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_mb = 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, memory use and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'memory_mb': self.memory_mb,
+                'max_memory_mb': self.max_memory_mb,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+_shared_cache: Optional[ResourceCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_resource_cache() -> ResourceCache:
+    """The process-wide cache (shared by all Streamlit sessions of a server)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResourceCache(config.data.resource_cache_mb)
+        return _shared_cache
\ No newline at end of file
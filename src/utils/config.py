@@ -13,15 +13,38 @@ class TrainingConfig:
     model_name: str = "bert-base-uncased"
     num_epochs: int = 3
     batch_size: int = 16
+    micro_batch_size: Optional[int] = None  # None trains with the full batch per step
+    bf16: bool = False
+    gradient_checkpointing: bool = False
+    auto_batch_size: bool = False
+    lora_rank: Optional[int] = None  # None/0 trains the full model
+    lora_alpha: float = 16.0
+    lora_dropout: float = 0.1
+    lora_target_modules: tuple = ("query", "value", "q_lin", "v_lin", "q_proj", "v_proj")
+    memory_limit_mb: Optional[float] = None
     learning_rate: float = 2e-5
     weight_decay: float = 0.01
     warmup_steps: int = 500
     max_length: int = 512
+    auto_max_length: bool = False
+    max_length_percentile: float = 99.0
     train_split: float = 0.8
     val_split: float = 0.1
     test_split: float = 0.1
+    split_method: str = "random"  # "random" or "hash" (stable across appends)
+    split_stratify: bool = False  # Exact per-label proportions for hash splits, but appends can move rows
+    replay_fraction: float = 0.0  # Old rows replayed per new row in incremental training
     save_steps: int = 500
     eval_steps: int = 500
+    save_total_limit: int = 3
+    early_stopping_patience: int = 3
+    async_checkpointing: bool = False  # Write checkpoints on a background thread
+    weights_only_checkpoints: bool = False  # Skip optimizer/scheduler/RNG state (cannot resume exactly)
+    async_evaluation: bool = False  # Evaluate saved checkpoints in a separate process
+    eval_cores: int = 1  # Cores reserved for the evaluation process
+    time_budget: Optional[float] = None  # Wall-clock training budget in seconds (replaces num_epochs)
+    sample_budget: Optional[int] = None  # Number of training samples to process (replaces num_epochs)
+    budget_evaluations: int = 5  # Evaluations/checkpoints spread over a budgeted run
     logging_steps: int = 100
     seed: int = 42
 
@@ -34,6 +57,9 @@ class APIConfig:
     debug: bool = False
     model_path: str = "./models/finetuned_model"
     max_text_length: int = 512
+    daemon_socket: str = "./cache/inference.sock"  # Unix socket of the local inference daemon
+    allow_profiling: bool = False  # Honour /debug/profile, /debug/stacks and the X-Profile request header
+    stack_sampling_hz: float = 0.0  # Rate of the always-on stack sampler (0 = off)
 
 
 @dataclass
@@ -44,6 +70,8 @@ class DataConfig:
     logs_dir: str = "./logs"
     cache_dir: str = "./cache"
     supported_formats: tuple = ("csv", "json")
+    near_duplicate_threshold: Optional[float] = None
+    resource_cache_mb: float = 2048.0  # Memory bound of the UI's shared model/dataset cache
 
 
 class Config:
@@ -0,0 +1,48 @@
+"""
+CPU core allocation helpers
+"""
+
+import os
+import torch
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> List[int]:
+    """Cores the current process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(num_slices: int, cores_per_slice: Optional[int] = None) -> List[List[int]]:
+    """
+    Split the available cores into one slice per process
+    
+    Args:
+        num_slices: Number of slices
+        cores_per_slice: Cores in each slice (defaults to an even share)
+    
+    Returns:
+        List of core-id lists; slices wrap around (and share cores) if more
+        cores were requested than exist
+    """
+    cores = available_cores()
+    per_slice = cores_per_slice or max(1, len(cores) // num_slices)
+    return [
+        [cores[(s * per_slice + i) % len(cores)] for i in range(per_slice)]
+        for s in range(num_slices)
+    ]
+
+
+def pin_to_cores(cores: List[int]):
+    """Pin the current process to a set of cores and size torch's thread pool to match"""
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError as e:
+            logger.warning(f"Could not pin process {os.getpid()} to cores {cores}: {e}")
+    os.environ['OMP_NUM_THREADS'] = str(len(cores))
+    torch.set_num_threads(len(cores))
\ No newline at end of file
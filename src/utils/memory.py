@@ -0,0 +1,73 @@
+"""
+Process memory helpers
+"""
+
+import os
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def _read_status_kb(field: str) -> Optional[float]:
+    """Read a kB field (e.g. VmRSS, VmHWM) from /proc/self/status"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the current process in MB"""
+    peak_kb = _read_status_kb('VmHWM')
+    if peak_kb is not None:
+        return peak_kb / 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if os.uname().sysname == 'Darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def get_current_rss_mb() -> Optional[float]:
+    """Current resident set size of the current process in MB"""
+    rss_kb = _read_status_kb('VmRSS')
+    return rss_kb / 1024 if rss_kb is not None else None
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak RSS high-water mark (Linux only)
+    
+    Returns:
+        True if the high-water mark was reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def get_available_memory_mb() -> Optional[float]:
+    """Memory available to new allocations in MB, as reported by the OS"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return float(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
\ No newline at end of file
@@ -5,14 +5,223 @@ Evaluation metrics and visualization utilities
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.metrics import (
-    accuracy_score, precision_recall_fscore_support,
-    confusion_matrix, classification_report
-)
-from typing import List, Dict, Any, Tuple
+from scipy import stats as scipy_stats
+from sklearn.metrics import confusion_matrix
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Union, Iterator
 import pandas as pd
 
 
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise division that yields 0 where the denominator is 0 (sklearn's zero_division default)"""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+class MetricsAccumulator:
+    """
+    Classification metrics accumulated in one integer confusion matrix
+    
+    Batches are added with update() and shards (other processes, other files)
+    with merge(); memory stays O(num_labels^2) however many samples are seen.
+    Every metric is derived from the matrix with the same formulas as sklearn,
+    so results match accuracy_score, precision_recall_fscore_support and
+    classification_report on the concatenated labels.
+    """
+    
+    def __init__(self, num_labels: int, label_names: Optional[List[str]] = None):
+        self.num_labels = num_labels
+        self.label_names = list(label_names) if label_names else [str(i) for i in range(num_labels)]
+        self.confusion = np.zeros((num_labels, num_labels), dtype=np.int64)
+    
+    @classmethod
+    def from_confusion_matrix(cls, confusion: np.ndarray, label_names: Optional[List[str]] = None) -> 'MetricsAccumulator':
+        """Rebuild an accumulator from a saved confusion matrix (rows: true, columns: predicted)"""
+        confusion = np.asarray(confusion, dtype=np.int64)
+        accumulator = cls(confusion.shape[0], label_names)
+        accumulator.confusion += confusion
+        return accumulator
+    
+    @property
+    def num_samples(self) -> int:
+        return int(self.confusion.sum())
+    
+    def update(self, y_true: Sequence[int], y_pred: Sequence[int]) -> 'MetricsAccumulator':
+        """
+        Add a batch of label ids
+        
+        Args:
+            y_true: True label ids in [0, num_labels)
+            y_pred: Predicted label ids in [0, num_labels)
+        
+        Returns:
+            The accumulator
+        """
+        y_true = np.asarray(y_true, dtype=np.int64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.int64).ravel()
+        if len(y_true) != len(y_pred):
+            raise ValueError(f"y_true and y_pred differ in length ({len(y_true)} vs {len(y_pred)})")
+        if len(y_true) and (min(y_true.min(), y_pred.min()) < 0 or max(y_true.max(), y_pred.max()) >= self.num_labels):
+            raise ValueError(f"Label ids must be in [0, {self.num_labels})")
+        
+        self.confusion += np.bincount(
+            y_true * self.num_labels + y_pred, minlength=self.num_labels ** 2
+        ).reshape(self.num_labels, self.num_labels)
+        return self
+    
+    def merge(self, other: 'MetricsAccumulator') -> 'MetricsAccumulator':
+        """Add the counts of another accumulator over the same labels"""
+        if other.confusion.shape != self.confusion.shape:
+            raise ValueError(f"Cannot merge accumulators over {other.num_labels} and {self.num_labels} labels")
+        self.confusion += other.confusion
+        return self
+    
+    def present_labels(self) -> np.ndarray:
+        """Label ids seen as a true or predicted label (sklearn's default label set)"""
+        return np.flatnonzero(self.confusion.sum(axis=0) + self.confusion.sum(axis=1))
+    
+    def per_class(self, labels: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+        """
+        Per-class precision, recall, F1 and support
+        
+        Args:
+            labels: Label ids to report (defaults to the labels present)
+        
+        Returns:
+            Dictionary of arrays aligned with labels
+        """
+        labels = self.present_labels() if labels is None else np.asarray(labels, dtype=np.int64)
+        true_positives = np.diag(self.confusion)[labels]
+        predicted = self.confusion.sum(axis=0)[labels]
+        support = self.confusion.sum(axis=1)[labels]
+        
+        return {
+            'labels': labels,
+            'precision': _safe_divide(true_positives, predicted),
+            'recall': _safe_divide(true_positives, support),
+            'f1': _safe_divide(2.0 * true_positives, support.astype(np.float64) + predicted),
+            'support': support,
+            'true_positives': true_positives,
+            'predicted': predicted
+        }
+    
+    @staticmethod
+    def _average(values: np.ndarray, weights: Optional[np.ndarray] = None) -> float:
+        if len(values) == 0 or (weights is not None and weights.sum() == 0):
+            return 0.0
+        return float(np.average(values, weights=weights))
+    
+    def averages(self, labels: Optional[Sequence[int]] = None) -> Dict[str, Dict[str, float]]:
+        """Micro, macro and support-weighted precision, recall and F1"""
+        stats = self.per_class(labels)
+        tp, predicted, support = stats['true_positives'].sum(), stats['predicted'].sum(), stats['support'].sum()
+        micro_precision = float(_safe_divide(tp, predicted))
+        micro_recall = float(_safe_divide(tp, support))
+        
+        return {
+            'micro': {
+                'precision': micro_precision,
+                'recall': micro_recall,
+                'f1': float(_safe_divide(2.0 * tp, float(support) + predicted))
+            },
+            'macro': {
+                name: self._average(stats[name]) for name in ('precision', 'recall', 'f1')
+            },
+            'weighted': {
+                name: self._average(stats[name], stats['support']) for name in ('precision', 'recall', 'f1')
+            }
+        }
+    
+    def accuracy(self) -> float:
+        total = self.confusion.sum()
+        return float(np.trace(self.confusion) / total) if total else 0.0
+    
+    def compute(self, labels: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """
+        All metrics in MetricsCalculator.calculate_metrics' format
+        
+        Args:
+            labels: Label ids to report (defaults to the labels present)
+        
+        Returns:
+            Dictionary containing various metrics
+        """
+        labels = self.present_labels() if labels is None else np.asarray(labels, dtype=np.int64)
+        stats = self.per_class(labels)
+        weighted = self.averages(labels)['weighted']
+        
+        return {
+            'accuracy': self.accuracy(),
+            'precision': weighted['precision'],
+            'recall': weighted['recall'],
+            'f1_score': weighted['f1'],
+            'precision_per_class': stats['precision'].tolist(),
+            'recall_per_class': stats['recall'].tolist(),
+            'f1_per_class': stats['f1'].tolist(),
+            'confusion_matrix': self.confusion[np.ix_(labels, labels)].tolist(),
+            'classification_report': self.classification_report(labels, output_dict=True)
+        }
+    
+    def bootstrap(self, num_resamples: int = 1000, confidence: float = 0.95,
+                  labels: Optional[Sequence[int]] = None, seed: int = 42) -> Dict[str, Any]:
+        """Bootstrap confidence intervals from the accumulated counts (see bootstrap_metrics)"""
+        return bootstrap_metrics(self.confusion, num_resamples, confidence, labels, self.label_names, seed)
+    
+    def classification_report(self, labels: Optional[Sequence[int]] = None,
+                              digits: int = 2, output_dict: bool = False) -> Union[str, Dict[str, Any]]:
+        """
+        Same output as sklearn.metrics.classification_report
+        
+        Args:
+            labels: Label ids to report (defaults to the labels present)
+            digits: Digits of the text report
+            output_dict: Return a dictionary instead of text
+        
+        Returns:
+            Report text or dictionary
+        """
+        labels = self.present_labels() if labels is None else np.asarray(labels, dtype=np.int64)
+        stats = self.per_class(labels)
+        averages = self.averages(labels)
+        names = [self.label_names[i] for i in labels]
+        total_support = int(stats['support'].sum())
+        
+        # sklearn labels the micro average "accuracy" when every seen label is reported
+        micro_is_accuracy = set(self.present_labels().tolist()) <= set(labels.tolist())
+        
+        headers = ["precision", "recall", "f1-score", "support"]
+        rows = [
+            (name, stats['precision'][i], stats['recall'][i], stats['f1'][i], int(stats['support'][i]))
+            for i, name in enumerate(names)
+        ]
+        average_rows = [
+            ("accuracy" if average == 'micro' and micro_is_accuracy else f"{average} avg",
+             averages[average]['precision'], averages[average]['recall'], averages[average]['f1'], total_support)
+            for average in ('micro', 'macro', 'weighted')
+        ]
+        
+        if output_dict:
+            report = {row[0]: dict(zip(headers, [float(v) for v in row[1:]])) for row in rows + average_rows}
+            if "accuracy" in report:
+                report["accuracy"] = report["accuracy"]["precision"]
+            return report
+        
+        width = max(max((len(name) for name in names), default=0), len("weighted avg"), digits)
+        report = ("{:>{width}s} " + " {:>9}" * len(headers)).format("", *headers, width=width) + "\n\n"
+        row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+        for row in rows:
+            report += row_fmt.format(*row, width=width, digits=digits)
+        report += "\n"
+        for row in average_rows:
+            if row[0] == "accuracy":
+                report += ("{:>{width}s} " + " {:>9.{digits}}" * 2 + " {:>9.{digits}f}" + " {:>9}\n").format(
+                    row[0], "", "", row[3], row[4], width=width, digits=digits
+                )
+            else:
+                report += row_fmt.format(*row, width=width, digits=digits)
+        return report
+
+
 class MetricsCalculator:
     """Calculate and visualize model evaluation metrics"""
     
@@ -30,37 +239,27 @@ class MetricsCalculator:
         Returns:
             Dictionary containing various metrics
         """
-        # Basic metrics
-        accuracy = accuracy_score(y_true, y_pred)
-        precision, recall, f1, support = precision_recall_fscore_support(
-            y_true, y_pred, average='weighted'
-        )
-        
-        # Per-class metrics
-        precision_per_class, recall_per_class, f1_per_class, _ = precision_recall_fscore_support(
-            y_true, y_pred, average=None
-        )
+        return self.accumulate(y_true, y_pred).compute()
+    
+    def accumulate(self, y_true: List[int], y_pred: List[int]) -> MetricsAccumulator:
+        """
+        Count labels into a MetricsAccumulator over the labels seen (sklearn's default label set)
         
-        # Confusion matrix
-        cm = confusion_matrix(y_true, y_pred)
+        Args:
+            y_true: True labels
+            y_pred: Predicted labels
         
-        metrics = {
-            'accuracy': accuracy,
-            'precision': precision,
-            'recall': recall,
-            'f1_score': f1,
-            'precision_per_class': precision_per_class.tolist(),
-            'recall_per_class': recall_per_class.tolist(),
-            'f1_per_class': f1_per_class.tolist(),
-            'confusion_matrix': cm.tolist(),
-            'classification_report': classification_report(
-                y_true, y_pred, 
-                target_names=self.label_names if self.label_names else None,
-                output_dict=True
-            )
-        }
+        Returns:
+            MetricsAccumulator
+        """
+        labels, encoded = np.unique(np.concatenate([np.asarray(y_true), np.asarray(y_pred)]), return_inverse=True)
+        if self.label_names and np.issubdtype(labels.dtype, np.integer) and labels.max() < len(self.label_names):
+            label_names = [self.label_names[label] for label in labels]
+        else:
+            label_names = [str(label) for label in labels]
         
-        return metrics
+        accumulator = MetricsAccumulator(len(labels), label_names)
+        return accumulator.update(encoded[:len(y_true)], encoded[len(y_true):])
     
     def plot_confusion_matrix(self, y_true: List[int], y_pred: List[int], 
                             save_path: str = None) -> plt.Figure:
@@ -163,7 +362,8 @@ class MetricsCalculator:
         Returns:
             Formatted report string
         """
-        metrics = self.calculate_metrics(y_true, y_pred)
+        accumulator = self.accumulate(y_true, y_pred)
+        metrics = accumulator.compute()
         
         report = f"""
 Model Evaluation Report
@@ -190,7 +390,7 @@ Per-Class Metrics:
         
         report += f"""
 Classification Report:
-{classification_report(y_true, y_pred, target_names=self.label_names)}
+{accumulator.classification_report()}
 """
         
         return report
@@ -198,7 +398,9 @@ Classification Report:
 
 def calculate_confidence_intervals(scores: List[float], confidence: float = 0.95) -> Tuple[float, float]:
     """
-    Calculate confidence intervals for a list of scores
+    Calculate a t-interval for the mean of a list of scores (e.g. over seeds or folds)
+    
+    For intervals on a single test set use bootstrap_confidence_intervals.
     
     Args:
         scores: List of metric scores
@@ -213,7 +415,195 @@ def calculate_confidence_intervals(scores: List[float], confidence: float = 0.95
     n = len(scores)
     
     # Calculate margin of error
-    from scipy import stats
-    margin_of_error = stats.t.ppf((1 + confidence) / 2, n - 1) * (std / np.sqrt(n))
+    margin_of_error = scipy_stats.t.ppf((1 + confidence) / 2, n - 1) * (std / np.sqrt(n))
+    
+    return mean - margin_of_error, mean + margin_of_error
+
+
+def _resampled_counts(cell_counts: np.ndarray, num_resamples: int, seed: int,
+                      block_size: int = 512) -> Iterator[np.ndarray]:
+    """
+    Bootstrap resamples of a test set expressed as counts per cell
+    
+    Drawing n samples with replacement only changes how many samples fall in
+    each distinct (label, prediction...) cell, so a resample is one
+    multinomial draw over the cells. Cost depends on the number of distinct
+    cells, not on the number of samples.
+    
+    Yields:
+        Arrays of shape (block, num_cells)
+    """
+    total = int(cell_counts.sum())
+    if total == 0:
+        raise ValueError("Cannot bootstrap an empty test set")
+    rng = np.random.default_rng(seed)
+    probabilities = cell_counts / total
+    for start in range(0, num_resamples, block_size):
+        yield rng.multinomial(total, probabilities, size=min(block_size, num_resamples - start))
+
+
+def _resampled_metrics(counts: np.ndarray, cell_true: np.ndarray, cell_pred: np.ndarray,
+                       labels: np.ndarray, num_labels: int) -> Dict[str, np.ndarray]:
+    """Accuracy, macro/weighted F1 and per-class recall for each resample"""
+    true_one_hot = np.eye(num_labels, dtype=np.int64)[cell_true]
+    pred_one_hot = np.eye(num_labels, dtype=np.int64)[cell_pred]
+    correct = (cell_true == cell_pred).astype(np.int64)
+    
+    support = (counts @ true_one_hot)[:, labels]
+    predicted = (counts @ pred_one_hot)[:, labels]
+    true_positives = ((counts * correct) @ true_one_hot)[:, labels]
+    
+    f1 = _safe_divide(2.0 * true_positives, support + predicted)
+    total = support.sum(axis=1)
+    return {
+        'accuracy': _safe_divide(true_positives.sum(axis=1), total),
+        'f1_macro': f1.mean(axis=1),
+        'f1_weighted': _safe_divide((f1 * support).sum(axis=1), total),
+        'recall': _safe_divide(true_positives, support)
+    }
+
+
+def _interval(estimate: float, samples: np.ndarray, confidence: float) -> Dict[str, float]:
+    alpha = (1.0 - confidence) / 2.0
+    lower, upper = np.quantile(samples, [alpha, 1.0 - alpha])
+    return {'estimate': float(estimate), 'lower': float(lower), 'upper': float(upper)}
+
+
+def bootstrap_metrics(confusion: np.ndarray,
+                      num_resamples: int = 1000,
+                      confidence: float = 0.95,
+                      labels: Optional[Sequence[int]] = None,
+                      label_names: Optional[List[str]] = None,
+                      seed: int = 42) -> Dict[str, Any]:
+    """
+    Percentile bootstrap confidence intervals from a confusion matrix
+    
+    Args:
+        confusion: Confusion matrix (rows: true, columns: predicted)
+        num_resamples: Number of bootstrap resamples
+        confidence: Confidence level
+        labels: Label ids the averages run over (defaults to the labels present)
+        label_names: Names for the per-class recall entries
+        seed: Random seed
+    
+    Returns:
+        Dictionary with estimate, lower and upper bound for accuracy, macro
+        and weighted F1 and each class's recall
+    """
+    accumulator = MetricsAccumulator.from_confusion_matrix(confusion, label_names)
+    labels = accumulator.present_labels() if labels is None else np.asarray(labels, dtype=np.int64)
+    num_labels = accumulator.num_labels
+    
+    cells = np.flatnonzero(accumulator.confusion)
+    cell_true, cell_pred = np.divmod(cells, num_labels)
+    cell_counts = accumulator.confusion.ravel()[cells]
+    
+    blocks = [
+        _resampled_metrics(counts, cell_true, cell_pred, labels, num_labels)
+        for counts in _resampled_counts(cell_counts, num_resamples, seed)
+    ]
+    samples = {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]}
+    point = _resampled_metrics(cell_counts[None, :], cell_true, cell_pred, labels, num_labels)
+    
+    return {
+        'num_resamples': num_resamples,
+        'confidence': confidence,
+        'accuracy': _interval(point['accuracy'][0], samples['accuracy'], confidence),
+        'f1_macro': _interval(point['f1_macro'][0], samples['f1_macro'], confidence),
+        'f1_weighted': _interval(point['f1_weighted'][0], samples['f1_weighted'], confidence),
+        'recall_per_class': {
+            accumulator.label_names[label]: _interval(point['recall'][0, i], samples['recall'][:, i], confidence)
+            for i, label in enumerate(labels)
+        }
+    }
+
+
+def bootstrap_confidence_intervals(y_true: List[int], y_pred: List[int],
+                                   num_labels: Optional[int] = None,
+                                   label_names: Optional[List[str]] = None,
+                                   **kwargs) -> Dict[str, Any]:
+    """
+    Bootstrap confidence intervals computed directly from predictions
+    
+    Args:
+        y_true: True label ids
+        y_pred: Predicted label ids
+        num_labels: Number of labels (defaults to the largest id + 1)
+        label_names: Label names
+        **kwargs: Passed to bootstrap_metrics
+    
+    Returns:
+        See bootstrap_metrics
+    """
+    y_true, y_pred = np.asarray(y_true, dtype=np.int64), np.asarray(y_pred, dtype=np.int64)
+    if len(y_true) == 0:
+        raise ValueError("Cannot bootstrap an empty test set")
+    num_labels = num_labels or int(max(y_true.max(), y_pred.max())) + 1
+    accumulator = MetricsAccumulator(num_labels, label_names).update(y_true, y_pred)
+    return bootstrap_metrics(accumulator.confusion, label_names=accumulator.label_names, **kwargs)
+
+
+def joint_counts(y_true: Sequence[int], y_pred_a: Sequence[int], y_pred_b: Sequence[int],
+                 num_labels: int) -> np.ndarray:
+    """Counts of (true, prediction A, prediction B) triples, shape (num_labels,) * 3"""
+    index = (np.asarray(y_true, dtype=np.int64) * num_labels
+             + np.asarray(y_pred_a, dtype=np.int64)) * num_labels + np.asarray(y_pred_b, dtype=np.int64)
+    return np.bincount(index, minlength=num_labels ** 3).reshape(num_labels, num_labels, num_labels)
+
+
+def paired_bootstrap(counts: np.ndarray,
+                     num_resamples: int = 1000,
+                     confidence: float = 0.95,
+                     labels: Optional[Sequence[int]] = None,
+                     seed: int = 42) -> Dict[str, Any]:
+    """
+    Paired bootstrap comparison of two models on the same test set
+    
+    Both models are scored on the same resamples, so the interval on the
+    difference accounts for the correlation between their errors.
+    
+    Args:
+        counts: Joint counts from joint_counts (accumulated over any number of batches)
+        num_resamples: Number of bootstrap resamples
+        confidence: Confidence level
+        labels: Label ids the averages run over (defaults to the labels present)
+        seed: Random seed
+    
+    Returns:
+        Per metric: both models' scores, the difference (B - A) with its
+        interval, and a two-sided bootstrap p-value for "no difference"
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    num_labels = counts.shape[0]
+    if labels is None:
+        labels = np.flatnonzero(counts.sum(axis=(1, 2)) + counts.sum(axis=(0, 2)) + counts.sum(axis=(0, 1)))
+    labels = np.asarray(labels, dtype=np.int64)
+    
+    cells = np.flatnonzero(counts)
+    cell_true, rest = np.divmod(cells, num_labels ** 2)
+    cell_pred_a, cell_pred_b = np.divmod(rest, num_labels)
+    cell_counts = counts.ravel()[cells]
+    
+    samples = {name: [] for name in ('accuracy', 'f1_macro', 'f1_weighted')}
+    for resampled in _resampled_counts(cell_counts, num_resamples, seed):
+        metrics_a = _resampled_metrics(resampled, cell_true, cell_pred_a, labels, num_labels)
+        metrics_b = _resampled_metrics(resampled, cell_true, cell_pred_b, labels, num_labels)
+        for name in samples:
+            samples[name].append((metrics_a[name], metrics_b[name]))
+    
+    point_a = _resampled_metrics(cell_counts[None, :], cell_true, cell_pred_a, labels, num_labels)
+    point_b = _resampled_metrics(cell_counts[None, :], cell_true, cell_pred_b, labels, num_labels)
+    
+    results = {'num_resamples': num_resamples, 'confidence': confidence, 'num_samples': int(cell_counts.sum())}
+    for name, blocks in samples.items():
+        differences = np.concatenate([b - a for a, b in blocks])
+        interval = _interval(point_b[name][0] - point_a[name][0], differences, confidence)
+        p_value = 2.0 * min((differences <= 0).mean(), (differences >= 0).mean())
+        results[name] = {
+            'model_a': float(point_a[name][0]),
+            'model_b': float(point_b[name][0]),
+            'difference': interval,
+            'p_value': float(min(p_value, 1.0))
+        }
     
-    return mean - margin_of_error, mean + margin_of_error
\ No newline at end of file
+    return results
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+On-demand torch.profiler captures of requests and training steps
+
+Each capture writes a Chrome trace (open in chrome://tracing or Perfetto) and
+an operator summary table to <logs_dir>/profiles. Nothing is recorded until
+a capture is requested, so the disabled path is a single attribute check.
+"""
+
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import torch
+from torch.profiler import profile, ProfilerActivity
+from typing import Dict, Any, Callable, ContextManager
+import logging
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+def profile_dir() -> str:
+    return os.path.join(config.data.logs_dir, "profiles")
+
+
+def create_profiler(record_shapes: bool = True, profile_memory: bool = False, with_stack: bool = False) -> profile:
+    """torch.profiler over the CPU, plus CUDA when available"""
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    return profile(activities=activities, record_shapes=record_shapes,
+                   profile_memory=profile_memory, with_stack=with_stack)
+
+
+def export_profile(profiler: profile, name: str, row_limit: int = 40) -> Dict[str, str]:
+    """
+    Write a finished capture to the profiles directory
+    
+    Args:
+        profiler: Stopped torch.profiler.profile
+        name: File name stem (a timestamp is prepended)
+        row_limit: Operators per summary table
+    
+    Returns:
+        Paths of the 'trace' and 'summary' files
+    """
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}")
+    
+    trace_path = f"{base}.trace.json"
+    profiler.export_chrome_trace(trace_path)
+    
+    sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+    summary_path = f"{base}.summary.txt"
+    with open(summary_path, 'w') as f:
+        f.write(f"Operators by {sort_by}\n")
+        f.write(profiler.key_averages().table(sort_by=sort_by, row_limit=row_limit))
+        f.write(f"\n\nOperators by input shape ({sort_by})\n")
+        f.write(profiler.key_averages(group_by_input_shape=True).table(sort_by=sort_by, row_limit=row_limit))
+    
+    logger.info(f"Profile written to {trace_path} and {summary_path}")
+    return {'trace': trace_path, 'summary': summary_path}
+
+
+class RequestProfiler:
+    """
+    Profile the next N requests, or individual requests that ask for it
+    
+    Only one capture runs at a time (torch profilers cannot nest); requests
+    arriving meanwhile run unprofiled and do not use up the armed count. A
+    capture covers everything the process does while the request is handled,
+    so profile under light load for clean traces.
+    """
+    
+    def __init__(self, max_captures: int = 50):
+        self._remaining = 0
+        self._active = False
+        self._lock = threading.Lock()
+        self.captures: deque = deque(maxlen=max_captures)
+    
+    def arm(self, num_requests: int):
+        """Profile the next num_requests requests"""
+        with self._lock:
+            self._remaining = num_requests
+        logger.info(f"Profiling the next {num_requests} requests")
+    
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+    
+    def _claim(self, forced: bool) -> bool:
+        # Unarmed, unforced requests return here without taking the lock
+        if not forced and self._remaining <= 0:
+            return False
+        with self._lock:
+            if self._active or (not forced and self._remaining <= 0):
+                return False
+            if not forced:
+                self._remaining -= 1
+            self._active = True
+            return True
+    
+    @contextmanager
+    def _capture(self, name: str):
+        profiler = create_profiler()
+        try:
+            with profiler:
+                yield
+        finally:
+            try:
+                files = export_profile(profiler, name)
+                self.captures.append({'name': name, 'time': datetime.now().isoformat(), **files})
+            except Exception as e:
+                # A failed export must not fail the request being profiled
+                logger.warning(f"Could not export profile {name}: {e}")
+            finally:
+                with self._lock:
+                    self._active = False
+    
+    def maybe_capture(self, name: str, forced: bool = False) -> ContextManager:
+        """
+        Context manager that profiles its block if this request should be profiled
+        
+        Args:
+            name: Capture name (e.g. the route)
+            forced: Profile regardless of the armed count (e.g. a request header)
+        """
+        return self._capture(name) if self._claim(forced) else nullcontext()
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            'remaining': self._remaining,
+            'active': self._active,
+            'captures': list(self.captures)
+        }
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running armed or flagged requests under torch.profiler
+    
+    A request is profiled when the RequestProfiler is armed (see
+    /debug/profile) or when it carries the X-Profile: 1 header. Neither is
+    honoured unless profiling is enabled, and with nothing armed a request
+    costs one integer comparison.
+    """
+    
+    def __init__(self, app, profiler: RequestProfiler, enabled: Callable[[], bool]):
+        self.app = app
+        self.profiler = profiler
+        self.enabled = enabled
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled():
+            await self.app(scope, receive, send)
+            return
+        
+        forced = any(name == b'x-profile' and value.lower() in (b'1', b'true') for name, value in scope['headers'])
+        name = scope['path'].strip('/').replace('/', '_') or 'root'
+        with self.profiler.maybe_capture(name, forced=forced):
+            await self.app(scope, receive, send)
\ No newline at end of file
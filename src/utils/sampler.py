@@ -0,0 +1,198 @@
+"""
+Statistical stack sampler for long-running processes
+
+A background thread periodically snapshots the Python stacks of all threads
+(sys._current_frames) and counts them as folded stacks, the input format of
+flamegraph.pl, speedscope and inferno. Unlike torch.profiler this sees
+Python-level time (request validation, response building, JSON encoding)
+and is cheap enough to leave running in production.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads that are waiting rather than working
+IDLE_LEAVES = frozenset({
+    'threading.py:Condition.wait',
+    'threading.py:Event.wait',
+    'threading.py:Thread._wait_for_tstate_lock',
+    'selectors.py:EpollSelector.select',
+    'selectors.py:PollSelector.select',
+    'selectors.py:SelectSelector.select',
+    'selectors.py:KqueueSelector.select',
+    'queue.py:Queue.get',
+    'socket.py:socket.accept',
+    'socketserver.py:BaseServer.serve_forever',
+})
+
+
+class StackSampler:
+    """
+    Sample all thread stacks at a fixed rate and aggregate them
+    
+    Each sample takes the GIL for roughly the time needed to walk the stacks,
+    so the cost to the sampled process is sample time / interval. The interval
+    is stretched whenever that ratio would exceed max_overhead, so the rate is
+    an upper bound. Memory is bounded by max_stacks distinct stacks; samples
+    of further new stacks are only counted as dropped. The cache of frame
+    labels holds at most max_labels code objects and is emptied when full
+    and on reset, so code that is no longer running can be freed.
+    """
+    
+    def __init__(self, rate_hz: float = 100.0, max_overhead: float = 0.01, max_stacks: int = 20000,
+                 max_labels: int = 10000):
+        self.rate_hz = rate_hz
+        self.max_overhead = max_overhead
+        self.max_stacks = max_stacks
+        self.max_labels = max_labels
+        self._counts: Counter = Counter()
+        self._labels: Dict[int, Tuple[Any, str]] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reset_stats()
+    
+    def _reset_stats(self):
+        self.samples = 0
+        self.dropped = 0
+        self.sampling_seconds = 0.0
+        self.running_seconds = 0.0
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, rate_hz: Optional[float] = None):
+        """Start sampling (or change the rate of a running sampler)"""
+        if rate_hz is not None:
+            if rate_hz <= 0:
+                raise ValueError("rate_hz must be positive")
+            self.rate_hz = rate_hz
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        logger.info(f"Stack sampler started at {self.rate_hz:g} Hz")
+    
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        logger.info("Stack sampler stopped")
+    
+    def reset(self):
+        """Forget all samples collected so far"""
+        with self._lock:
+            self._counts.clear()
+            self._labels.clear()
+            self._reset_stats()
+    
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            self._sample(own_id)
+            # CPU time of this thread, so time spent waiting for the GIL does not count
+            cost = time.thread_time() - cpu_start
+            self.sampling_seconds += cost
+            # Keep cost / interval under max_overhead even if stacks get deep
+            interval = max(1.0 / self.rate_hz, cost / self.max_overhead)
+            stopped = self._stop.wait(max(0.0, interval - cost))
+            self.running_seconds += time.perf_counter() - start
+            if stopped:
+                return
+    
+    def _label(self, code) -> str:
+        # Keyed by id because hashing a code object hashes its bytecode; the
+        # entry keeps the code alive so its id cannot be reused
+        entry = self._labels.get(id(code))
+        if entry is None:
+            if len(self._labels) >= self.max_labels:
+                # Labels are cheap to rebuild; starting over drops code objects
+                # that are no longer on any stack (reloaded modules, exec'd code)
+                self._labels.clear()
+            # co_qualname (Class.method) is Python 3.11+
+            entry = (code, f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+            self._labels[id(code)] = entry
+        return entry[1]
+    
+    def _thread_name(self, thread_id: int) -> str:
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            self._thread_names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._thread_names.get(thread_id, f"thread-{thread_id}")
+        return name
+    
+    def _sample(self, own_id: int):
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(self._thread_name(thread_id))
+            stacks.append(tuple(reversed(labels)))
+        
+        with self._lock:
+            self.samples += 1
+            for stack in stacks:
+                if stack in self._counts or len(self._counts) < self.max_stacks:
+                    self._counts[stack] += 1
+                else:
+                    self.dropped += 1
+    
+    def _snapshot(self, include_idle: bool) -> List[Tuple[Tuple[str, ...], int]]:
+        with self._lock:
+            items = list(self._counts.items())
+        if not include_idle:
+            items = [(stack, count) for stack, count in items if stack[-1] not in IDLE_LEAVES]
+        return items
+    
+    def folded(self, include_idle: bool = False) -> str:
+        """
+        Aggregated samples as folded stacks, one 'thread;outer;...;leaf count' line per stack
+        
+        Args:
+            include_idle: Keep stacks of threads that are blocked waiting
+                (event loop selects, idle worker threads)
+        """
+        items = sorted(self._snapshot(include_idle), key=lambda item: -item[1])
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in items)
+    
+    def top(self, n: int = 20, include_idle: bool = False) -> List[Dict[str, Any]]:
+        """Functions with the most samples, by self (leaf) and total (anywhere on the stack) count"""
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self._snapshot(include_idle):
+            self_counts[stack[-1]] += count
+            # A recursive function is counted once per stack
+            for label in set(stack[1:]):
+                total_counts[label] += count
+        return [
+            {'function': label, 'self': count, 'total': total_counts[label]}
+            for label, count in self_counts.most_common(n)
+        ]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Sample counts and overhead (share of wall time spent sampling while running)"""
+        return {
+            'running': self.running,
+            'rate_hz': self.rate_hz,
+            'samples': self.samples,
+            'distinct_stacks': len(self._counts),
+            'dropped': self.dropped,
+            'seconds': self.running_seconds,
+            'overhead': self.sampling_seconds / self.running_seconds if self.running_seconds > 0 else 0.0
+        }
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Hash split assignment
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.data.loader import DataLoader
+
+
+def make_frame(num_rows: int, offset: int = 0, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'text': [f"sample text number {offset + i}" for i in range(num_rows)],
+        'label': rng.choice(['negative', 'neutral', 'positive'], size=num_rows)
+    })
+
+
+def assignments(splits, num_rows: int) -> np.ndarray:
+    assigned = np.empty(num_rows, dtype=object)
+    for name, indices in splits.items():
+        assigned[indices] = name
+    return assigned
+
+
+def test_appending_rows_moves_no_existing_row():
+    loader = DataLoader()
+    df = make_frame(2000)
+    appended = pd.concat([df, make_frame(50, offset=10000, seed=1)], ignore_index=True)
+    
+    before = assignments(loader.split_indices(df), len(df))
+    after = assignments(loader.split_indices(appended), len(appended))
+    
+    np.testing.assert_array_equal(before, after[:len(df)])
+
+
+def test_split_sizes_follow_the_ratios():
+    splits = DataLoader().split_indices(make_frame(5000), train_ratio=0.8, val_ratio=0.1, test_ratio=0.1)
+    
+    assert sum(len(indices) for indices in splits.values()) == 5000
+    assert abs(len(splits['train']) / 5000 - 0.8) < 0.03
+    assert abs(len(splits['val']) / 5000 - 0.1) < 0.03
+
+def test_watermark_selection_keeps_old_rows_out_of_evaluation_splits():
+    loader = DataLoader()
+    old = make_frame(2000)
+    appended = pd.concat([old, make_frame(500, offset=10000, seed=1)], ignore_index=True)
+    watermark = loader.create_watermark(old)
+    
+    old_splits = loader.split_indices(old)
+    selected = loader.select_since_watermark(appended, watermark, replay_fraction=0.5,
+                                             split_ratios=(0.8, 0.1, 0.1))
+    
+    assert all((selected[name] >= len(old)).all() for name in ('val', 'test'))
+    replay = selected['train'][selected['train'] < len(old)]
+    assert len(replay) == 250
+    assert np.isin(replay, old_splits['train']).all()
+    assert sum(len(indices) for indices in selected.values()) == 500 + len(replay)
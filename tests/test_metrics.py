@@ -0,0 +1,149 @@
+"""
+MetricsAccumulator must give the same numbers and reports as sklearn
+"""
+
+import warnings
+import numpy as np
+import pytest
+from sklearn.exceptions import UndefinedMetricWarning
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support, classification_report
+
+from src.utils.metrics import MetricsAccumulator, bootstrap_confidence_intervals
+
+NUM_LABELS = 6
+
+
+@pytest.fixture(autouse=True)
+def _quiet_sklearn():
+    # sklearn warns about zero-support classes, which these tests create on purpose
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UndefinedMetricWarning)
+        yield
+
+
+def random_labels(seed: int, size: int = 500, present: int = NUM_LABELS - 1):
+    """
+    Random true and predicted ids; label NUM_LABELS - 1 is never a true
+    label (zero support) and only sometimes predicted
+    """
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, present, size=size)
+    y_pred = np.where(rng.random(size) < 0.7, y_true, rng.integers(0, NUM_LABELS, size=size))
+    return y_true, y_pred
+
+
+def assert_matches_sklearn(accumulator, y_true, y_pred, labels=None):
+    assert accumulator.accuracy() == pytest.approx(accuracy_score(y_true, y_pred), abs=1e-12)
+    
+    averages = accumulator.averages(labels)
+    for average in ('micro', 'macro', 'weighted'):
+        precision, recall, f1, _ = precision_recall_fscore_support(
+            y_true, y_pred, labels=labels, average=average, zero_division=0
+        )
+        assert averages[average]['precision'] == pytest.approx(precision, abs=1e-12)
+        assert averages[average]['recall'] == pytest.approx(recall, abs=1e-12)
+        assert averages[average]['f1'] == pytest.approx(f1, abs=1e-12)
+    
+    stats = accumulator.per_class(labels)
+    precision, recall, f1, support = precision_recall_fscore_support(y_true, y_pred, labels=labels, zero_division=0)
+    np.testing.assert_allclose(stats['precision'], precision, atol=1e-12)
+    np.testing.assert_allclose(stats['recall'], recall, atol=1e-12)
+    np.testing.assert_allclose(stats['f1'], f1, atol=1e-12)
+    np.testing.assert_array_equal(stats['support'], support)
+    
+    for digits in (2, 4):
+        assert accumulator.classification_report(labels, digits=digits) == classification_report(
+            y_true, y_pred, labels=labels, digits=digits, zero_division=0
+        )
+    report = accumulator.classification_report(labels, output_dict=True)
+    expected = classification_report(y_true, y_pred, labels=labels, output_dict=True, zero_division=0)
+    assert list(report) == list(expected)
+    for name, row in expected.items():
+        assert report[name] == (pytest.approx(row, abs=1e-12) if isinstance(row, float) else
+                                {key: pytest.approx(value, abs=1e-12) for key, value in row.items()})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_sklearn(seed):
+    y_true, y_pred = random_labels(seed)
+    accumulator = MetricsAccumulator(NUM_LABELS).update(y_true, y_pred)
+    assert_matches_sklearn(accumulator, y_true, y_pred)
+
+
+@pytest.mark.parametrize("labels", [
+    list(range(NUM_LABELS)),  # includes the zero-support label
+    [0, 2],                    # a subset: micro average instead of accuracy
+    [NUM_LABELS - 1],          # only the zero-support label
+])
+def test_matches_sklearn_for_explicit_labels(labels):
+    y_true, y_pred = random_labels(7)
+    accumulator = MetricsAccumulator(NUM_LABELS).update(y_true, y_pred)
+    assert_matches_sklearn(accumulator, y_true, y_pred, labels)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_merged_shards_match_sklearn_on_concatenated_labels(seed):
+    rng = np.random.default_rng(seed)
+    shards = []
+    for shard in range(4):
+        # Each shard sees only some labels, so no shard alone has the full label set
+        present = rng.choice(NUM_LABELS - 1, size=2 + shard % 3, replace=False)
+        size = int(rng.integers(1, 200))
+        y_true = rng.choice(present, size=size)
+        y_pred = np.where(rng.random(size) < 0.6, y_true, rng.choice(present, size=size))
+        shards.append((y_true, y_pred))
+    
+    merged = MetricsAccumulator(NUM_LABELS)
+    for y_true, y_pred in shards:
+        merged.merge(MetricsAccumulator(NUM_LABELS).update(y_true, y_pred))
+    
+    y_true = np.concatenate([shard[0] for shard in shards])
+    y_pred = np.concatenate([shard[1] for shard in shards])
+    np.testing.assert_array_equal(merged.confusion, MetricsAccumulator(NUM_LABELS).update(y_true, y_pred).confusion)
+    assert_matches_sklearn(merged, y_true, y_pred)
+    assert_matches_sklearn(merged, y_true, y_pred, list(range(NUM_LABELS)))
+
+
+def test_merging_an_empty_shard_changes_nothing():
+    y_true, y_pred = random_labels(3)
+    accumulator = MetricsAccumulator(NUM_LABELS).update(y_true, y_pred)
+    accumulator.merge(MetricsAccumulator(NUM_LABELS)).update([], [])
+    assert_matches_sklearn(accumulator, y_true, y_pred)
+
+
+def test_report_with_zero_support_rows():
+    # Pinned text: zero-support rows and average rows show integer support,
+    # and the micro average is called 'accuracy' only when every seen label is reported
+    accumulator = MetricsAccumulator(3).update([0, 0, 1], [0, 2, 1])
+    
+    assert accumulator.classification_report([0, 1, 2]) == (
+        "              precision    recall  f1-score   support\n"
+        "\n"
+        "           0       1.00      0.50      0.67         2\n"
+        "           1       1.00      1.00      1.00         1\n"
+        "           2       0.00      0.00      0.00         0\n"
+        "\n"
+        "    accuracy                           0.67         3\n"
+        "   macro avg       0.67      0.50      0.56         3\n"
+        "weighted avg       1.00      0.67      0.78         3\n"
+    )
+    assert accumulator.classification_report([2]) == (
+        "              precision    recall  f1-score   support\n"
+        "\n"
+        "           2       0.00      0.00      0.00         0\n"
+        "\n"
+        "   micro avg       0.00      0.00      0.00         0\n"
+        "   macro avg       0.00      0.00      0.00         0\n"
+        "weighted avg       0.00      0.00      0.00         0\n"
+    )
+    
+    report = accumulator.classification_report([0, 1, 2], output_dict=True)
+    assert report['2'] == {'precision': 0.0, 'recall': 0.0, 'f1-score': 0.0, 'support': 0.0}
+    assert report['accuracy'] == pytest.approx(2 / 3)
+
+
+def test_bootstrap_of_an_empty_test_set_raises():
+    with pytest.raises(ValueError, match="empty test set"):
+        bootstrap_confidence_intervals([], [])
+    with pytest.raises(ValueError, match="empty test set"):
+        bootstrap_confidence_intervals([], [], num_labels=3)
\ No newline at end of file